@@ -0,0 +1,188 @@
+"""
+Clean Air AI Chatbot - Aggregates
+Registry of named, chart-ready tables computed once per dataset version
+
+Tables use logical column names (area, aqi, disease, cases, state, fuel, ...)
+so they read the same from the raw exports and the sample data.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from datastore import canonical_states, dataset_version, find_column
+from per_capita import per_capita
+
+# Axis titles for the logical column names
+AGGREGATE_LABELS = {
+    "area": "City",
+    "aqi": "AQI",
+    "disease": "Disease",
+    "cases": "Cases",
+    "state": "State",
+    "fuel": "Fuel Type",
+    "vehicle_class": "Vehicle Class",
+    "registrations": "Registrations",
+    "population": "Population",
+    "ev_share": "EV Share (%)",
+    "diesel_share": "Diesel Share (%)",
+    "cases_per_100k": "Cases per 100k per Year",
+    "cases_per_million": "Cases per Million",
+    "registrations_per_1000": "Registrations per 1,000 People per Year",
+}
+
+class AggregateRegistry:
+    """Named tables: each is (dataset, required fields, builder), results cached by dataset version"""
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._definitions: Dict[str, Tuple[str, List[str], Callable]] = {}
+        self._tables: "OrderedDict[Tuple[str, str], pd.DataFrame]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def register(self, name: str, dataset: str, fields: List[str]):
+        """Decorator adding a builder `fn(df) -> DataFrame` under `name`"""
+        def decorator(fn):
+            self._definitions[name] = (dataset, fields, fn)
+            return fn
+        return decorator
+
+    def names(self, dataset: Optional[str] = None) -> List[str]:
+        return [name for name, (ds, _, _) in self._definitions.items() if dataset is None or ds == dataset]
+
+    def available(self, df: pd.DataFrame, name: str) -> bool:
+        """True when `df` has every column the table needs"""
+        dataset, fields, _ = self._definitions[name]
+        return df is not None and all(find_column(df, dataset, field) for field in fields)
+
+    def get(self, df: pd.DataFrame, name: str) -> pd.DataFrame:
+        """The table for this dataset version; treat it as read-only"""
+        key = (dataset_version(df), name)
+        with self._lock:
+            table = self._tables.get(key)
+            if table is not None:
+                self.hits += 1
+                self._tables.move_to_end(key)
+                return table
+            self.misses += 1
+
+        table = self._definitions[name][2](df)
+        with self._lock:
+            self._tables[key] = table
+            self._tables.move_to_end(key)
+            while len(self._tables) > self.max_entries:
+                self._tables.popitem(last=False)
+        return table
+
+    def precompute(self, datasets: Dict):
+        """Build every available table for the loaded datasets"""
+        for name, (dataset, _, _) in self._definitions.items():
+            df = datasets.get(dataset)
+            if isinstance(df, pd.DataFrame) and self.available(df, name):
+                self.get(df, name)
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"tables": len(self._tables), "hits": self.hits, "misses": self.misses}
+
+
+aggregates = AggregateRegistry()
+
+
+def _column(df: pd.DataFrame, dataset: str, field: str) -> pd.Series:
+    return df[find_column(df, dataset, field)]
+
+
+def _numeric(df: pd.DataFrame, dataset: str, field: str) -> pd.Series:
+    return pd.to_numeric(_column(df, dataset, field), errors="coerce")
+
+
+def _totals(keys: pd.Series, values: pd.Series, key_name: str, value_name: str) -> pd.DataFrame:
+    """Sum of values per key, largest first"""
+    totals = values.groupby(keys.astype(str).str.strip()).sum()
+    return totals.sort_values(ascending=False).rename_axis(key_name).reset_index(name=value_name)
+
+
+@aggregates.register("top_polluted_areas", "aqi", ["area", "aqi"])
+def top_polluted_areas(df: pd.DataFrame) -> pd.DataFrame:
+    """Mean AQI per area, most polluted first"""
+    means = _numeric(df, "aqi", "aqi").groupby(_column(df, "aqi", "area").astype(str).str.strip()).mean()
+    return means.dropna().sort_values(ascending=False).rename_axis("area").reset_index(name="aqi")
+
+
+@aggregates.register("disease_totals", "idsp", ["disease", "cases"])
+def disease_totals(df: pd.DataFrame) -> pd.DataFrame:
+    """Reported cases per disease, largest first"""
+    return _totals(_column(df, "idsp", "disease"), _numeric(df, "idsp", "cases"), "disease", "cases")
+
+
+@aggregates.register("state_case_totals", "idsp", ["state", "cases"])
+def state_case_totals(df: pd.DataFrame) -> pd.DataFrame:
+    """Reported cases per state (canonical names), largest first"""
+    return _totals(canonical_states(_column(df, "idsp", "state")), _numeric(df, "idsp", "cases"), "state", "cases")
+
+
+@aggregates.register("fuel_mix", "vahan", ["fuel", "registrations"])
+def fuel_mix(df: pd.DataFrame) -> pd.DataFrame:
+    """Registrations per fuel type, largest first"""
+    return _totals(_column(df, "vahan", "fuel"), _numeric(df, "vahan", "registrations"), "fuel", "registrations")
+
+
+@aggregates.register("vehicle_class_mix", "vahan", ["vehicle_class", "registrations"])
+def vehicle_class_mix(df: pd.DataFrame) -> pd.DataFrame:
+    """Registrations per vehicle class, largest first"""
+    return _totals(_column(df, "vahan", "vehicle_class"), _numeric(df, "vahan", "registrations"),
+                   "vehicle_class", "registrations")
+
+
+@aggregates.register("population_by_state", "population", ["state", "population"])
+def population_by_state(df: pd.DataFrame) -> pd.DataFrame:
+    """Projected population per state in the reference (current) year, largest first
+
+    Read from the per-capita population lookup, so the dashboards show the
+    same figures the chat context and the per-capita rates use.
+    """
+    table = per_capita.population(df)
+    if table is None:
+        return pd.DataFrame(columns=["state", "population"])
+    totals = table.totals().sort_values(ascending=False)
+    return totals.rename_axis("state").reset_index(name="population")
+
+
+@aggregates.register("aqi_by_state", "aqi", ["state", "aqi"])
+def aqi_by_state(df: pd.DataFrame) -> pd.DataFrame:
+    """Mean AQI per state (canonical names), most polluted first"""
+    states = canonical_states(_column(df, "aqi", "state"))
+    means = _numeric(df, "aqi", "aqi").groupby(states).mean()
+    return means.dropna().sort_values(ascending=False).rename_axis("state").reset_index(name="aqi")
+
+
+def _fuel_share(df: pd.DataFrame, pattern: str, value_name: str) -> pd.DataFrame:
+    """Percentage of registrations whose fuel matches `pattern`, per state"""
+    states = canonical_states(_column(df, "vahan", "state"))
+    registrations = _numeric(df, "vahan", "registrations")
+    fuel = _column(df, "vahan", "fuel").astype(str).str.lower()
+    matching = registrations.where(fuel.str.contains(pattern, regex=True), 0)
+    totals = pd.DataFrame({"matching": matching, "total": registrations}).groupby(states).sum()
+    share = (100 * totals["matching"] / totals["total"].where(totals["total"] > 0)).dropna()
+    return share.sort_values(ascending=False).rename_axis("state").reset_index(name=value_name)
+
+
+@aggregates.register("ev_share_by_state", "vahan", ["state", "fuel", "registrations"])
+def ev_share_by_state(df: pd.DataFrame) -> pd.DataFrame:
+    """Percentage of registrations that are electric, per state"""
+    return _fuel_share(df, r"electric|\bev\b|bov", "ev_share")
+
+
+@aggregates.register("diesel_share_by_state", "vahan", ["state", "fuel", "registrations"])
+def diesel_share_by_state(df: pd.DataFrame) -> pd.DataFrame:
+    """Percentage of registrations that run on diesel (including diesel hybrids), per state"""
+    return _fuel_share(df, r"diesel", "diesel_share")
@@ -0,0 +1,291 @@
+"""
+Clean Air AI Chatbot - Alerts
+Threshold rules over the AQI and IDSP data for the Operations dashboard
+
+Each dataset is split into time partitions (days for AQI, weeks for IDSP).
+Every partition is reduced once to a small per-location summary, cached by
+the partition's content hash, so a reload that appends new days or weeks
+only summarizes those. Rules then run vectorised over the summaries, and
+the alert table is cached per dataset version and rule set for all sessions.
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from datastore import canonical_states, dataset_version, find_column, parse_dates
+from outbreaks import OUTBREAK_THRESHOLD, outbreak_detector
+
+# CPCB AQI categories: name -> lowest AQI in the category
+AQI_CATEGORIES = {
+    "Good": 0,
+    "Satisfactory": 51,
+    "Moderate": 101,
+    "Poor": 201,
+    "Very Poor": 301,
+    "Severe": 401,
+}
+
+SEVERITY_ORDER = {"critical": 0, "warning": 1, "info": 2}
+
+ALERT_COLUMNS = ["dataset", "rule", "severity", "period", "state", "location", "value", "message"]
+
+
+@dataclass(frozen=True)
+class AlertRule:
+    """One configurable rule; `threshold` means a category name, a growth %, a death count or an EARS C2 value"""
+    name: str
+    kind: str  # 'aqi_category', 'case_growth', 'deaths' or 'outbreak'
+    threshold: object
+    severity: str = "warning"
+    min_cases: int = 10  # case_growth/outbreak only: ignore weeks below this many cases
+
+
+def alert_rules(min_category: str = "Poor", growth_pct: float = 50.0, deaths: int = 3,
+                min_cases: int = 10, outbreak_c2: float = OUTBREAK_THRESHOLD,
+                outbreak_min_cases: int = 20) -> Tuple[AlertRule, ...]:
+    """Rule set for the Operations panel: one AQI rule per category from `min_category` up"""
+    floor = AQI_CATEGORIES[min_category]
+    rules = [
+        AlertRule(f"AQI {name}", "aqi_category", name,
+                  "critical" if AQI_CATEGORIES[name] >= AQI_CATEGORIES["Very Poor"] else "warning")
+        for name, lowest in AQI_CATEGORIES.items() if lowest >= floor
+    ]
+    rules.append(AlertRule("Cases up week over week", "case_growth", float(growth_pct), "warning", min_cases))
+    rules.append(AlertRule("Deaths reported", "deaths", int(deaths), "critical"))
+    rules.append(AlertRule("Outbreak detected", "outbreak", float(outbreak_c2), "critical", outbreak_min_cases))
+    return tuple(rules)
+
+
+DEFAULT_RULES = alert_rules()
+
+
+def _partition_hashes(df: pd.DataFrame, periods: pd.Series) -> pd.Series:
+    """Content hash per partition: row hashes summed (mod 2**64) within each period"""
+    rows = pd.util.hash_pandas_object(df, index=False)
+    return rows.groupby(periods.to_numpy()).sum()
+
+
+def aqi_periods(df: pd.DataFrame) -> pd.Series:
+    """Day of each AQI reading"""
+    date_col = find_column(df, "aqi", "date")
+    if not date_col:
+        return pd.Series(pd.NaT, index=df.index)
+    return parse_dates(df[date_col]).dt.normalize()
+
+
+def idsp_periods(df: pd.DataFrame) -> pd.Series:
+    """Monday of the week each IDSP outbreak started"""
+    date_col = find_column(df, "idsp", "date")
+    if not date_col:
+        return pd.Series(pd.NaT, index=df.index)
+    dates = parse_dates(df[date_col])
+    return (dates - pd.to_timedelta(dates.dt.weekday, unit="D")).dt.normalize()
+
+
+def summarize_aqi(rows: pd.DataFrame, periods: pd.Series) -> pd.DataFrame:
+    """Worst AQI per (day, state, area)"""
+    area_col = find_column(rows, "aqi", "area")
+    state_col = find_column(rows, "aqi", "state")
+    frame = pd.DataFrame({
+        "period": periods,
+        "state": canonical_states(rows[state_col]) if state_col else "",
+        "location": rows[area_col].astype(str).str.strip() if area_col else "",
+        "aqi": pd.to_numeric(rows[find_column(rows, "aqi", "aqi")], errors="coerce"),
+    })
+    # Blank readings say nothing about the day; an area-day with only blanks has no summary row
+    frame = frame.dropna(subset=["aqi"])
+    return frame.groupby(["period", "state", "location"], as_index=False)["aqi"].max()
+
+
+def summarize_idsp(rows: pd.DataFrame, periods: pd.Series) -> pd.DataFrame:
+    """Cases and deaths per (week, state, district)"""
+    district_col = find_column(rows, "idsp", "district")
+    deaths_col = find_column(rows, "idsp", "deaths")
+    frame = pd.DataFrame({
+        "period": periods,
+        "state": canonical_states(rows[find_column(rows, "idsp", "state")]),
+        "location": rows[district_col].astype(str).str.strip() if district_col else "",
+        "cases": pd.to_numeric(rows[find_column(rows, "idsp", "cases")], errors="coerce").fillna(0),
+        "deaths": pd.to_numeric(rows[deaths_col], errors="coerce").fillna(0) if deaths_col else 0,
+    })
+    return frame.groupby(["period", "state", "location"], as_index=False)[["cases", "deaths"]].sum()
+
+
+PARTITIONERS = {
+    "aqi": (aqi_periods, summarize_aqi, ["state", "aqi"]),
+    "idsp": (idsp_periods, summarize_idsp, ["state", "cases"]),
+}
+
+
+def aqi_category(values: pd.Series) -> pd.Series:
+    """CPCB category name for each AQI value; missing (NA) for missing values"""
+    names = np.array(list(AQI_CATEGORIES), dtype=object)
+    array = values.to_numpy(dtype=float, na_value=np.nan)
+    index = np.searchsorted(list(AQI_CATEGORIES.values()), array, side="right") - 1
+    categories = np.where(np.isnan(array), None, names[np.clip(index, 0, None)])
+    return pd.Series(categories, index=values.index)
+
+
+def aqi_category_alerts(summary: pd.DataFrame, rule: AlertRule) -> pd.DataFrame:
+    # Readings in exactly this category; worse ones belong to the next rule up
+    hits = summary[aqi_category(summary["aqi"]) == rule.threshold]
+    return pd.DataFrame({
+        "period": hits["period"], "state": hits["state"], "location": hits["location"],
+        "value": hits["aqi"],
+        "message": hits["location"] + " AQI " + hits["aqi"].round().astype(int).astype(str) + f" ({rule.threshold})",
+    })
+
+
+def case_growth_alerts(summary: pd.DataFrame, rule: AlertRule) -> pd.DataFrame:
+    # Previous week's cases for the same district, matched by shifting its period forward a week
+    previous = summary[["period", "state", "location", "cases"]].copy()
+    previous["period"] = previous["period"] + pd.Timedelta(days=7)
+    paired = summary.merge(previous, on=["period", "state", "location"], suffixes=("", "_previous"))
+    paired = paired[(paired["cases"] >= rule.min_cases) & (paired["cases_previous"] > 0)]
+    growth = 100 * (paired["cases"] - paired["cases_previous"]) / paired["cases_previous"]
+    hits = paired[growth >= float(rule.threshold)]
+    growth = growth[hits.index]
+    return pd.DataFrame({
+        "period": hits["period"], "state": hits["state"], "location": hits["location"],
+        "value": growth.round(1),
+        "message": hits["location"] + " cases rising " + growth.round().astype(int).astype(str) + "% ("
+                   + hits["cases_previous"].astype(int).astype(str) + " → " + hits["cases"].astype(int).astype(str) + ")",
+    })
+
+
+def deaths_alerts(summary: pd.DataFrame, rule: AlertRule) -> pd.DataFrame:
+    hits = summary[summary["deaths"] >= float(rule.threshold)]
+    return pd.DataFrame({
+        "period": hits["period"], "state": hits["state"], "location": hits["location"],
+        "value": hits["deaths"],
+        "message": hits["location"] + " reported " + hits["deaths"].astype(int).astype(str) + " deaths in a week",
+    })
+
+
+def outbreak_alerts(outbreaks: pd.DataFrame, rule: AlertRule) -> pd.DataFrame:
+    # C2 is NaN for first reports, so only escalations over a non-zero baseline alert
+    hits = outbreaks[(outbreaks["c2"] >= float(rule.threshold)) & (outbreaks["cases"] >= rule.min_cases)]
+    return pd.DataFrame({
+        "period": hits["period"], "state": hits["state"], "location": hits["location"],
+        "value": hits["c2"],
+        "message": hits["disease"] + " outbreak in " + hits["location"] + ": "
+                   + hits["cases"].astype(int).astype(str) + " cases (C2 " + hits["c2"].round(1).astype(str) + ")",
+    })
+
+
+RULE_EVALUATORS = {
+    "aqi_category": ("aqi", aqi_category_alerts),
+    "case_growth": ("idsp", case_growth_alerts),
+    "deaths": ("idsp", deaths_alerts),
+    "outbreak": ("idsp", outbreak_alerts),
+}
+
+
+class AlertEngine:
+    """Partition summaries cached by content hash; alert tables cached by dataset versions and rules"""
+
+    def __init__(self, max_partitions: int = 8192, max_results: int = 32):
+        self.max_partitions = max_partitions
+        self.max_results = max_results
+        self._lock = threading.Lock()
+        self._partitions: "OrderedDict[Tuple[str, int], pd.DataFrame]" = OrderedDict()
+        self._results: "OrderedDict[tuple, pd.DataFrame]" = OrderedDict()
+        self.partitions_reused = 0
+        self.partitions_built = 0
+
+    def summary(self, df: pd.DataFrame, dataset: str) -> pd.DataFrame:
+        """Per-location summary over every partition; only unseen partitions are summarized"""
+        periods_of, summarize, fields = PARTITIONERS[dataset]
+        if df is None or not all(find_column(df, dataset, field) for field in fields):
+            return pd.DataFrame()
+        periods = periods_of(df)
+        hashes = _partition_hashes(df, periods)
+
+        with self._lock:
+            cached = {period: self._partitions.get((dataset, int(h))) for period, h in hashes.items()}
+        missing = [period for period, part in cached.items() if part is None]
+
+        if missing:
+            mask = periods.isin(missing).to_numpy()
+            built = summarize(df[mask], periods[mask])
+            by_period = dict(tuple(built.groupby("period", sort=False)))
+            with self._lock:
+                for period in missing:
+                    part = by_period.get(period, built.iloc[0:0])
+                    cached[period] = part
+                    self._partitions[(dataset, int(hashes[period]))] = part
+                while len(self._partitions) > self.max_partitions:
+                    self._partitions.popitem(last=False)
+        with self._lock:
+            self.partitions_built += len(missing)
+            self.partitions_reused += len(cached) - len(missing)
+
+        parts = [part for part in cached.values() if len(part)]
+        # Rows with an unparseable date have no partition (NaN key) and are dropped above
+        return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+    def evaluate(self, datasets: Dict, rules: Tuple[AlertRule, ...] = DEFAULT_RULES) -> pd.DataFrame:
+        """Every alert the rules raise, newest and most severe first"""
+        versions = tuple(
+            (name, dataset_version(datasets[name]))
+            for name in ("aqi", "idsp") if isinstance(datasets.get(name), pd.DataFrame)
+        )
+        # The outbreak scan runs in the background; results are rebuilt once it lands
+        outbreaks = outbreak_detector.get(datasets["idsp"]) if "idsp" in dict(versions) else None
+        key = (versions, rules, outbreaks is not None)
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                return self._results[key]
+
+        summaries = {
+            name: self.summary(datasets.get(name), name)
+            for name in ("aqi", "idsp") if isinstance(datasets.get(name), pd.DataFrame)
+        }
+        tables = []
+        for rule in rules:
+            dataset, evaluate = RULE_EVALUATORS[rule.kind]
+            summary = outbreaks if rule.kind == "outbreak" else summaries.get(dataset)
+            if summary is None or summary.empty:
+                continue
+            hits = evaluate(summary, rule)
+            tables.append(hits.assign(dataset=dataset, rule=rule.name, severity=rule.severity))
+
+        alerts = pd.concat(tables, ignore_index=True) if tables else pd.DataFrame(columns=ALERT_COLUMNS)
+        if not alerts.empty:
+            alerts = (alerts.assign(_rank=alerts["severity"].map(SEVERITY_ORDER))
+                      .sort_values(["period", "_rank", "value"], ascending=[False, True, False])
+                      .drop(columns="_rank"))
+        alerts = alerts[ALERT_COLUMNS].reset_index(drop=True)
+
+        with self._lock:
+            self._results[key] = alerts
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+        return alerts
+
+    def clear(self):
+        with self._lock:
+            self._partitions.clear()
+            self._results.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"partitions": len(self._partitions), "results": len(self._results),
+                    "reused": self.partitions_reused, "built": self.partitions_built}
+
+
+alert_engine = AlertEngine()
+
+
+def recent_alerts(alerts: pd.DataFrame, days: int = 28) -> pd.DataFrame:
+    """Alerts within `days` of the newest alert period of their dataset"""
+    if alerts.empty:
+        return alerts
+    latest = alerts.groupby("dataset")["period"].transform("max")
+    return alerts[alerts["period"] > latest - pd.Timedelta(days=days)]
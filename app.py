@@ -13,7 +13,6 @@ st.set_page_config(
 
 import pandas as pd
 try:
-    import plotly.express as px
     import plotly.graph_objects as go
     print("Successfully imported plotly!")
 except ImportError as e:
@@ -23,16 +22,34 @@ except ImportError as e:
     print(f"Python path: {sys.path}")
     # Use alternative visualization library
     import altair as alt
-from groq import Groq
 import os
 from datetime import datetime
 import time
 import json
-from typing import List, Dict, Any
+from typing import Dict, Any
 import altair as alt
 from streamlit_extras.add_vertical_space import add_vertical_space
 from streamlit_extras.colored_header import colored_header
 from streamlit_extras.metric_cards import style_metric_cards
+from llm_gateway import create_chat_completion, model_router, rate_limiter
+from query_planner import build_vocabulary, classify_query, plan_query
+from prompt_layout import assemble_context, build_messages, prefix_meter
+from datastore import stamp_version
+from llm_backends import create_llm_client, llm_backend_name, requires_api_key
+from charts import figure_cache, make_figure, render_chart, render_timeseries, select_charts
+from downsampling import render_mode
+from aggregates import AGGREGATE_LABELS, aggregates
+from sql_engine import MAX_ROWS as SQL_MAX_ROWS, sql_engine
+from nl2sql import answer_with_sql, sql_answer_cache
+from risk import RiskSummary, risk_index
+from outbreaks import outbreak_context, outbreak_detector
+from aqi_trends import aqi_trends, trend_context
+from per_capita import per_capita, per_capita_context
+from alerts import AQI_CATEGORIES, DEFAULT_RULES, alert_engine, alert_rules, recent_alerts
+from exports import EXPORT_CHUNK_ROWS, EXPORT_MAX_ROWS, frame_chunks, render_export_controls
+
+# Figure cache key for this app's chart styling
+CHART_THEME = "enterprise"
 
 # Page configuration moved to the top
 
@@ -382,6 +399,8 @@ def initialize_session_state():
         st.session_state.dark_mode = True
     if "show_advanced" not in st.session_state:
         st.session_state.show_advanced = False
+    if "answer_mode" not in st.session_state:
+        st.session_state.answer_mode = "summary"
 
 # Load environment variables
 @st.cache_data
@@ -406,13 +425,14 @@ def initialize_groq_client():
             # Fallback to environment variable (for local development)
             api_key = os.getenv("GROQ_API_KEY")
         
-        if not api_key:
+        # Mock and replay backends run without a key (see llm_backends.py)
+        if not api_key and requires_api_key():
             st.error("❌ GROQ_API_KEY not found. Please set it in Streamlit secrets or environment variables.")
             st.info("🔑 Get your API key from: https://console.groq.com/")
             return None
         
         try:
-            client = Groq(api_key=api_key)
+            client = create_llm_client(api_key)
             # Test the client with a minimal API call
             model_name = os.getenv("GROQ_MODEL", "llama-3.1-70b-versatile")
             client.chat.completions.create(
@@ -420,7 +440,7 @@ def initialize_groq_client():
                 model=model_name,
                 max_tokens=10
             )
-            st.success("✅ Successfully connected to Groq API")
+            st.success(f"✅ Successfully connected to LLM backend ({llm_backend_name()})")
             return client
         except Exception as e:
             st.error(f"❌ Error connecting to Groq API: {str(e)}")
@@ -477,6 +497,20 @@ def load_datasets():
             else:
                 st.sidebar.warning(f"⚠️ {filename} not found. Using sample data.")
                 datasets[key] = create_sample_data(key)
+            
+            # Stamp the content version; caches and the prompt layout key on it
+            stamp_version(datasets[key])
+        
+        # Chart-ready tables, AQI trends, per-capita rates and the Executive risk score, computed once per dataset version
+        # A failure here only loses the warm-up; the datasets are still returned
+        try:
+            aggregates.precompute(datasets)
+            outbreak_detector.start(datasets["idsp"])
+            aqi_trends.get(datasets["aqi"])
+            per_capita.precompute(datasets)
+            risk_index.get(datasets)
+        except Exception as e:
+            print(f"⚠️ Precomputing dashboards failed: {e}")
         
         # Load metadata
         meta_file = os.path.join(data_folder, "meta_data.txt")
@@ -532,69 +566,73 @@ def create_sample_data(dataset_type):
     else:
         return pd.DataFrame()
 
-# Query classification and processing
-def classify_query(query: str) -> List[str]:
-    """Classify which datasets are relevant for the query"""
-    query_lower = query.lower()
-    relevant_datasets = []
-    
-    # Air quality keywords
-    if any(keyword in query_lower for keyword in ['air quality', 'aqi', 'pollution', 'pm2.5', 'pm10', 'pollutant']):
-        relevant_datasets.append('aqi')
-    
-    # Health/disease keywords
-    if any(keyword in query_lower for keyword in ['disease', 'outbreak', 'health', 'dengue', 'malaria', 'illness']):
-        relevant_datasets.append('idsp')
-    
-    # Population keywords
-    if any(keyword in query_lower for keyword in ['population', 'demographic', 'people', 'growth']):
-        relevant_datasets.append('population')
-    
-    # Vehicle keywords
-    if any(keyword in query_lower for keyword in ['vehicle', 'car', 'bike', 'transport', 'registration', 'electric']):
-        relevant_datasets.append('vahan')
-    
-    # If no specific dataset identified, include all
-    if not relevant_datasets:
-        relevant_datasets = ['aqi', 'idsp', 'population', 'vahan']
-    
-    return relevant_datasets
+# Summarize one dataset for the AI context
+def summarize_dataset(dataset_name: str, df: pd.DataFrame) -> str:
+    """Shape, sample rows and summary statistics for one dataset"""
+    summary_parts = []
+    summary_parts.append(f"\n{dataset_name.upper()} Dataset:")
+    summary_parts.append(f"Shape: {df.shape}")
+    summary_parts.append(f"Columns: {list(df.columns)}")
+    
+    # Add sample data (first few rows)
+    if len(df) > 0:
+        summary_parts.append("Sample data:")
+        summary_parts.append(df.head(3).to_string())
+    
+    # Add summary statistics for numeric columns
+    numeric_cols = df.select_dtypes(include=['number']).columns
+    if len(numeric_cols) > 0:
+        summary_parts.append("\nSummary Statistics:")
+        summary_parts.append(df[numeric_cols].describe().to_string())
+    
+    return "\n".join(summary_parts)
 
 # Build context for AI
 def build_context(query: str, datasets: Dict) -> str:
     """Build context from relevant datasets for AI processing"""
     relevant_datasets = classify_query(query)
-    context_parts = []
-    
-    context_parts.append(f"User Query: {query}\n")
-    context_parts.append("Available Data:\n")
-    
-    for dataset_name in relevant_datasets:
-        if dataset_name in datasets:
-            df = datasets[dataset_name]
-            context_parts.append(f"\n{dataset_name.upper()} Dataset:")
-            context_parts.append(f"Shape: {df.shape}")
-            context_parts.append(f"Columns: {list(df.columns)}")
-            
-            # Add sample data (first few rows)
-            if len(df) > 0:
-                context_parts.append("Sample data:")
-                context_parts.append(df.head(3).to_string())
-            
-            # Add summary statistics for numeric columns
-            numeric_cols = df.select_dtypes(include=['number']).columns
-            if len(numeric_cols) > 0:
-                context_parts.append("\nSummary Statistics:")
-                context_parts.append(df[numeric_cols].describe().to_string())
-    
-    return "\n".join(context_parts)
+    summaries = {
+        dataset_name: summarize_dataset(dataset_name, datasets[dataset_name])
+        for dataset_name in relevant_datasets
+        if dataset_name in datasets
+    }
+    # Figures that depend on the question go after the summaries, so the prefix stays stable
+    derived = []
+    # Outbreaks flagged by the background scan, once it has finished
+    if "idsp" in summaries:
+        derived.append(outbreak_context(datasets["idsp"]))
+    # Rolling and monthly AQI trends for the areas in the question (worst areas otherwise)
+    if "aqi" in summaries:
+        plan = plan_query(query, build_vocabulary(datasets))
+        derived.append(trend_context(datasets["aqi"], plan.states, plan.places))
+    # Per-capita rates joined on the state-year population projections
+    for dataset_name in ("idsp", "vahan", "population"):
+        if dataset_name in summaries:
+            derived.append(per_capita_context(datasets, dataset_name))
+    
+    # The query is not part of the context; it goes last in the prompt
+    return assemble_context(datasets, summaries, derived)
 
 # Generate AI response
-def generate_ai_response(query: str, context: str, groq_client) -> str:
-    """Generate AI response using Groq API"""
+def generate_ai_response(query: str, context: str, groq_client, model_override: str = None,
+                         datasets: Dict = None, mode: str = "summary") -> str:
+    """Generate AI response using Groq API
+
+    In "sql" mode the model writes a query that runs locally and only narrates
+    its result; if that fails the summary context is used as before.
+    """
+    st.session_state.last_sql_answer = None
+    if mode == "sql" and datasets:
+        try:
+            sql_answer = answer_with_sql(query, datasets, groq_client, model_override)
+            st.session_state.last_sql_answer = sql_answer
+            return sql_answer.answer
+        except Exception as e:
+            print(f"NL to SQL failed ({e}), answering from dataset summaries")
+    
     try:
-        # Get model from environment or use default
-        model_name = os.getenv("GROQ_MODEL", "llama-3.1-70b-versatile")
+        # Route simple questions to the small model, multi-dataset analysis to the large one
+        model_name, _ = model_router.choose(plan_query(query, build_vocabulary(datasets) if datasets else None), len(context), override=model_override)
         
         system_prompt = """You are an AI assistant specialized in analyzing air quality, health, population, and vehicle data for India. 
 
@@ -609,191 +647,180 @@ def generate_ai_response(query: str, context: str, groq_client) -> str:
         8. DO NOT include any code snippets in your responses - focus only on the analysis and insights
         9. Structure your response in clear sections with headings, bullet points, and numerical data
         
-        Always ground your responses in the actual data provided and include source citations."""
+        Always ground your responses in the actual data provided and include source citations.
         
-        user_prompt = f"""Context Data:\n{context}\n\nPlease analyze this data and provide insights to answer the user's question. Be specific and cite the data sources. DO NOT include any code snippets in your response. Just focus on explaining the insights from the data in a clear, easy-to-understand way with bullet points and data citations."""
+        Please analyze the context data and provide insights to answer the user's question. Be specific and cite the data sources. DO NOT include any code snippets in your response. Just focus on explaining the insights from the data in a clear, easy-to-understand way with bullet points and data citations."""
         
-        chat_completion = groq_client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
+        # Identical prompts already in flight share one upstream call
+        started = time.perf_counter()
+        chat_completion = create_chat_completion(
+            groq_client,
+            messages=build_messages(system_prompt, context, query),
             model=model_name,
             temperature=0.1,
             max_tokens=1000,
             stream=False
         )
+        model_router.record_latency(model_name, time.perf_counter() - started)
         
         return chat_completion.choices[0].message.content
         
     except Exception as e:
         return f"❌ Error generating response: {str(e)}. Please check your API key and try again."
 
+# Chart builders - each depends only on its dataset, so figures are cached per dataset version
+def build_aqi_by_city_chart(df: pd.DataFrame):
+    return make_figure(
+        'bar', aggregates.get(df, 'top_polluted_areas').head(10), CHART_THEME,
+        x='area', 
+        y='aqi',
+        title='Air Quality Index by City',
+        color='aqi',
+        color_continuous_scale='Reds',
+        text='aqi',
+        labels=AGGREGATE_LABELS,
+        height=450,
+        traces=dict(texttemplate='%{text:.0f}', textposition='outside')
+    )
+
+def build_population_share_chart(df: pd.DataFrame):
+    # Pie chart for distribution
+    return make_figure(
+        'pie', aggregates.get(df, 'population_by_state').head(8), CHART_THEME,
+        values='population',
+        names='state',
+        title='Population Distribution by State',
+        labels=AGGREGATE_LABELS,
+        hole=0.4
+    )
+
+def build_population_ranked_chart(df: pd.DataFrame):
+    # Bar chart for easier comparison
+    return make_figure(
+        'bar', aggregates.get(df, 'population_by_state').head(8), CHART_THEME,
+        x='state',
+        y='population',
+        title='Population by State (Ranked)',
+        text='population',
+        labels=AGGREGATE_LABELS,
+        layout=dict(xaxis={'categoryorder': 'total descending'}),
+        traces=dict(texttemplate='%{text:,.0f}', textposition='outside')
+    )
+
+def build_vehicle_scatter_chart(df: pd.DataFrame):
+    return make_figure(
+        'scatter', df, CHART_THEME,
+        x='State',
+        y='Registrations',
+        size='Registrations',
+        color='Fuel_Type',
+        title='Vehicle Registrations by State and Fuel Type',
+        hover_name='State',
+        render_mode=render_mode(len(df)),
+        height=450
+    )
+
+def build_fuel_mix_chart(df: pd.DataFrame):
+    # Registrations by fuel type
+    return make_figure(
+        'bar', aggregates.get(df, 'fuel_mix'), CHART_THEME,
+        x='fuel',
+        y='registrations',
+        title='Vehicle Registrations by Fuel Type',
+        color='fuel',
+        labels=AGGREGATE_LABELS
+    )
+
+def build_disease_cases_chart(df: pd.DataFrame):
+    # Cases per disease
+    return make_figure(
+        'bar', aggregates.get(df, 'disease_totals'), CHART_THEME,
+        x='disease',
+        y='cases',
+        title='Disease Cases Distribution',
+        color='cases',
+        text='cases',
+        labels=AGGREGATE_LABELS,
+        height=400,
+        traces=dict(textposition='outside')
+    )
+
+def build_state_cases_chart(df: pd.DataFrame):
+    # State-wise distribution
+    return make_figure(
+        'pie', aggregates.get(df, 'state_case_totals').head(6), CHART_THEME,
+        values='cases',
+        names='state',
+        title='Disease Cases by State',
+        labels=AGGREGATE_LABELS
+    )
+
 # Create visualizations
 def create_visualization(datasets: Dict, query: str):
     """Create relevant visualizations based on query and data"""
-    query_lower = query.lower()
+    plan = plan_query(query, build_vocabulary(datasets))
+    selection = select_charts(plan)
     st.markdown("### 📊 Data Visualizations")
     st.markdown("Here are some visual insights related to your query:")
     
     # Create a visualization counter to track if any were created
     visualizations_created = 0
     
-    # Air Quality Visualization - Always show if data is available
-    if 'aqi' in datasets:
+    # Time series filtered to the states, places and diseases in the question
+    timeseries_titles = {'idsp': "#### 🏥 Health Trend", 'aqi': "#### 🌬️ Air Quality Trend"}
+    for name in selection.timeseries:
+        if name in datasets:
+            st.markdown(timeseries_titles[name])
+            render_timeseries(datasets[name], name, plan, CHART_THEME, use_container_width=True)
+            visualizations_created += 1
+    
+    # Air Quality Visualization
+    if 'aqi' in datasets and 'aqi' in selection.overview:
         df = datasets['aqi']
-        if 'AQI' in df.columns and 'City' in df.columns:
+        if aggregates.available(df, 'top_polluted_areas'):
             st.markdown("#### 🌬️ Air Quality Analysis")
-            fig = px.bar(
-                df.head(10), 
-                x='City', 
-                y='AQI',
-                title='Air Quality Index by City',
-                color='AQI',
-                color_continuous_scale='Reds',
-                text='AQI'
-            )
-            fig.update_layout(
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                font_color='#f0f9ff',
-                height=450
-            )
-            fig.update_traces(textposition='outside')
-            st.plotly_chart(fig, use_container_width=True)
+            render_chart(df, 'aqi_by_city', CHART_THEME, build_aqi_by_city_chart, use_container_width=True)
             st.info("💡 **Understanding AQI**: 0-50 Good, 51-100 Moderate, 101-150 Unhealthy for Sensitive Groups, 151+ Unhealthy")
             visualizations_created += 1
     
-    # Population Visualization - Always show if data is available
-    if 'population' in datasets:
+    # Population Visualization
+    if 'population' in datasets and 'population' in selection.overview:
         df = datasets['population']
-        if 'Total_Population' in df.columns and 'State' in df.columns:
+        if aggregates.available(df, 'population_by_state'):
             st.markdown("#### 👥 Population Analysis")
             
             # Create two visualizations for population data
             col1, col2 = st.columns(2)
             
             with col1:
-                # Pie chart for distribution
-                fig1 = px.pie(
-                    df.head(8),
-                    values='Total_Population',
-                    names='State',
-                    title='Population Distribution by State',
-                    hole=0.4
-                )
-                fig1.update_layout(
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    font_color='#f0f9ff'
-                )
-                st.plotly_chart(fig1, use_container_width=True)
+                render_chart(df, 'population_share', CHART_THEME, build_population_share_chart, use_container_width=True)
             
             with col2:
-                # Bar chart for easier comparison
-                fig2 = px.bar(
-                    df.head(8).sort_values('Total_Population', ascending=False),
-                    x='State',
-                    y='Total_Population',
-                    title='Population by State (Ranked)',
-                    text='Total_Population'
-                )
-                fig2.update_layout(
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    font_color='#f0f9ff',
-                    xaxis={'categoryorder': 'total descending'}
-                )
-                fig2.update_traces(texttemplate='%{text:,.0f}', textposition='outside')
-                st.plotly_chart(fig2, use_container_width=True)
+                render_chart(df, 'population_ranked', CHART_THEME, build_population_ranked_chart, use_container_width=True)
             
             visualizations_created += 1
     
-    # Vehicle Registration Visualization - Always show if data is available
-    if 'vahan' in datasets:
+    # Vehicle Registration Visualization
+    if 'vahan' in datasets and 'vahan' in selection.overview:
         df = datasets['vahan']
-        if 'Registrations' in df.columns and 'State' in df.columns:
+        if aggregates.available(df, 'fuel_mix'):
             st.markdown("#### 🚗 Vehicle Registration Analysis")
-            
-            # Scatter plot
-            fig = px.scatter(
-                df,
-                x='State',
-                y='Registrations',
-                size='Registrations',
-                color='Fuel_Type',
-                title='Vehicle Registrations by State and Fuel Type',
-                hover_name='State'
-            )
-            fig.update_layout(
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                font_color='#f0f9ff',
-                height=450
-            )
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # Add a bar chart showing registrations by fuel type
-            fuel_data = df.groupby('Fuel_Type')['Registrations'].sum().reset_index()
-            fig2 = px.bar(
-                fuel_data,
-                x='Fuel_Type',
-                y='Registrations',
-                title='Vehicle Registrations by Fuel Type',
-                color='Fuel_Type'
-            )
-            fig2.update_layout(
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                font_color='#f0f9ff'
-            )
-            st.plotly_chart(fig2, use_container_width=True)
-            
+            # Row-level scatter needs the per-state sample columns
+            if {'State', 'Registrations', 'Fuel_Type'} <= set(df.columns):
+                render_chart(df, 'vehicle_scatter', CHART_THEME, build_vehicle_scatter_chart, use_container_width=True)
+            render_chart(df, 'fuel_mix', CHART_THEME, build_fuel_mix_chart, use_container_width=True)
             visualizations_created += 1
             
-    # Health/Disease Visualization - Always show if data is available
-    if 'idsp' in datasets:
+    # Health/Disease Visualization
+    if 'idsp' in datasets and 'idsp' in selection.overview:
         df = datasets['idsp']
-        if 'Disease' in df.columns and 'Cases' in df.columns:
+        if aggregates.available(df, 'disease_totals'):
             st.markdown("#### 🏥 Health & Disease Analysis")
+            render_chart(df, 'disease_cases', CHART_THEME, build_disease_cases_chart, use_container_width=True)
             
-            # Group by disease
-            disease_data = df.groupby('Disease')['Cases'].sum().reset_index().sort_values('Cases', ascending=False)
-            
-            # Create disease distribution chart
-            fig = px.bar(
-                disease_data,
-                x='Disease',
-                y='Cases',
-                title='Disease Cases Distribution',
-                color='Cases',
-                text='Cases'
-            )
-            fig.update_layout(
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                font_color='#f0f9ff',
-                height=400
-            )
-            fig.update_traces(textposition='outside')
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # If 'State' column exists, show state-wise distribution
-            if 'State' in df.columns:
-                # Create state-wise distribution chart
-                state_data = df.groupby('State')['Cases'].sum().reset_index().sort_values('Cases', ascending=False)
-                fig2 = px.pie(
-                    state_data.head(6),
-                    values='Cases',
-                    names='State',
-                    title='Disease Cases by State'
-                )
-                fig2.update_layout(
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    font_color='#f0f9ff'
-                )
-                st.plotly_chart(fig2, use_container_width=True)
+            # If a state column exists, show state-wise distribution
+            if aggregates.available(df, 'state_case_totals'):
+                render_chart(df, 'state_cases', CHART_THEME, build_state_cases_chart, use_container_width=True)
             
             visualizations_created += 1
             
@@ -805,6 +832,43 @@ def create_visualization(datasets: Dict, query: str):
     st.markdown("**Note**: These visualizations are generated automatically to help you understand the data better.")
 
 # Main app
+def create_sql_console(datasets: Dict):
+    """Analyst SQL box: read-only queries over the loaded datasets, streamed in batches"""
+    with st.expander("Tables"):
+        for name, columns in sql_engine.tables(datasets).items():
+            st.markdown(f"**{name}**: {', '.join(columns)}")
+    
+    sql = st.text_area("SQL Query", "SELECT * FROM air_quality\nWHERE AQI > 150\nORDER BY AQI DESC\nLIMIT 10", height=100)
+    ran = st.button("Run Analysis")
+    if ran:
+        table = st.empty()
+        batches = []
+        start = time.time()
+        try:
+            for batch in sql_engine.stream(sql, datasets):
+                batches.append(batch)
+                # Show rows as they arrive rather than after the whole fetch
+                table.dataframe(pd.concat(batches, ignore_index=True), use_container_width=True)
+            result = pd.concat(batches, ignore_index=True)
+            st.session_state.sql_result = {"sql": sql, "rows": result, "seconds": time.time() - start}
+        except (ValueError, TimeoutError) as e:
+            st.session_state.pop("sql_result", None)
+            st.error(f"❌ {e}")
+        except Exception as e:
+            st.session_state.pop("sql_result", None)
+            st.error(f"❌ Query failed: {e}")
+    
+    result = st.session_state.get("sql_result")
+    if result and result["sql"] == sql:
+        rows = result["rows"]
+        if not ran:
+            st.dataframe(rows, use_container_width=True)
+        truncated = " (row limit reached)" if len(rows) >= SQL_MAX_ROWS else ""
+        st.caption(f"{len(rows):,} rows in {result['seconds']:.2f}s via {sql_engine.backend}{truncated}")
+        if st.session_state.show_advanced:
+            with st.expander("Query Plan"):
+                st.code(sql_engine.explain(sql, datasets))
+
 def main():
     # Display Available Data section
     st.markdown("## 📊 Available Data")
@@ -910,6 +974,20 @@ def main():
         # Advanced Features Toggle
         st.checkbox("Show Advanced Features", key="show_advanced")
         
+        # Answer mode - SQL mode answers from a locally run query instead of sample rows
+        answer_labels = {"summary": "Dataset summaries", "sql": "Query the data (SQL)"}
+        st.radio("Answer Mode", list(answer_labels), format_func=answer_labels.get, key="answer_mode")
+        
+        # Model selection - "Auto" lets the router pick per question
+        model_options = ["Auto (route by question)", model_router.small_model, model_router.large_model]
+        current_override = st.session_state.get("model_override")
+        selected_model = st.selectbox(
+            "AI Model",
+            model_options,
+            index=model_options.index(current_override) if current_override in model_options else 0
+        )
+        st.session_state.model_override = None if selected_model == model_options[0] else selected_model
+        
         # Display Mode
         st.checkbox("Dark Mode", key="dark_mode")
             
@@ -923,10 +1001,33 @@ def main():
             st.success("🟢 Groq API Connected")
         else:
             st.error("🔴 Groq API Not Connected")
-        
+
+        # Client-side rate limiter health
+        if st.session_state.show_advanced:
+            limiter_stats = rate_limiter.stats()
+            st.caption(
+                f"⏳ LLM queue: {limiter_stats['queue_depth']} waiting · "
+                f"avg wait {limiter_stats['avg_wait']:.1f}s · max wait {limiter_stats['max_wait']:.1f}s"
+            )
+            sql_stats = sql_answer_cache.stats()
+            st.caption(f"🗄️ SQL answers cached: {sql_stats['entries']} · hits {sql_stats['hits']} · misses {sql_stats['misses']}")
+            prefix_stats = prefix_meter.stats()
+            st.caption(
+                f"♻️ Prompt prefix reuse: {prefix_stats['prefix_reuse_ratio']:.0%} · "
+                f"provider-cached tokens: {prefix_stats['cached_token_ratio']:.0%}"
+            )
+
         # Dataset refresh
         if st.button("🔄 Refresh Data"):
             st.cache_data.clear()
+            figure_cache.clear()
+            aggregates.clear()
+            sql_answer_cache.clear()
+            alert_engine.clear()
+            risk_index.clear()
+            outbreak_detector.clear()
+            aqi_trends.clear()
+            per_capita.clear()
             st.rerun()
             
         # Documentation Link
@@ -986,7 +1087,8 @@ def main():
                     context = build_context(query, datasets)
                     
                     # Generate AI response
-                    response = generate_ai_response(query, context, st.session_state.groq_client)
+                    response = generate_ai_response(query, context, st.session_state.groq_client, st.session_state.get("model_override"),
+                                                    datasets=datasets, mode=st.session_state.get("answer_mode", "summary"))
                     
                     # Add bot response
                     st.session_state.messages.append({"role": "assistant", "content": response})
@@ -994,7 +1096,14 @@ def main():
                     # Display bot response with text analysis
                     st.markdown(f'<div class="bot-message">{response}</div>', unsafe_allow_html=True)
                     
-                    # Always create visualizations for every query
+                    # The query and result an SQL-mode answer is based on
+                    sql_answer = st.session_state.get("last_sql_answer")
+                    if sql_answer is not None:
+                        with st.expander("🗄️ Query behind this answer" + (" (cached)" if sql_answer.cached else "")):
+                            st.code(sql_answer.sql, language="sql")
+                            st.dataframe(sql_answer.result, use_container_width=True)
+                    
+                    # Charts relevant to this query
                     st.markdown('<div class="glass-card">', unsafe_allow_html=True)
                     create_visualization(datasets, query)
                     st.markdown('</div>', unsafe_allow_html=True)
@@ -1014,14 +1123,26 @@ def main():
             st.subheader("📊 Executive Dashboard")
             
             if datasets:
+                # Precomputed per dataset version, so this is a lookup
+                try:
+                    risk = risk_index.get(datasets)
+                except Exception as e:
+                    st.warning(f"⚠️ Risk summary unavailable: {e}")
+                    risk = RiskSummary(score=None, states=pd.DataFrame(), critical_aqi_areas=0,
+                                       outbreak_districts=0, compliance_pct=None)
+                
                 # Key Performance Indicators
-                st.metric("Critical Air Quality Alerts", "3", delta="-2")
-                st.metric("Disease Outbreaks", "5", delta="0")
-                st.metric("Environmental Compliance", "92%", delta="4%")
+                st.metric("Critical Air Quality Alerts", f"{risk.critical_aqi_areas}")
+                st.metric("Disease Outbreaks", f"{risk.outbreak_districts}")
+                st.metric("Environmental Compliance", f"{risk.compliance_pct:.0f}%" if risk.compliance_pct is not None else "n/a")
                 
-                # Air Quality Risk Score
-                risk_score = 67
-                st.progress(risk_score/100, text=f"Risk Score: {risk_score}/100")
+                # Composite risk: AQI severity, cases per capita and diesel share
+                if risk.score is not None:
+                    st.progress(risk.score / 100, text=f"Risk Score: {risk.score:.0f}/100 "
+                                                       f"({risk.scored_states} of {len(risk.states)} states scored)")
+                    if st.session_state.show_advanced:
+                        with st.expander("Highest-risk states"):
+                            st.dataframe(risk.states.head(10), use_container_width=True, hide_index=True)
                 
                 # Quick Reports
                 st.subheader("📑 Quick Reports")
@@ -1045,16 +1166,24 @@ def main():
                 selected_analysis = st.selectbox("Analysis Type", analysis_options)
                 
                 if selected_analysis == "Custom Query":
-                    st.text_area("SQL Query", "SELECT * FROM air_quality\nWHERE AQI > 150\nORDER BY AQI DESC\nLIMIT 10", height=100)
-                    st.button("Run Analysis")
+                    create_sql_console(datasets)
                 
                 # Export Options
                 st.subheader("📤 Export Options")
-                export_col1, export_col2 = st.columns(2)
-                with export_col1:
-                    st.button("Export to CSV")
-                with export_col2:
-                    st.button("Export to Excel")
+                # The last SQL result is re-run and streamed; datasets are exported in chunks
+                sql_result = st.session_state.get("sql_result")
+                export_sources = (["SQL result"] if sql_result else []) + [
+                    name for name, df in datasets.items() if isinstance(df, pd.DataFrame)
+                ]
+                export_source = st.selectbox("Export", export_sources, key="analyst_export_source")
+                if export_source == "SQL result":
+                    export_chunks = lambda: sql_engine.stream(sql_result["sql"], datasets, max_rows=EXPORT_MAX_ROWS,
+                                                              batch_rows=EXPORT_CHUNK_ROWS)
+                    export_name = "query_result"
+                else:
+                    export_chunks = lambda: frame_chunks(datasets[export_source])
+                    export_name = export_source
+                render_export_controls(export_chunks, export_name, key="analyst_export")
                     
                 # Advanced Filtering
                 if st.session_state.show_advanced:
@@ -1067,13 +1196,35 @@ def main():
             st.subheader("🔔 Alerts & Monitoring")
             
             if datasets:
+                # Alert rules - thresholds are adjustable with advanced features on
+                rules = DEFAULT_RULES
+                if st.session_state.show_advanced:
+                    with st.expander("⚙️ Alert Rules"):
+                        categories = list(AQI_CATEGORIES)[2:]
+                        min_category = st.selectbox("Alert from AQI category", categories, index=categories.index("Poor"))
+                        growth_pct = st.slider("Weekly case growth (%)", 10, 300, 50, 10)
+                        deaths = st.slider("Deaths per district per week", 1, 20, 3)
+                        outbreak_c2 = st.slider("Outbreak sensitivity (EARS C2)", 1.0, 10.0, 3.0, 0.5)
+                        rules = alert_rules(min_category, growth_pct, deaths, outbreak_c2=outbreak_c2)
+                
+                # Shared across sessions; only new days/weeks of data are re-summarized
+                alerts = recent_alerts(alert_engine.evaluate(datasets, rules))
+                
                 # Alert Status
-                st.metric("Active Alerts", "3", delta="-1")
+                critical = int((alerts["severity"] == "critical").sum())
+                st.metric("Active Alerts", f"{len(alerts)}", delta=f"{critical} critical", delta_color="off")
                 
-                # Alert List
-                st.info("🚨 Delhi AQI exceeds threshold (245)")
-                st.warning("⚠️ Mumbai disease cases rising (23%)")
-                st.success("✅ Chennai air quality improving (33%)")
+                # Alert List - most recent and most severe first
+                if alerts.empty:
+                    st.success("✅ No alerts in the latest data")
+                for alert in alerts.head(5).itertuples():
+                    if alert.severity == "critical":
+                        st.error(f"🚨 {alert.message} · {alert.period:%d %b %Y}")
+                    else:
+                        st.warning(f"⚠️ {alert.message} · {alert.period:%d %b %Y}")
+                if len(alerts) > 5:
+                    with st.expander(f"All {len(alerts)} alerts"):
+                        st.dataframe(alerts, use_container_width=True, hide_index=True)
                 
                 # Action Items
                 st.subheader("📋 Action Items")
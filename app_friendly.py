@@ -12,6 +12,16 @@ import altair as alt
 from pygments import highlight
 from pygments.lexers import PythonLexer
 from pygments.formatters import HtmlFormatter
+from llm_gateway import create_chat_completion, model_router
+from query_planner import build_vocabulary, plan_query
+from prompt_layout import assemble_context, build_messages
+from datastore import stamp_version
+from llm_backends import create_llm_client, requires_api_key
+from aggregates import AGGREGATE_LABELS, aggregates
+from charts import figure_cache, make_figure, render_chart, render_timeseries, select_charts
+
+# Figure cache key for this app's chart styling
+CHART_THEME = "friendly"
 
 # Page configuration
 st.set_page_config(
@@ -862,6 +872,10 @@ def initialize_groq_client():
     # Fallback API key if the primary one fails
     fallback_api_key = "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"
     
+    # Mock and replay backends run offline without a key (see llm_backends.py)
+    if not requires_api_key():
+        return create_llm_client()
+    
     try:
         # Try primary API key first
         api_key = os.getenv("GROQ_API_KEY")
@@ -870,7 +884,7 @@ def initialize_groq_client():
             api_key = fallback_api_key
         
         try:
-            client = Groq(api_key=api_key)
+            client = create_llm_client(api_key)
             # Test the client with a minimal API call
             client.chat.completions.create(
                 messages=[{"role": "user", "content": "test"}],
@@ -883,7 +897,7 @@ def initialize_groq_client():
             if api_key != fallback_api_key:
                 print(f"Error with primary API key. Trying fallback key...")
                 try:
-                    client = Groq(api_key=fallback_api_key)
+                    client = create_llm_client(fallback_api_key)
                     # Test the fallback client
                     client.chat.completions.create(
                         messages=[{"role": "user", "content": "test"}],
@@ -942,10 +956,16 @@ def load_datasets():
                     datasets[key] = create_sample_data(key)
             else:
                 datasets[key] = create_sample_data(key)
+            
+            # Stamp the content version; caches and the prompt layout key on it
+            stamp_version(datasets[key])
+        
+        # Chart-ready tables, computed once per dataset version
+        aggregates.precompute(datasets)
         
         return datasets
     except Exception:
-        return {key: create_sample_data(key) for key in ["aqi", "idsp", "population", "vahan"]}
+        return {key: stamp_version(create_sample_data(key)) for key in ["aqi", "idsp", "population", "vahan"]}
 
 def create_sample_data(dataset_type):
     """Create sample data for demonstration"""
@@ -984,13 +1004,15 @@ def create_sample_data(dataset_type):
         })
     return pd.DataFrame()
 
-def generate_ai_response(query: str, context: str, groq_client) -> str:
+def generate_ai_response(query: str, context: str, groq_client, model_override: str = None,
+                         datasets: Dict = None) -> str:
     """Generate AI response using Groq API"""
     if not groq_client:
         return "I'm sorry, but I'm currently unable to connect to my AI brain due to API key issues. Please check your API key configuration and try again later. 🤖💭"
     
     try:
-        model_name = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
+        # Route simple questions to the small model, multi-dataset analysis to the large one
+        model_name, _ = model_router.choose(plan_query(query, build_vocabulary(datasets) if datasets else None), len(context), override=model_override)
         
         system_prompt = """You are a friendly and helpful AI assistant specialized in environmental health and data analysis. 
 
@@ -1020,59 +1042,59 @@ Code snippet guidelines:
 - Include brief comments explaining what the code does
 - Keep code simple and readable
 
-Always be helpful, accurate, and user-friendly!"""
-        
-        user_prompt = f"""Here's some data to help answer the user's question:
-
-{context}
-
-User Question: {query}
+Always be helpful, accurate, and user-friendly!
 
-Please provide a helpful, easy-to-understand response based on this data. Use simple language and organize your answer clearly. 
+Please provide a helpful, easy-to-understand response based on the data you are given. Use simple language and organize your answer clearly. 
 
 IMPORTANT: Always include a Python code snippet that demonstrates how to analyze this data. Format the code in a markdown code block with ```python at the start and ``` at the end. The code should show data loading, filtering, analysis, and visualization steps relevant to the question."""
         
-        chat_completion = groq_client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
+        # Identical prompts already in flight share one upstream call
+        started = time.perf_counter()
+        chat_completion = create_chat_completion(
+            groq_client,
+            messages=build_messages(system_prompt, context, query),
             model=model_name,
             temperature=0.2,
             max_tokens=800,
             stream=False
         )
+        model_router.record_latency(model_name, time.perf_counter() - started)
         
         return chat_completion.choices[0].message.content
         
     except Exception as e:
         return f"I'm sorry, I'm having trouble connecting to my AI brain right now. Error: {str(e)}. Please try again in a moment! 🤖💭"
 
+def summarize_dataset(name: str, df: pd.DataFrame) -> str:
+    """Record count, sample rows and key statistics for one dataset"""
+    summary_parts = [f"\n{name.upper()} Data Summary:"]
+    summary_parts.append(f"- {len(df)} records available")
+    summary_parts.append(f"- Columns: {', '.join(df.columns.tolist())}")
+    
+    # Add sample data
+    summary_parts.append("\nSample data:")
+    summary_parts.append(df.head(3).to_string(index=False))
+    
+    # Add key statistics
+    numeric_cols = df.select_dtypes(include=['number']).columns
+    if len(numeric_cols) > 0:
+        for col in numeric_cols[:2]:  # Limit to 2 numeric columns
+            avg_val = df[col].mean()
+            max_val = df[col].max()
+            min_val = df[col].min()
+            summary_parts.append(f"- {col}: Average {avg_val:.1f}, Range {min_val:.1f} to {max_val:.1f}")
+    
+    return "\n".join(summary_parts)
+
 def build_context(query: str, datasets: Dict) -> str:
     """Build context from datasets for AI processing"""
-    context_parts = [f"User is asking: {query}\n"]
-    
-    # Add relevant data summaries
-    for name, df in datasets.items():
-        if isinstance(df, pd.DataFrame) and len(df) > 0:
-            context_parts.append(f"\n{name.upper()} Data Summary:")
-            context_parts.append(f"- {len(df)} records available")
-            context_parts.append(f"- Columns: {', '.join(df.columns.tolist())}")
-            
-            # Add sample data
-            context_parts.append("\nSample data:")
-            context_parts.append(df.head(3).to_string(index=False))
-            
-            # Add key statistics
-            numeric_cols = df.select_dtypes(include=['number']).columns
-            if len(numeric_cols) > 0:
-                for col in numeric_cols[:2]:  # Limit to 2 numeric columns
-                    avg_val = df[col].mean()
-                    max_val = df[col].max()
-                    min_val = df[col].min()
-                    context_parts.append(f"- {col}: Average {avg_val:.1f}, Range {min_val:.1f} to {max_val:.1f}")
-    
-    return "\n".join(context_parts)
+    # Add relevant data summaries; the query itself goes last in the prompt
+    summaries = {
+        name: summarize_dataset(name, df)
+        for name, df in datasets.items()
+        if isinstance(df, pd.DataFrame) and len(df) > 0
+    }
+    return assemble_context(datasets, summaries)
 
 def create_welcome_section():
     """Create the enhanced welcome section"""
@@ -1303,159 +1325,109 @@ def create_data_overview(datasets):
                 </div>
                 """, unsafe_allow_html=True)
 
+def build_aqi_chart(df):
+    """Horizontal AQI bars for the cleanest areas"""
+    cleanest = aggregates.get(df, 'top_polluted_areas').tail(8).iloc[::-1]
+    return make_figure(
+        'bar', cleanest, CHART_THEME,
+        x='aqi',
+        y='area',
+        orientation='h',
+        title='Air Quality Index (AQI) - Lower is Better',
+        color='aqi',
+        color_continuous_scale=['green', 'yellow', 'orange', 'red'],
+        text='aqi',
+        layout=dict(showlegend=False, xaxis_title="Air Quality Index (AQI)", yaxis_title="City"),
+        traces=dict(texttemplate='%{text:.0f}', textposition='inside', textfont_color='#f0f9ff')
+    )
+
+def build_population_chart(df):
+    """Population share donut"""
+    return make_figure(
+        'pie', aggregates.get(df, 'population_by_state').head(6), CHART_THEME,
+        values='population',
+        names='state',
+        title='Population Distribution Across States',
+        labels=AGGREGATE_LABELS,
+        hole=0.4
+    )
+
+def build_fuel_chart(df):
+    """Total registrations per fuel type"""
+    return make_figure(
+        'bar', aggregates.get(df, 'fuel_mix'), CHART_THEME,
+        x='fuel',
+        y='registrations',
+        title='Total Vehicle Registrations by Fuel Type',
+        color='fuel',
+        text='registrations',
+        labels=AGGREGATE_LABELS,
+        layout=dict(xaxis_title="Fuel Type", yaxis_title="Total Registrations"),
+        traces=dict(textposition='outside')
+    )
+
+def build_disease_chart(df):
+    """Cases per disease, top 8"""
+    return make_figure(
+        'bar', aggregates.get(df, 'disease_totals').head(8), CHART_THEME,
+        x='disease',
+        y='cases',
+        title='Disease Cases Distribution',
+        color='disease',
+        text='cases',
+        labels=AGGREGATE_LABELS,
+        traces=dict(textposition='outside')
+    )
+
 def create_simple_visualizations(datasets, query):
-    """Create simple, easy-to-understand visualizations for every query"""
-    # Always display visualizations regardless of query
+    """Create simple, easy-to-understand visualizations for the datasets the query is about"""
+    plan = plan_query(query, build_vocabulary(datasets))
+    selection = select_charts(plan)
     st.markdown("### 📊 Visual Insights")
     st.markdown("Here are some visual insights to help you understand the data better:")
     
     # Track if we created any visualizations
     visualizations_created = 0
     
-    # Air Quality Chart - Always show if available
-    if 'aqi' in datasets:
+    # Trend for the places, states or diseases named in the question
+    timeseries_titles = {'idsp': "#### 🏥 Cases Over Time", 'aqi': "#### 🌬️ Air Quality Over Time"}
+    for name in selection.timeseries:
+        if name in datasets:
+            st.markdown(timeseries_titles[name])
+            if render_timeseries(datasets[name], name, plan, CHART_THEME, use_container_width=True):
+                visualizations_created += 1
+    
+    # Figures are cached per dataset version, so repeat turns re-send the same specs
+    # Air Quality Chart
+    if 'aqi' in datasets and 'aqi' in selection.overview:
         df = datasets['aqi']
-        # Use real CSV columns if present, else fallback to sample data columns
-        if (('aqi_value' in df.columns and 'area' in df.columns) or ('AQI' in df.columns and 'City' in df.columns)):
+        if aggregates.available(df, 'top_polluted_areas'):
             st.markdown("#### 🌬️ Air Quality by City")
-            if 'aqi_value' in df.columns and 'area' in df.columns:
-                df_sorted = df.sort_values('aqi_value', ascending=True)
-                fig = px.bar(
-                    df_sorted.head(8),
-                    x='aqi_value',
-                    y='area',
-                    orientation='h',
-                    title='Air Quality Index (AQI) - Lower is Better',
-                    color='aqi_value',
-                    color_continuous_scale=['green', 'yellow', 'orange', 'red'],
-                    text='aqi_value'
-                )
-                fig.update_layout(
-                    height=400,
-                    showlegend=False,
-                    plot_bgcolor='rgba(15, 23, 42, 0.6)',
-                    paper_bgcolor='rgba(15, 23, 42, 0.6)',
-                    font_family="Inter",
-                    font_color="#f0f9ff",
-                    title_font_size=16,
-                    xaxis_title="Air Quality Index (AQI)",
-                    yaxis_title="City"
-                )
-                fig.update_traces(textposition='inside', textfont_color='#f0f9ff')
-                st.plotly_chart(fig, use_container_width=True)
-                visualizations_created += 1
-            else:
-                df_sorted = df.sort_values('AQI', ascending=True)
-                fig = px.bar(
-                    df_sorted.head(8),
-                    x='AQI',
-                    y='City',
-                    orientation='h',
-                    title='Air Quality Index (AQI) - Lower is Better',
-                    color='AQI',
-                    color_continuous_scale=['green', 'yellow', 'orange', 'red'],
-                    text='AQI'
-                )
-                fig.update_layout(
-                    height=400,
-                    showlegend=False,
-                    plot_bgcolor='#f0f9ff',
-                    paper_bgcolor='#f0f9ff',
-                    font_family="Inter",
-                    title_font_size=16,
-                    xaxis_title="Air Quality Index (AQI)",
-                    yaxis_title="City"
-                )
-                fig.update_traces(textposition='inside', textfont_color='#f0f9ff')
-                st.plotly_chart(fig, use_container_width=True)
+            render_chart(df, 'aqi_ranked', CHART_THEME, build_aqi_chart, use_container_width=True)
+            visualizations_created += 1
             st.info("💡 **Understanding AQI**: 0-50 Good (Green), 51-100 Moderate (Yellow), 101-150 Unhealthy for Sensitive Groups (Orange), 151+ Unhealthy (Red)")
     
-    # Population Chart - Always show if available
-    if 'population' in datasets:
+    # Population Chart
+    if 'population' in datasets and 'population' in selection.overview:
         df = datasets['population']
-        if 'Total_Population' in df.columns and 'State' in df.columns:
+        if aggregates.available(df, 'population_by_state'):
             st.markdown("#### 👥 Population by State")
-            
-            fig = px.pie(
-                df.head(6),
-                values='Total_Population',
-                names='State',
-                title='Population Distribution Across States',
-                hole=0.4
-            )
-            
-            fig.update_layout(
-                height=400,
-                plot_bgcolor='rgba(15, 23, 42, 0.6)',
-                paper_bgcolor='rgba(15, 23, 42, 0.6)',
-                font_family="Inter",
-                font_color="#f0f9ff",
-                title_font_size=16
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
+            render_chart(df, 'population_share', CHART_THEME, build_population_chart, use_container_width=True)
     
-    # Vehicle Data - Always show if available
-    if 'vahan' in datasets:
+    # Vehicle Data
+    if 'vahan' in datasets and 'vahan' in selection.overview:
         df = datasets['vahan']
-        if 'Registrations' in df.columns and 'Fuel_Type' in df.columns:
+        if aggregates.available(df, 'fuel_mix'):
             st.markdown("#### 🚗 Vehicle Registrations by Fuel Type")
-            
-            fuel_summary = df.groupby('Fuel_Type')['Registrations'].sum().reset_index()
-            
-            fig = px.bar(
-                fuel_summary,
-                x='Fuel_Type',
-                y='Registrations',
-                title='Total Vehicle Registrations by Fuel Type',
-                color='Fuel_Type',
-                text='Registrations'
-            )
-            
-            fig.update_layout(
-                height=400,
-                plot_bgcolor='rgba(15, 23, 42, 0.6)',
-                paper_bgcolor='rgba(15, 23, 42, 0.6)',
-                font_family="Inter",
-                font_color="#f0f9ff",
-                title_font_size=16,
-                xaxis_title="Fuel Type",
-                yaxis_title="Total Registrations"
-            )
-            fig.update_traces(textposition='outside')
-            
-            st.plotly_chart(fig, use_container_width=True)
+            render_chart(df, 'fuel_mix', CHART_THEME, build_fuel_chart, use_container_width=True)
             visualizations_created += 1
             
-    # Health/Disease Data - Always show if available
-    if 'idsp' in datasets:
+    # Health/Disease Data
+    if 'idsp' in datasets and 'idsp' in selection.overview:
         df = datasets['idsp']
-        if 'Disease' in df.columns and 'Cases' in df.columns:
+        if aggregates.available(df, 'disease_totals'):
             st.markdown("#### 🏥 Disease Cases Analysis")
-            
-            # Group by disease
-            disease_data = df.groupby('Disease')['Cases'].sum().reset_index().sort_values('Cases', ascending=False)
-            
-            fig = px.bar(
-                disease_data.head(8),
-                x='Disease',
-                y='Cases',
-                title='Disease Cases Distribution',
-                color='Disease',
-                text='Cases'
-            )
-            
-            fig.update_layout(
-                height=400,
-                plot_bgcolor='rgba(15, 23, 42, 0.6)',
-                paper_bgcolor='rgba(15, 23, 42, 0.6)',
-                font_family="Inter",
-                font_color="#f0f9ff",
-                title_font_size=16
-            )
-            fig.update_traces(textposition='outside')
-            
-            st.plotly_chart(fig, use_container_width=True)
+            render_chart(df, 'disease_cases', CHART_THEME, build_disease_chart, use_container_width=True)
             visualizations_created += 1
     
     # Show a note if visualizations were created
@@ -1498,6 +1470,8 @@ def main():
         
         if st.button("🔄 Refresh Data"):
             st.cache_data.clear()
+            figure_cache.clear()
+            aggregates.clear()
             st.rerun()
     
     # Main content area
@@ -1586,7 +1560,8 @@ def main():
                 if datasets:
                     # Generate response
                     context = build_context(query, datasets)
-                    response = generate_ai_response(query, context, st.session_state.groq_client)
+                    response = generate_ai_response(query, context, st.session_state.groq_client, st.session_state.get("model_override"),
+                                                    datasets=datasets)
                     
                     # Add bot response
                     st.session_state.messages.append({"role": "assistant", "content": response})
@@ -1601,7 +1576,7 @@ def main():
                     </div>
                     """, unsafe_allow_html=True)
                     
-                    # Always create visualizations for every query
+                    # Charts relevant to this query
                     st.markdown('<div class="glass-card">', unsafe_allow_html=True)
                     create_simple_visualizations(datasets, query)
                     st.markdown('</div>', unsafe_allow_html=True)
@@ -0,0 +1,232 @@
+"""
+Clean Air AI Chatbot - AQI Trends
+Day-wise AQI per area as dense arrays: daily values, rolling 7/30-day
+means, monthly means and days per air quality category
+
+Built once per AQI version with cumulative sums and np.add.at rather than
+sorting and grouping rows; trend charts and chat answers slice rows out of
+the arrays.
+"""
+
+import threading
+import warnings
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from alerts import AQI_CATEGORIES, aqi_category
+from datastore import canonical_states, dataset_version, find_column, parse_dates
+
+ROLLING_WINDOWS = (7, 30)
+
+
+def rolling_mean(values: np.ndarray, window: int, min_periods: Optional[int] = None) -> np.ndarray:
+    """Trailing NaN-aware mean along axis 1, via cumulative sums of values and counts"""
+    min_periods = min_periods or (window + 1) // 2
+    valid = ~np.isnan(values)
+    sums = np.cumsum(np.where(valid, values, 0.0), axis=1)
+    counts = np.cumsum(valid, axis=1)
+    sums[:, window:] = sums[:, window:] - sums[:, :-window]
+    counts[:, window:] = counts[:, window:] - counts[:, :-window]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts
+    means[counts < min_periods] = np.nan
+    return means.astype(np.float32)
+
+
+def _fmt(value: float) -> str:
+    return "n/a" if np.isnan(value) else f"{value:.0f}"
+
+
+@dataclass
+class AqiTrends:
+    """Row i of every matrix is area i; daily columns follow `dates`, monthly columns `months`"""
+    states: np.ndarray
+    areas: np.ndarray
+    dates: pd.DatetimeIndex
+    daily: np.ndarray
+    rolling: Dict[int, np.ndarray]
+    months: pd.PeriodIndex
+    monthly: np.ndarray
+    categories: List[str]
+    category_days: np.ndarray
+
+    def rows(self, states: Optional[List[str]] = None, areas: Optional[List[str]] = None) -> np.ndarray:
+        """Area rows matching the given states and/or area names (all rows when neither is given)"""
+        mask = np.ones(len(self.areas), dtype=bool)
+        if states:
+            mask &= np.isin(self.states, states)
+        if areas:
+            mask &= np.isin(self.areas, areas)
+        return np.flatnonzero(mask)
+
+    def series(self, row: int, kind: str = "daily") -> pd.Series:
+        """'daily', '7d', '30d' or 'monthly' values of one area"""
+        if kind == "monthly":
+            return pd.Series(self.monthly[row], index=self.months.to_timestamp(), name=self.areas[row])
+        values = self.daily[row] if kind == "daily" else self.rolling[int(kind.rstrip("d"))][row]
+        return pd.Series(values, index=self.dates, name=self.areas[row])
+
+    def long_frame(self, rows: np.ndarray, kind: str = "daily", combine: Optional[str] = None) -> pd.DataFrame:
+        """date/value/series rows for charts: one series per area, or their mean labelled `combine`"""
+        if kind == "monthly":
+            matrix, index = self.monthly[rows], self.months.to_timestamp()
+        else:
+            matrix = self.daily[rows] if kind == "daily" else self.rolling[int(kind.rstrip("d"))][rows]
+            index = self.dates
+        if combine is not None:
+            with warnings.catch_warnings():
+                # Days that none of the selected areas reported stay NaN
+                warnings.simplefilter("ignore", category=RuntimeWarning)
+                matrix = np.nanmean(matrix, axis=0, keepdims=True)
+            labels = np.array([combine])
+        else:
+            labels = self.areas[rows]
+        frame = pd.DataFrame({
+            "date": np.tile(index, len(labels)),
+            "value": matrix.ravel(),
+            "series": np.repeat(labels, len(index)),
+        })
+        return frame.dropna(subset=["value"]).reset_index(drop=True)
+
+    def summary_lines(self, rows: np.ndarray) -> List[str]:
+        """One line of trend facts per area, for the chat context"""
+        lines = []
+        last = len(self.dates) - 1
+        for row in rows:
+            observed = np.flatnonzero(~np.isnan(self.daily[row]))
+            if not observed.size:
+                continue
+            latest = observed[-1]
+            now_7, now_30 = self.rolling[7][row, latest], self.rolling[30][row, latest]
+            before = latest - 30
+            then_30 = self.rolling[30][row, before] if before >= 0 else np.nan
+            change = f", {now_30 - then_30:+.0f} vs 30 days earlier" if not np.isnan(then_30) else ""
+            month_values = self.monthly[row]
+            worst = (f"; worst month {self.months[int(np.nanargmax(month_values))].strftime('%b %Y')} "
+                     f"({np.nanmax(month_values):.0f})") if np.isfinite(month_values).any() else ""
+            days = ", ".join(f"{name} {count}" for name, count in zip(self.categories, self.category_days[row]) if count)
+            stale = "" if latest == last else f" (last reading {self.dates[latest]:%d %b %Y})"
+            lines.append(
+                f"- {self.areas[row]}, {self.states[row]}{stale}: latest {self.daily[row, latest]:.0f}, "
+                f"7-day mean {_fmt(now_7)}, 30-day mean {_fmt(now_30)}{change}{worst}; days by category: {days}"
+            )
+        return lines
+
+
+def build_aqi_trends(df: pd.DataFrame) -> Optional[AqiTrends]:
+    """Dense per-area arrays from the raw AQI rows; None without date, area and AQI columns"""
+    date_col, area_col, aqi_col = (find_column(df, "aqi", field) for field in ("date", "area", "aqi"))
+    if not (date_col and area_col and aqi_col):
+        return None
+    state_col = find_column(df, "aqi", "state")
+    status_col = find_column(df, "aqi", "status")
+
+    frame = pd.DataFrame({
+        "date": parse_dates(df[date_col]).dt.normalize(),
+        "state": canonical_states(df[state_col]) if state_col else "",
+        "area": df[area_col].astype(str).str.strip(),
+        "aqi": pd.to_numeric(df[aqi_col], errors="coerce"),
+    })
+    if status_col:
+        frame["status"] = df[status_col].astype("string").str.strip().replace("", pd.NA)
+    frame = frame.dropna(subset=["date", "aqi"])
+    if frame.empty:
+        return None
+    # Rows without a reported status take the category of their AQI value
+    frame["status"] = frame["status"].fillna(aqi_category(frame["aqi"])) if status_col else aqi_category(frame["aqi"])
+    frame["status"] = frame["status"].astype(object)
+
+    area_keys = frame[["state", "area"]].astype(str)
+    area_id, area_index = pd.MultiIndex.from_frame(area_keys).factorize()
+    first = frame["date"].min()
+    day_id = (frame["date"] - first).dt.days.to_numpy()
+    n_areas, n_days = len(area_index), int(day_id.max()) + 1
+
+    # Mean of the readings per area and day (several stations can report the same area)
+    sums = np.zeros((n_areas, n_days))
+    counts = np.zeros((n_areas, n_days))
+    np.add.at(sums, (area_id, day_id), frame["aqi"].to_numpy(dtype=float))
+    np.add.at(counts, (area_id, day_id), 1)
+    with np.errstate(invalid="ignore"):
+        daily = sums / counts
+    dates = pd.date_range(first, periods=n_days, freq="D")
+
+    months = dates.to_period("M")
+    month_id, month_index = pd.factorize(months)
+    valid = ~np.isnan(daily)
+    month_sums = np.zeros((n_areas, len(month_index)))
+    month_counts = np.zeros((n_areas, len(month_index)))
+    np.add.at(month_sums.T, month_id, np.where(valid, daily, 0.0).T)
+    np.add.at(month_counts.T, month_id, valid.T)
+    with np.errstate(invalid="ignore"):
+        monthly = (month_sums / month_counts).astype(np.float32)
+
+    # Days per category: one status per area and day (the most recent row wins)
+    known = list(AQI_CATEGORIES)
+    statuses = frame.assign(area_id=area_id, day_id=day_id).drop_duplicates(["area_id", "day_id"], keep="last")
+    categories = known + sorted(set(statuses["status"]) - set(known))
+    category_id = pd.Categorical(statuses["status"], categories=categories).codes
+    category_days = np.zeros((n_areas, len(categories)), dtype=np.int32)
+    np.add.at(category_days, (statuses["area_id"].to_numpy(), category_id), 1)
+
+    return AqiTrends(
+        states=np.asarray(area_index.get_level_values(0), dtype=object),
+        areas=np.asarray(area_index.get_level_values(1), dtype=object),
+        dates=dates,
+        daily=daily.astype(np.float32),
+        rolling={window: rolling_mean(daily, window) for window in ROLLING_WINDOWS},
+        months=pd.PeriodIndex(month_index, freq="M"),
+        monthly=monthly,
+        categories=categories,
+        category_days=category_days,
+    )
+
+
+class AqiTrendCache:
+    """AqiTrends per AQI dataset version"""
+
+    def __init__(self, max_entries: int = 4):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._trends: "OrderedDict[str, Optional[AqiTrends]]" = OrderedDict()
+
+    def get(self, df: pd.DataFrame) -> Optional[AqiTrends]:
+        key = dataset_version(df)
+        with self._lock:
+            if key in self._trends:
+                self._trends.move_to_end(key)
+                return self._trends[key]
+
+        trends = build_aqi_trends(df)
+        with self._lock:
+            self._trends[key] = trends
+            while len(self._trends) > self.max_entries:
+                self._trends.popitem(last=False)
+        return trends
+
+    def clear(self):
+        with self._lock:
+            self._trends.clear()
+
+
+aqi_trends = AqiTrendCache()
+
+
+def trend_context(df: pd.DataFrame, states: List[str], places: List[str], limit: int = 10) -> str:
+    """Chat-context trend lines for the named areas, else the areas with the worst 30-day mean"""
+    trends = aqi_trends.get(df)
+    if trends is None:
+        return ""
+    rows = trends.rows(states, places)
+    if not (states or places):
+        latest_30 = trends.rolling[30][:, -1]
+        # Worst first; areas with no recent 30-day mean go last
+        rows = np.argsort(np.where(np.isnan(latest_30), np.inf, -latest_30), kind="stable")
+    lines = trends.summary_lines(rows[:limit])
+    if not lines:
+        return ""
+    return "\n".join([f"AQI trends (daily data {trends.dates[0]:%d %b %Y} to {trends.dates[-1]:%d %b %Y}):"] + lines)
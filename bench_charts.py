@@ -0,0 +1,99 @@
+"""
+Clean Air AI Chatbot - Chart Build Benchmark
+Times figure construction with per-figure update_layout theming (the old way)
+against the registered templates in charts.py, and a figure cache hit
+
+    python bench_charts.py --repeat 50
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from charts import THEME_LAYOUTS, cached_figure, make_figure
+from datastore import stamp_version
+
+STATES = ["Delhi", "Maharashtra", "Karnataka", "Tamil Nadu", "Gujarat", "Uttar Pradesh", "West Bengal", "Kerala"]
+
+
+def sample_frames(rows):
+    """Synthetic frames shaped like the sample datasets"""
+    rng = np.random.default_rng(0)
+    aqi = pd.DataFrame({
+        "City": [f"City {i}" for i in range(rows)],
+        "AQI": rng.integers(20, 400, rows),
+    })
+    vahan = pd.DataFrame({
+        "State": rng.choice(STATES, rows),
+        "Fuel_Type": rng.choice(["Petrol", "Diesel", "CNG", "Electric"], rows),
+        "Registrations": rng.integers(100, 50000, rows),
+    })
+    return stamp_version(aqi), stamp_version(vahan)
+
+
+def old_bar(df):
+    fig = px.bar(df.head(10), x="City", y="AQI", title="Air Quality Index by City",
+                 color="AQI", color_continuous_scale="Reds", text="AQI")
+    fig.update_layout(plot_bgcolor="rgba(0,0,0,0)", paper_bgcolor="rgba(0,0,0,0)", font_color="#f0f9ff", height=450)
+    fig.update_traces(textposition="outside")
+    return fig
+
+
+def new_bar(df):
+    return make_figure("bar", df.head(10), "enterprise", x="City", y="AQI", title="Air Quality Index by City",
+                       color="AQI", color_continuous_scale="Reds", text="AQI", height=450,
+                       traces=dict(textposition="outside"))
+
+
+def old_scatter(df):
+    fig = px.scatter(df, x="State", y="Registrations", size="Registrations", color="Fuel_Type",
+                     title="Vehicle Registrations by State and Fuel Type")
+    fig.update_layout(**THEME_LAYOUTS["enterprise"], height=450)
+    return fig
+
+
+def new_scatter(df):
+    return make_figure("scatter", df, "enterprise", x="State", y="Registrations", size="Registrations",
+                       color="Fuel_Type", title="Vehicle Registrations by State and Fuel Type", height=450)
+
+
+def time_ms(fn, repeat):
+    """Median and p95 wall time of fn() in milliseconds"""
+    fn()  # warm up Plotly's lazy imports
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(0.95 * (len(samples) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Figure build micro-benchmark")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--rows", type=int, default=5000)
+    args = parser.parse_args()
+
+    aqi, vahan = sample_frames(args.rows)
+    cases = [
+        ("bar, update_layout", lambda: old_bar(aqi)),
+        ("bar, template", lambda: new_bar(aqi)),
+        ("bar, cache hit", lambda: cached_figure(aqi, "bench_bar", "enterprise", new_bar)),
+        ("scatter, update_layout", lambda: old_scatter(vahan)),
+        ("scatter, template", lambda: new_scatter(vahan)),
+        ("scatter, cache hit", lambda: cached_figure(vahan, "bench_scatter", "enterprise", new_scatter)),
+    ]
+
+    print(f"📊 Figure build times ({args.repeat} runs, {args.rows:,} rows)")
+    for name, fn in cases:
+        median, p95 = time_ms(fn, args.repeat)
+        print(f"   {name:<24} median {median:7.2f} ms · p95 {p95:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+"""
+Clean Air AI Chatbot - Charts
+Chart factory shared by the apps: themes are registered once as Plotly templates,
+each chart is built once per dataset version (with an optional Vega-Lite
+rendering), and only the charts relevant to the question are rendered
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+import streamlit as st
+
+from aqi_trends import aqi_trends
+from datastore import canonical_states, dataset_version, find_column, parse_dates
+from downsampling import downsample, render_mode
+from vega_lite import vega_lite_from_figure
+from query_planner import QueryPlan
+
+# Shared themes: app.py, app_friendly.py and the dashboard pages
+THEME_LAYOUTS = {
+    "enterprise": dict(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)', font_color='#f0f9ff'),
+    "friendly": dict(plot_bgcolor='rgba(15, 23, 42, 0.6)', paper_bgcolor='rgba(15, 23, 42, 0.6)',
+                     font_color='#f0f9ff', font_family='Inter', title_font_size=16, height=400),
+    "dashboard": dict(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)', font_color='white'),
+}
+
+# Rendering backends offered on the settings page
+CHART_BACKENDS = ("Plotly", "Altair", "Both")
+
+PX_CHARTS = {
+    "bar": px.bar,
+    "line": px.line,
+    "scatter": px.scatter,
+    "pie": px.pie,
+    "histogram": px.histogram,
+    "imshow": px.imshow,
+    "treemap": px.treemap,
+    "choropleth": px.choropleth,
+}
+
+
+def template_name(theme: str) -> str:
+    return f"clean_air_{theme}"
+
+
+def register_templates():
+    """Register each theme as a Plotly template layered on the default one"""
+    for theme, layout in THEME_LAYOUTS.items():
+        template = go.layout.Template(pio.templates["plotly"])
+        template.layout.update(layout)
+        pio.templates[template_name(theme)] = template
+
+
+register_templates()
+
+
+def make_figure(kind: str, data=None, theme: str = "enterprise", layout: Optional[Dict] = None,
+                traces: Optional[Dict] = None, **kwargs) -> go.Figure:
+    """Build a Plotly Express chart with the theme's template
+
+    The theme comes from the template, so `layout` and `traces` only carry
+    what is specific to this chart.
+    """
+    fig = PX_CHARTS[kind](data, template=template_name(theme), **kwargs)
+    if layout:
+        fig.update_layout(**layout)
+    if traces:
+        fig.update_traces(**traces)
+    return fig
+
+
+class FigureCache:
+    """LRU of serialised Plotly figures keyed by (dataset version, chart id, theme)
+
+    Specs are stored as JSON so a cached figure can never be mutated by a
+    caller, and rebuilding a Figure from it skips Plotly's validation pass.
+    """
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._specs: "OrderedDict[Tuple[str, str, str], str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_spec(self, key: Tuple[str, str, str]) -> Optional[str]:
+        with self._lock:
+            spec = self._specs.get(key)
+            if spec is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._specs.move_to_end(key)
+            return spec
+
+    def put_spec(self, key: Tuple[str, str, str], spec: str):
+        with self._lock:
+            self._specs[key] = spec
+            self._specs.move_to_end(key)
+            while len(self._specs) > self.max_entries:
+                self._specs.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._specs.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._specs), "hits": self.hits, "misses": self.misses}
+
+
+figure_cache = FigureCache()
+
+
+class PayloadMeter:
+    """Serialised spec size per chart and backend, for the settings page comparison"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sizes: Dict[str, Dict[str, int]] = {}
+
+    def record(self, chart_id: str, backend: str, size: int):
+        with self._lock:
+            self._sizes.setdefault(chart_id, {})[backend] = size
+
+    def sizes(self, chart_id: str) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._sizes.get(chart_id, {}))
+
+    def stats(self) -> List[Dict]:
+        """One row per chart: Plotly and Vega-Lite sizes in KB"""
+        with self._lock:
+            return [
+                {
+                    "chart": chart_id,
+                    "plotly_kb": round(sizes.get("plotly", 0) / 1024, 1),
+                    "vega_lite_kb": round(sizes["vega_lite"] / 1024, 1) if "vega_lite" in sizes else None,
+                }
+                for chart_id, sizes in sorted(self._sizes.items())
+            ]
+
+
+payload_meter = PayloadMeter()
+
+
+def figure_from_spec(spec: str) -> go.Figure:
+    """Rebuild a Figure from cached JSON without re-validating it"""
+    return go.Figure(json.loads(spec), _validate=False)
+
+
+def cached_spec(df: pd.DataFrame, chart_id: str, theme: str,
+                build: Callable[[pd.DataFrame], go.Figure]) -> str:
+    """Plotly JSON for this dataset version, building the figure only on a cache miss
+
+    `df` must be the frame as loaded (its version stamp is the cache key), and
+    `build` must depend on nothing but `df` and the theme.
+    """
+    key = (dataset_version(df), chart_id, theme)
+    spec = figure_cache.get_spec(key)
+    if spec is None:
+        spec = build(df).to_json()
+        figure_cache.put_spec(key, spec)
+        payload_meter.record(chart_id, "plotly", len(spec))
+    return spec
+
+
+def cached_figure(df: pd.DataFrame, chart_id: str, theme: str,
+                  build: Callable[[pd.DataFrame], go.Figure]) -> go.Figure:
+    """Return the chart for this dataset version, building it only on a cache miss"""
+    return figure_from_spec(cached_spec(df, chart_id, theme, build))
+
+
+def cached_vega_lite(df: pd.DataFrame, chart_id: str, theme: str,
+                     build: Callable[[pd.DataFrame], go.Figure]) -> Optional[Dict]:
+    """Vega-Lite spec of the cached figure, or None when it is not a simple bar/pie chart"""
+    key = (dataset_version(df), chart_id, f"{theme}|vega-lite")
+    spec = figure_cache.get_spec(key)
+    if spec is None:
+        vega_lite = vega_lite_from_figure(cached_figure(df, chart_id, theme, build), theme)
+        spec = json.dumps(vega_lite) if vega_lite else ""
+        figure_cache.put_spec(key, spec)
+        if spec:
+            payload_meter.record(chart_id, "vega_lite", len(spec))
+    return json.loads(spec) if spec else None
+
+
+def skeleton_spec(chart_id: str, theme: str, build: Callable[[], go.Figure]) -> str:
+    """Cached Plotly JSON of a data-free figure, built once per theme"""
+    key = ("skeleton", chart_id, theme)
+    spec = figure_cache.get_spec(key)
+    if spec is None:
+        spec = build().to_json()
+        figure_cache.put_spec(key, spec)
+    return spec
+
+
+def patch_figure(spec: str, patches: Dict[str, object]) -> go.Figure:
+    """Figure from cached JSON with some properties replaced
+
+    Patch paths are dotted, with trace indexes as numbers: "data.0.y",
+    "layout.title.text". Everything else comes from the cached spec as is.
+    """
+    figure = json.loads(spec)
+    for path, value in patches.items():
+        *parents, leaf = path.split(".")
+        node = figure
+        for part in parents:
+            node = node[int(part)] if isinstance(node, list) else node.setdefault(part, {})
+        node[leaf] = value.tolist() if hasattr(value, "tolist") else value
+    return go.Figure(figure, _validate=False)
+
+
+def plotly_chart_cached(df: pd.DataFrame, chart_id: str, theme: str,
+                        build: Callable[[pd.DataFrame], go.Figure], **kwargs):
+    """st.plotly_chart for a cached figure"""
+    st.plotly_chart(cached_figure(df, chart_id, theme, build), **kwargs)
+
+
+def render_chart(df: pd.DataFrame, chart_id: str, theme: str,
+                 build: Callable[[pd.DataFrame], go.Figure], **kwargs):
+    """Draw a cached chart with the backend chosen on the settings page
+
+    Altair only covers simple bar and pie charts; anything else stays Plotly.
+    """
+    style = st.session_state.get("chart_style", "Plotly")
+    vega_lite = cached_vega_lite(df, chart_id, theme, build) if style != "Plotly" else None
+    if vega_lite is None:
+        plotly_chart_cached(df, chart_id, theme, build, **kwargs)
+    elif style == "Altair":
+        st.vega_lite_chart(vega_lite, **kwargs)
+    else:
+        plotly_col, altair_col = st.columns(2)
+        with plotly_col:
+            plotly_chart_cached(df, chart_id, theme, build, **kwargs)
+        with altair_col:
+            st.vega_lite_chart(vega_lite, **kwargs)
+        sizes = payload_meter.sizes(chart_id)
+        st.caption(f"📦 Payload: Plotly {sizes.get('plotly', 0) / 1024:.1f} KB · "
+                   f"Vega-Lite {sizes.get('vega_lite', 0) / 1024:.1f} KB")
+
+
+# Query-aware chart selection
+# Datasets that can be sliced by the entities a question names
+TIMESERIES_DATASETS = ('idsp', 'aqi')
+
+
+@dataclass
+class ChartSelection:
+    """Which charts to render for a question"""
+    overview: List[str] = field(default_factory=list)
+    timeseries: List[str] = field(default_factory=list)
+
+
+def select_charts(plan: QueryPlan) -> ChartSelection:
+    """Pick the charts a question needs instead of drawing every dataset
+
+    Named states, places or diseases get a filtered time series of the
+    matching datasets; otherwise the datasets the question is about get their
+    overview charts (all of them only when nothing matched).
+    """
+    if plan.has_entities:
+        datasets = plan.datasets if plan.matched_datasets else list(TIMESERIES_DATASETS)
+        if plan.diseases:
+            datasets = ['idsp']
+        timeseries = [name for name in datasets if name in TIMESERIES_DATASETS]
+        overview = [name for name in datasets if name not in TIMESERIES_DATASETS] if plan.matched_datasets else []
+        return ChartSelection(overview=overview, timeseries=timeseries)
+    return ChartSelection(overview=list(plan.datasets))
+
+
+def _filter_entities(df: pd.DataFrame, dataset: str, plan: QueryPlan) -> pd.DataFrame:
+    """Rows matching the states, places and diseases named in the question"""
+    mask = pd.Series(True, index=df.index)
+    state_col = find_column(df, dataset, 'state')
+    if plan.states and state_col:
+        mask &= canonical_states(df[state_col]).isin(plan.states)
+    place_col = find_column(df, dataset, 'district' if dataset == 'idsp' else 'area')
+    if plan.places and place_col:
+        mask &= df[place_col].astype(str).str.strip().isin(plan.places)
+    disease_col = find_column(df, dataset, 'disease')
+    if plan.diseases and disease_col:
+        mask &= df[disease_col].astype(str).str.strip().isin(plan.diseases)
+    return df[mask]
+
+
+def timeseries_frame(df: pd.DataFrame, dataset: str, plan: QueryPlan) -> pd.DataFrame:
+    """Weekly IDSP cases or daily AQI for the entities in the question
+
+    AQI is one series per named area, otherwise the daily mean across areas,
+    read from the precomputed AQI trend arrays; a single series also gets its
+    7-day rolling mean.
+    """
+    if dataset == 'aqi':
+        trends = aqi_trends.get(df)
+        if trends is not None:
+            return _aqi_trend_frame(trends, plan)
+
+    date_col = find_column(df, dataset, 'date')
+    value_col = find_column(df, dataset, 'cases' if dataset == 'idsp' else 'aqi')
+    if not date_col or not value_col:
+        return pd.DataFrame(columns=['date', 'value', 'series'])
+
+    subset = _filter_entities(df, dataset, plan)
+    area_col = find_column(df, dataset, 'area')
+    per_area = dataset == 'aqi' and bool(plan.places) and area_col is not None
+    frame = pd.DataFrame({
+        'date': parse_dates(subset[date_col]),
+        'value': pd.to_numeric(subset[value_col], errors='coerce'),
+        'series': subset[area_col].astype(str).str.strip() if per_area else _entity_label(plan),
+    }).dropna()
+    if frame.empty:
+        return frame
+
+    if dataset == 'idsp':
+        return frame.set_index('date').groupby('series')['value'].resample('W').sum().reset_index()
+    return frame.groupby(['series', 'date'], as_index=False)['value'].mean()
+
+
+def _aqi_trend_frame(trends, plan: QueryPlan) -> pd.DataFrame:
+    rows = trends.rows(plan.states, plan.places)
+    if not len(rows):
+        return pd.DataFrame(columns=['date', 'value', 'series'])
+    combine = None if plan.places else _entity_label(plan)
+    frame = trends.long_frame(rows, 'daily', combine=combine)
+    if combine is not None or len(rows) == 1:
+        label = combine or trends.areas[rows[0]]
+        rolling = trends.long_frame(rows, '7d', combine=combine)
+        rolling['series'] = f"{label} (7-day mean)"
+        frame = pd.concat([frame, rolling], ignore_index=True)
+    return frame
+
+
+def _entity_label(plan: QueryPlan) -> str:
+    return ", ".join(plan.diseases + plan.places + plan.states) or "All India"
+
+
+def build_timeseries_chart(df: pd.DataFrame, dataset: str, plan: QueryPlan, theme: str) -> go.Figure:
+    """Line chart of the filtered time series, downsampled so the payload stays bounded"""
+    series = timeseries_frame(df, dataset, plan)
+    # Outbreak spikes matter more than the line's shape, so keep every peak for IDSP
+    series = downsample(series, 'date', 'value', method='minmax' if dataset == 'idsp' else 'lttb', series='series')
+    if dataset == 'idsp':
+        title, value_label = f"Weekly Reported Cases: {_entity_label(plan)}", "Cases"
+    else:
+        title, value_label = f"Daily Average AQI: {_entity_label(plan)}", "AQI"
+    return make_figure(
+        'line', series, theme, x='date', y='value', color='series', title=title,
+        labels={'date': 'Date', 'value': value_label, 'series': ''},
+        render_mode=render_mode(len(series)),
+        layout=dict(showlegend=series['series'].nunique() > 1),
+    )
+
+
+def render_timeseries(df: pd.DataFrame, dataset: str, plan: QueryPlan, theme: str, **kwargs) -> bool:
+    """Draw the filtered time series, or say why there is none; True when a chart was drawn"""
+    chart_id = "timeseries:{}:{}".format(dataset, "|".join(plan.states + plan.places + plan.diseases))
+    fig = cached_figure(df, chart_id, theme, lambda frame: build_timeseries_chart(frame, dataset, plan, theme))
+    if not any(trace.x is not None and len(trace.x) for trace in fig.data):
+        st.info(f"ℹ️ No dated {dataset.upper()} records match {_entity_label(plan)}.")
+        return False
+    st.plotly_chart(fig, **kwargs)
+    return True
@@ -0,0 +1,138 @@
+"""
+Clean Air AI Chatbot - Dataset Store
+Version stamps for loaded datasets, used as cache keys by everything derived
+from them, plus the column and state-name normalisation shared by the engines
+"""
+
+import hashlib
+
+import pandas as pd
+
+
+def compute_version(df: pd.DataFrame) -> str:
+    """Short content hash of a DataFrame (values, index and column names)"""
+    digest = hashlib.sha1()
+    digest.update("|".join(map(str, df.columns)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return digest.hexdigest()[:12]
+
+
+def stamp_version(df: pd.DataFrame) -> pd.DataFrame:
+    """Record the content version on a freshly loaded DataFrame"""
+    df.attrs["version"] = compute_version(df)
+    return df
+
+
+def dataset_version(df: pd.DataFrame) -> str:
+    """Version stamped at load time, or a freshly computed one for ad-hoc frames
+
+    Only trust the stamp on frames that came straight out of load_datasets():
+    pandas copies attrs onto derived frames (head, filters, ...), so pass the
+    original frame when keying a cache.
+    """
+    version = df.attrs.get("version")
+    if version is None:
+        version = compute_version(df)
+    return version
+
+
+# Column names differ between the real CSV exports and the bundled sample data
+COLUMN_ALIASES = {
+    "aqi": {
+        "date": ["date", "Date"],
+        "state": ["state", "State"],
+        "area": ["area", "City"],
+        "aqi": ["aqi_value", "AQI"],
+        "status": ["air_quality_status", "Category"],
+    },
+    "idsp": {
+        "year": ["year", "Year"],
+        "week": ["week", "Week"],
+        "date": ["outbreak_starting_date", "Date"],
+        "state": ["state", "State"],
+        "district": ["district", "District"],
+        "disease": ["disease_illness_name", "Disease"],
+        "cases": ["cases", "Cases"],
+        "deaths": ["deaths", "Deaths"],
+    },
+    "population": {
+        "year": ["year", "Year"],
+        "month": ["month", "Month"],
+        "state": ["state", "State"],
+        "gender": ["gender", "Gender"],
+        "population": ["value", "Total_Population"],
+    },
+    "vahan": {
+        "year": ["year", "Year"],
+        "month": ["month", "Month"],
+        "state": ["state", "State"],
+        "vehicle_class": ["vehicle_class", "Vehicle_Class"],
+        "fuel": ["fuel", "Fuel_Type"],
+        "registrations": ["value", "Registrations"],
+    },
+}
+
+
+# The projections export population in thousands; the sample data in persons
+POPULATION_UNITS = {"value": 1000, "Total_Population": 1}
+
+
+def find_column(df: pd.DataFrame, dataset: str, field: str):
+    """Actual column name for a logical field of a dataset, or None"""
+    for candidate in COLUMN_ALIASES.get(dataset, {}).get(field, []):
+        if candidate in df.columns:
+            return candidate
+    return None
+
+
+def parse_dates(values: pd.Series) -> pd.Series:
+    """Dates from the raw exports (DD-MM-YYYY) or the sample data (ISO); unparseable values become NaT"""
+    first = values.dropna().astype(str).head(1)
+    if not first.empty and first.iloc[0][:4].isdigit():
+        return pd.to_datetime(values, format="ISO8601", errors="coerce")
+    return pd.to_datetime(values, dayfirst=True, errors="coerce")
+
+
+# States and union territories, as spelled in the population projections
+INDIAN_STATES = [
+    "Andaman and Nicobar Islands", "Andhra Pradesh", "Arunachal Pradesh", "Assam", "Bihar",
+    "Chandigarh", "Chhattisgarh", "Dadra and Nagar Haveli", "Daman and Diu",
+    "Dadra and Nagar Haveli and Daman and Diu", "Delhi", "Goa", "Gujarat", "Haryana",
+    "Himachal Pradesh", "Jammu and Kashmir", "Jharkhand", "Karnataka", "Kerala", "Ladakh",
+    "Lakshadweep", "Madhya Pradesh", "Maharashtra", "Manipur", "Meghalaya", "Mizoram",
+    "Nagaland", "Odisha", "Puducherry", "Punjab", "Rajasthan", "Sikkim", "Tamil Nadu",
+    "Telangana", "Tripura", "Uttar Pradesh", "Uttarakhand", "West Bengal",
+]
+
+# Spellings seen in the source exports (IDSP truncates some names)
+STATE_ALIASES = {
+    "madhya": "Madhya Pradesh",
+    "uttar": "Uttar Pradesh",
+    "arunachal": "Arunachal Pradesh",
+    "himachal": "Himachal Pradesh",
+    "andhra": "Andhra Pradesh",
+    "nct of delhi": "Delhi",
+    "new delhi": "Delhi",
+    "orissa": "Odisha",
+    "pondicherry": "Puducherry",
+    "uttaranchal": "Uttarakhand",
+    "tamilnadu": "Tamil Nadu",
+    "jammu & kashmir": "Jammu and Kashmir",
+    "andaman & nicobar islands": "Andaman and Nicobar Islands",
+    "andaman and nicobar": "Andaman and Nicobar Islands",
+}
+
+_CANONICAL_STATES = {name.lower(): name for name in INDIAN_STATES}
+_CANONICAL_STATES.update(STATE_ALIASES)
+
+
+def canonical_state(name) -> str:
+    """Canonical spelling of a state name; unknown names are returned tidied but unchanged"""
+    tidy = " ".join(str(name).split())
+    return _CANONICAL_STATES.get(tidy.lower(), tidy)
+
+
+def canonical_states(values: pd.Series) -> pd.Series:
+    """Vectorised canonical_state: maps each distinct spelling once"""
+    uniques = values.dropna().unique()
+    return values.map({value: canonical_state(value) for value in uniques})
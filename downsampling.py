@@ -0,0 +1,92 @@
+"""
+Clean Air AI Chatbot - Downsampling
+Caps the number of points a chart sends to the browser, whatever the data size
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+# Points per series sent to the browser, and the count above which traces switch to WebGL
+MAX_CHART_POINTS = int(os.getenv("CHART_MAX_POINTS", "2000"))
+WEBGL_THRESHOLD = int(os.getenv("CHART_WEBGL_THRESHOLD", "1000"))
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of the points that keep the line's shape
+
+    `x` must be sorted and numeric. First and last points are always kept.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = x.astype(float)
+    y = y.astype(float)
+    # Bucket edges for the n - 2 interior points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket is the third vertex of the triangle
+        next_start, next_end = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Min and max of each bucket, so spikes survive; at most n_out indices"""
+    n = len(y)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+
+    n_buckets = (n_out - 2) // 2
+    buckets = np.arange(n) * n_buckets // n
+    grouped = pd.Series(y).groupby(buckets)
+    indices = np.concatenate([[0, n - 1], grouped.idxmin().to_numpy(), grouped.idxmax().to_numpy()])
+    return np.unique(indices)
+
+
+def downsample(df: pd.DataFrame, x: str, y: str, max_points: int = MAX_CHART_POINTS,
+               method: str = "lttb", series: str = None) -> pd.DataFrame:
+    """Reduce each series of `df` to at most max_points rows, sorted by x
+
+    method is "lttb" (keeps the visual shape) or "minmax" (keeps every peak and trough).
+    """
+    if series is not None:
+        groups = [group for _, group in df.groupby(series, sort=False)]
+        if not groups:
+            return df
+        return pd.concat([downsample(group, x, y, max_points, method) for group in groups], ignore_index=True)
+
+    frame = df.dropna(subset=[x, y]).sort_values(x)
+    if len(frame) <= max_points:
+        return frame.reset_index(drop=True)
+
+    values = frame[y].to_numpy()
+    if method == "minmax":
+        indices = minmax_indices(values, max_points)
+    else:
+        x_values = frame[x]
+        if pd.api.types.is_datetime64_any_dtype(x_values):
+            x_values = x_values.astype("int64")
+        indices = lttb_indices(x_values.to_numpy(), values, max_points)
+    return frame.iloc[indices].reset_index(drop=True)
+
+
+def render_mode(n_points: int) -> str:
+    """Plotly Express render_mode: WebGL (scattergl) for large traces, SVG otherwise"""
+    return "webgl" if n_points > WEBGL_THRESHOLD else "svg"
@@ -0,0 +1,175 @@
+"""
+Clean Air AI Chatbot - Exports
+CSV, Excel and Parquet exports written chunk by chunk to a temporary file
+
+The source is any iterator of DataFrame chunks (a dataset view, a streamed
+SQL result), so writing an export never holds more than one chunk in memory
+besides what the source itself keeps. Excel is written in xlsxwriter's
+constant memory mode; Parquet appends one row group per chunk. Streamlit's
+download button still serves the finished file from memory, so it is read
+only when the download is clicked.
+"""
+
+import os
+import tempfile
+import time
+from typing import Callable, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Format -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    "CSV": (".csv", "text/csv"),
+    "Excel": (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+EXPORT_CHUNK_ROWS = 50_000
+EXPORT_MAX_ROWS = int(os.getenv("EXPORT_MAX_ROWS", "1000000"))
+EXCEL_MAX_ROWS = 1_048_575  # sheet limit minus the header row
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), "clean_air_exports")
+EXPORT_TTL_SECONDS = 3600
+
+
+def frame_chunks(df: pd.DataFrame, rows: Optional[np.ndarray] = None,
+                 chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Chunks of `df`, optionally restricted to and ordered by row positions"""
+    total = len(df) if rows is None else len(rows)
+    for start in range(0, total, chunk_rows):
+        if rows is None:
+            yield df.iloc[start:start + chunk_rows]
+        else:
+            yield df.iloc[rows[start:start + chunk_rows]]
+
+
+def write_csv(chunks: Iterator[pd.DataFrame], path: str) -> int:
+    rows = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for chunk in chunks:
+            chunk.to_csv(f, header=rows == 0, index=False)
+            rows += len(chunk)
+    return rows
+
+
+def _excel_cells(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Values xlsxwriter can write: dates as ISO text, missing values as blanks"""
+    chunk = chunk.copy()
+    for column in chunk.columns:
+        if pd.api.types.is_datetime64_any_dtype(chunk[column]):
+            chunk[column] = chunk[column].dt.strftime("%Y-%m-%d %H:%M:%S")
+    chunk = chunk.astype(object)
+    return chunk.where(chunk.notna(), None)
+
+
+def write_xlsx(chunks: Iterator[pd.DataFrame], path: str) -> int:
+    """One sheet in constant-memory mode: rows are flushed as they are written"""
+    try:
+        import xlsxwriter
+    except ImportError:
+        raise ImportError("Excel export needs xlsxwriter: pip install xlsxwriter") from None
+
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+    worksheet = workbook.add_worksheet("data")
+    rows = 0
+    try:
+        for chunk in chunks:
+            if rows == 0:
+                worksheet.write_row(0, 0, [str(c) for c in chunk.columns])
+            for values in _excel_cells(chunk.head(EXCEL_MAX_ROWS - rows)).itertuples(index=False):
+                rows += 1
+                worksheet.write_row(rows, 0, values)
+            if rows >= EXCEL_MAX_ROWS:
+                print(f"⚠️ Excel export stopped at the sheet limit of {EXCEL_MAX_ROWS:,} rows")
+                break
+    finally:
+        workbook.close()
+    return rows
+
+
+def write_parquet(chunks: Iterator[pd.DataFrame], path: str) -> int:
+    """One row group per chunk, all cast to the first chunk's schema"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    rows = 0
+    try:
+        for chunk in chunks:
+            if writer is None:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                writer = pq.ParquetWriter(path, table.schema)
+            else:
+                table = pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+            writer.write_table(table)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+WRITERS = {"CSV": write_csv, "Excel": write_xlsx, "Parquet": write_parquet}
+
+
+def _sweep_exports(now: float):
+    """Delete exports older than EXPORT_TTL_SECONDS left behind by earlier sessions"""
+    for name in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, name)
+        try:
+            if now - os.path.getmtime(path) > EXPORT_TTL_SECONDS:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def export_to_file(chunks: Iterator[pd.DataFrame], fmt: str) -> Tuple[str, int]:
+    """Write the chunks to a new temporary file; returns (path, rows written)"""
+    extension, _ = EXPORT_FORMATS[fmt]
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    _sweep_exports(time.time())
+    fd, path = tempfile.mkstemp(suffix=extension, dir=EXPORT_DIR)
+    os.close(fd)
+    try:
+        rows = WRITERS[fmt](chunks, path)
+    except Exception:
+        os.remove(path)
+        raise
+    print(f"📤 Exported {rows:,} rows to {fmt} ({os.path.getsize(path) / 1024:.0f} KB)")
+    return path, rows
+
+
+def _read_export(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def render_export_controls(chunks: Callable[[], Iterator[pd.DataFrame]], name: str, key: str):
+    """Format picker, a button that writes the export, and the download once it is ready"""
+    col1, col2 = st.columns(2)
+    with col1:
+        fmt = st.selectbox("Export format", list(EXPORT_FORMATS), key=f"{key}_format")
+    with col2:
+        st.write("")
+        prepare = st.button("📤 Prepare export", key=f"{key}_prepare")
+
+    state_key = f"{key}_export"
+    if prepare:
+        previous = st.session_state.pop(state_key, None)
+        if previous and os.path.exists(previous[0]):
+            os.remove(previous[0])
+        try:
+            with st.spinner(f"Writing {fmt} export..."):
+                path, rows = export_to_file(chunks(), fmt)
+            st.session_state[state_key] = (path, fmt, rows)
+        except Exception as e:
+            st.error(f"❌ Export failed: {e}")
+
+    prepared = st.session_state.get(state_key)
+    if prepared and os.path.exists(prepared[0]):
+        path, fmt, rows = prepared
+        extension, mime = EXPORT_FORMATS[fmt]
+        # Streamlit serves downloads from memory; deferred, the file is read once on click
+        # rather than on every rerun. Keep EXPORT_MAX_ROWS within what the server can hold.
+        st.download_button(f"⬇️ Download {fmt} ({rows:,} rows)", lambda: _read_export(path),
+                           file_name=f"{name}{extension}", mime=mime, key=f"{key}_download")
@@ -0,0 +1,177 @@
+"""
+Clean Air AI Chatbot - State Geometry
+India state boundaries from a local GeoJSON, simplified once and cached
+
+Simplification works on shared arcs: each ring is split wherever the set of
+states touching it changes, so a border shared by two states is simplified
+once and both sides stay aligned (no slivers or gaps).
+"""
+
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+from charts import make_figure
+from datastore import canonical_state
+
+GEOJSON_PATH = os.getenv("INDIA_STATES_GEOJSON", os.path.join("data", "india_states.geojson"))
+
+# Degrees; 0.02 is roughly 2 km, invisible at whole-country zoom
+SIMPLIFY_TOLERANCE = float(os.getenv("GEO_SIMPLIFY_TOLERANCE", "0.02"))
+COORDINATE_DECIMALS = 3
+
+# Property holding the state name in the common India GeoJSON exports
+STATE_NAME_PROPERTIES = ["ST_NM", "st_nm", "NAME_1", "state", "State", "STATE", "name", "NAME"]
+
+Point = Tuple[float, float]
+
+
+def _douglas_peucker(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """Keep-mask of the points that matter at this tolerance; endpoints are always kept"""
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        segment = points[end] - points[start]
+        offsets = points[start + 1:end] - points[start]
+        length = np.hypot(*segment)
+        if length == 0:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            distances = np.abs(segment[0] * offsets[:, 1] - segment[1] * offsets[:, 0]) / length
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            index = start + 1 + farthest
+            keep[index] = True
+            stack.extend([(start, index), (index, end)])
+    return keep
+
+
+def _rings(geometry: Dict) -> List[List[List[Point]]]:
+    """Polygons of a Polygon/MultiPolygon geometry as lists of rings"""
+    if geometry["type"] == "Polygon":
+        return [geometry["coordinates"]]
+    if geometry["type"] == "MultiPolygon":
+        return geometry["coordinates"]
+    return []
+
+
+def simplify_features(features: List[Dict], tolerance: float = SIMPLIFY_TOLERANCE) -> List[Dict]:
+    """Topology-preserving Douglas-Peucker over all features"""
+    quantize = lambda point: (round(point[0], 6), round(point[1], 6))  # noqa: E731
+
+    # Which features each vertex belongs to
+    owners: Dict[Point, set] = {}
+    for index, feature in enumerate(features):
+        for polygon in _rings(feature["geometry"]):
+            for ring in polygon:
+                for point in ring:
+                    owners.setdefault(quantize(point), set()).add(index)
+
+    simplified_arcs: Dict[Tuple[Point, ...], List[Point]] = {}
+
+    def simplify_arc(arc: List[Point]) -> List[Point]:
+        # Shared borders appear reversed in the neighbour, so simplify one canonical direction
+        forward = tuple(arc)
+        backward = forward[::-1]
+        key = min(forward, backward)
+        if key not in simplified_arcs:
+            points = np.array(key, dtype=float)
+            simplified_arcs[key] = [(float(x), float(y)) for x, y in points[_douglas_peucker(points, tolerance)]]
+        result = simplified_arcs[key]
+        return list(result) if key == forward else list(reversed(result))
+
+    def simplify_ring(ring: List[Point]) -> List[Point]:
+        ring = [quantize(point) for point in ring]
+        if ring[0] == ring[-1]:
+            ring = ring[:-1]
+        n = len(ring)
+        if n < 4:
+            return ring + ring[:1]
+        # Split where the owning set changes: those vertices are junctions kept on both sides
+        breaks = [i for i in range(n) if owners[ring[i]] != owners[ring[i - 1]] or owners[ring[i]] != owners[ring[(i + 1) % n]]]
+        if not breaks:
+            # Ring not shared with anyone: anchor on the lowest vertex so the result is deterministic
+            breaks = [min(range(n), key=lambda i: ring[i])]
+        result: List[Point] = []
+        for j, start in enumerate(breaks):
+            end = breaks[(j + 1) % len(breaks)]
+            arc = ring[start:end + 1] if end > start else ring[start:] + ring[:end + 1]
+            result.extend(simplify_arc(arc)[:-1])
+        if len(result) < 3:
+            return ring + ring[:1]
+        return result + result[:1]
+
+    simplified = []
+    for feature in features:
+        polygons = []
+        for polygon in _rings(feature["geometry"]):
+            rings = [simplify_ring(ring) for ring in polygon]
+            polygons.append([
+                # Plain floats: integer coordinates in the source would otherwise reach json.dumps as numpy ints
+                [[round(float(x), COORDINATE_DECIMALS), round(float(y), COORDINATE_DECIMALS)] for x, y in ring]
+                for ring in rings
+            ])
+        simplified.append({
+            "type": "Feature",
+            "properties": feature["properties"],
+            "geometry": {"type": "MultiPolygon", "coordinates": polygons},
+        })
+    return simplified
+
+
+def _state_property(properties: Dict) -> Optional[str]:
+    for name in STATE_NAME_PROPERTIES:
+        if properties.get(name):
+            return properties[name]
+    return None
+
+
+@st.cache_resource(show_spinner=False)
+def load_state_geometry(path: str = GEOJSON_PATH, tolerance: float = SIMPLIFY_TOLERANCE) -> Optional[Dict]:
+    """Simplified state GeoJSON keyed by canonical state name, or None when the file is missing"""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        source = json.load(f)
+
+    features = []
+    for feature in source.get("features", []):
+        name = _state_property(feature.get("properties") or {})
+        if name and feature.get("geometry"):
+            # Only the canonical name is kept, so the map carries no unused properties
+            features.append({"type": "Feature", "properties": {"state": canonical_state(name)},
+                             "geometry": feature["geometry"]})
+
+    geometry = {"type": "FeatureCollection", "features": simplify_features(features, tolerance)}
+    before = sum(len(json.dumps(f["geometry"])) for f in features)
+    after = len(json.dumps(geometry))
+    print(f"🗺️ Simplified {len(features)} state shapes: {before / 1024:.0f} KB → {after / 1024:.0f} KB")
+    return geometry
+
+
+def build_state_choropleth(values: pd.DataFrame, value_column: str, geometry: Dict, title: str,
+                           theme: str, labels: Optional[Dict] = None, colorscale: str = "Reds") -> go.Figure:
+    """Choropleth of one value per canonical state; no tile server involved"""
+    fig = make_figure(
+        "choropleth", values, theme,
+        geojson=geometry,
+        locations="state",
+        featureidkey="properties.state",
+        color=value_column,
+        color_continuous_scale=colorscale,
+        hover_name="state",
+        title=title,
+        labels=labels,
+        height=600,
+    )
+    fig.update_geos(fitbounds="locations", visible=False, bgcolor="rgba(0,0,0,0)")
+    return fig
@@ -0,0 +1,115 @@
+"""
+Clean Air AI Chatbot - Histograms
+Server-side NumPy histograms: bin edges and counts cached per dataset version,
+column and bin count, patched into a cached figure as a bar trace
+
+The browser receives one bar per bin, whatever the number of rows. Changing
+the explorer's column selection only bins the newly selected columns, and
+the figure itself is never rebuilt through Plotly Express.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from charts import make_figure, patch_figure, skeleton_spec
+from datastore import dataset_version
+
+DEFAULT_BINS = 30
+
+
+class BinnedCounts:
+    """LRU of per-column bin edges and counts keyed by (dataset version, column, bins)"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str, int, str], object]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _cached(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def edges(self, df: pd.DataFrame, column: str, bins: int = DEFAULT_BINS) -> np.ndarray:
+        """Equal-width bin edges over the column's finite values"""
+        key = (dataset_version(df), column, bins, "edges")
+        return self._cached(key, lambda: bin_edges(finite_values(df[column]), bins))
+
+    def get(self, df: pd.DataFrame, column: str, bins: int = DEFAULT_BINS) -> Dict:
+        """{"x": bin centres, "y": counts, "width": bin widths} for one column"""
+        key = (dataset_version(df), column, bins, "counts")
+        edges = self.edges(df, column, bins)
+        return self._cached(key, lambda: bin_counts(finite_values(df[column]), edges))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+binned_counts = BinnedCounts()
+
+
+def finite_values(values: pd.Series) -> np.ndarray:
+    """Numeric values without NaN or infinities, as a float array"""
+    array = pd.to_numeric(values, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    return array[np.isfinite(array)]
+
+
+def bin_edges(values: np.ndarray, bins: int = DEFAULT_BINS) -> np.ndarray:
+    """Equal-width edges; a constant column gets one unit-wide bin around its value"""
+    if values.size == 0:
+        return np.array([])
+    low, high = values.min(), values.max()
+    if low == high:
+        return np.array([low - 0.5, high + 0.5])
+    return np.histogram_bin_edges(values, bins=bins, range=(low, high))
+
+
+def bin_counts(values: np.ndarray, edges: np.ndarray) -> Dict:
+    """Counts per bin as bar-trace arrays"""
+    if edges.size < 2:
+        return {"x": [], "y": [], "width": []}
+    counts, _ = np.histogram(values, bins=edges)
+    return {
+        "x": ((edges[:-1] + edges[1:]) / 2).tolist(),
+        "y": counts.tolist(),
+        "width": np.diff(edges).tolist(),
+    }
+
+
+def _histogram_skeleton(theme: str) -> go.Figure:
+    """Empty single-trace bar chart styled as a histogram"""
+    empty = pd.DataFrame({"value": [], "count": []})
+    return make_figure("bar", empty, theme, x="value", y="count", labels={"value": "Value", "count": "Count"},
+                       layout=dict(bargap=0.05))
+
+
+def histogram_figure(df: pd.DataFrame, column: str, theme: str, bins: int = DEFAULT_BINS) -> go.Figure:
+    """Histogram of one column: cached counts patched into the cached skeleton figure"""
+    counts = binned_counts.get(df, column, bins)
+    spec = skeleton_spec("histogram", theme, lambda: _histogram_skeleton(theme))
+    return patch_figure(spec, {
+        "data.0.x": counts["x"],
+        "data.0.y": counts["y"],
+        "data.0.width": counts["width"],
+        "layout.title.text": f"Distribution of {column}",
+        "layout.xaxis.title.text": column,
+    })
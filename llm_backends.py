@@ -0,0 +1,159 @@
+"""
+Clean Air AI Chatbot - LLM Backends
+Pluggable clients behind the chat.completions.create interface
+
+LLM_BACKEND selects the backend:
+- groq   (default) the real Groq API, needs GROQ_API_KEY
+- mock   the local OpenAI-compatible stand-in (mock_llm_server.py) at MOCK_LLM_URL
+- record the Groq API, with every response appended to LLM_FIXTURES
+- replay responses served from LLM_FIXTURES, no network at all
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from groq import Groq
+from groq.types.chat import ChatCompletion
+
+from llm_gateway import request_key
+
+BACKENDS = ("groq", "mock", "record", "replay")
+DEFAULT_FIXTURES = os.path.join("data", "llm_fixtures.jsonl")
+DEFAULT_MOCK_URL = "http://127.0.0.1:8787"
+
+
+def llm_backend_name() -> str:
+    """Configured backend, falling back to the real Groq API"""
+    name = os.getenv("LLM_BACKEND", "groq").strip().lower()
+    return name if name in BACKENDS else "groq"
+
+
+def requires_api_key() -> bool:
+    """Only the backends that talk to Groq need a real key"""
+    return llm_backend_name() in ("groq", "record")
+
+
+def synthetic_completion(messages: List[Dict[str, str]], model: str, max_tokens: Optional[int] = None,
+                         completion_tokens: int = 200) -> Dict:
+    """OpenAI-style chat completion payload with deterministic filler content"""
+    question = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+    question = question.rsplit("User Question:", 1)[-1].strip()
+    n_tokens = min(completion_tokens, max_tokens) if max_tokens else completion_tokens
+    words = [f"**Offline response** to: {question}\n\n-"] + ["data"] * max(n_tokens - 1, 0)
+    prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4
+    return {
+        "id": f"chatcmpl-mock-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": " ".join(words)},
+            "finish_reason": "length" if max_tokens and completion_tokens > max_tokens else "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": n_tokens,
+            "total_tokens": prompt_tokens + n_tokens,
+        },
+    }
+
+
+class FixtureStore:
+    """Recorded request/response pairs in a JSON-lines file, keyed by request_key"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._responses: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._responses[entry["key"]] = entry["response"]
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            return self._responses.get(key)
+
+    def add(self, key: str, request: Dict, response: Dict):
+        with self._lock:
+            self._responses[key] = response
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "request": request, "response": response}, ensure_ascii=False) + "\n")
+
+    def __len__(self):
+        with self._lock:
+            return len(self._responses)
+
+
+class _Completions:
+    def __init__(self, create):
+        self.create = create
+
+
+class _Chat:
+    def __init__(self, create):
+        self.completions = _Completions(create)
+
+
+class RecordingBackend:
+    """Pass requests to a real client and append each response to the fixture store"""
+
+    def __init__(self, client, store: FixtureStore):
+        self.client = client
+        self.store = store
+        self.chat = _Chat(self._create)
+
+    def _create(self, messages: List[Dict[str, str]], model: str, **params):
+        completion = self.client.chat.completions.create(messages=messages, model=model, **params)
+        request = {"messages": messages, "model": model, **params}
+        self.store.add(request_key(messages, model, **params), request, completion.model_dump())
+        return completion
+
+
+class ReplayBackend:
+    """Serve recorded responses; unrecorded requests get a synthetic answer unless strict"""
+
+    def __init__(self, store: FixtureStore, strict: bool = False):
+        self.store = store
+        self.strict = strict
+        self.hits = 0
+        self.misses = 0
+        self.chat = _Chat(self._create)
+
+    def _create(self, messages: List[Dict[str, str]], model: str, **params):
+        response = self.store.get(request_key(messages, model, **params))
+        if response is None:
+            self.misses += 1
+            if self.strict:
+                raise LookupError(f"No recorded response for this request in {self.store.path}")
+            response = synthetic_completion(messages, model, params.get("max_tokens"))
+        else:
+            self.hits += 1
+        return ChatCompletion.model_validate(response)
+
+
+def create_llm_client(api_key: Optional[str] = None):
+    """Build the client for the configured backend"""
+    backend = llm_backend_name()
+    fixtures = os.getenv("LLM_FIXTURES", DEFAULT_FIXTURES)
+
+    if backend == "mock":
+        # The Groq SDK speaks to any server exposing /openai/v1/chat/completions
+        return Groq(api_key=api_key or "mock", base_url=os.getenv("MOCK_LLM_URL", DEFAULT_MOCK_URL), max_retries=0)
+    if backend == "replay":
+        return ReplayBackend(FixtureStore(fixtures), strict=os.getenv("LLM_REPLAY_STRICT", "0") == "1")
+
+    client = Groq(api_key=api_key, max_retries=0)
+    if backend == "record":
+        return RecordingBackend(client, FixtureStore(fixtures))
+    return client
@@ -0,0 +1,343 @@
+"""
+Clean Air AI Chatbot - LLM Gateway
+Shared request path between the Streamlit apps and the Groq API
+"""
+
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from prompt_layout import prefix_meter
+
+
+class _InFlightCall:
+    """A single upstream call that other callers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one execution
+
+    The first caller for a key runs the function; callers that arrive while
+    it is still running block until it finishes and receive the same result
+    (or the same exception). Nothing is cached once the call completes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _InFlightCall] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _InFlightCall()
+                self._calls[key] = call
+                self.executed += 1
+                is_leader = True
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+                is_leader = False
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self) -> int:
+        """Number of distinct calls currently running"""
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+            }
+
+
+class TokenBucketLimiter:
+    """Client-side request and token budget for the Groq API
+
+    Two buckets refill continuously: one counts requests per minute, the
+    other estimated tokens per minute. Callers queue in FIFO order so a burst
+    drains at the provider's pace instead of tripping 429s. A limit of 0 (or
+    less) switches that bucket off.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests_per_minute = float(requests_per_minute) if float(requests_per_minute) > 0 else math.inf
+        self.tokens_per_minute = float(tokens_per_minute) if float(tokens_per_minute) > 0 else math.inf
+        self._requests = self.requests_per_minute
+        self._tokens = self.tokens_per_minute
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self.acquired = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.last_wait = 0.0
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        if math.isfinite(self.requests_per_minute):
+            self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60.0)
+        if math.isfinite(self.tokens_per_minute):
+            self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60.0)
+
+    def _delay(self, tokens: float, now: float) -> float:
+        delay = self._paused_until - now
+        if self._requests < 1:
+            delay = max(delay, (1 - self._requests) * 60.0 / self.requests_per_minute)
+        if self._tokens < tokens:
+            delay = max(delay, (tokens - self._tokens) * 60.0 / self.tokens_per_minute)
+        return delay
+
+    def acquire(self, tokens: int = 0, timeout: Optional[float] = None) -> float:
+        """Block until one request and `tokens` tokens are available; returns seconds waited"""
+        tokens = min(float(tokens), self.tokens_per_minute)
+        ticket = object()
+        start = time.monotonic()
+        with self._cond:
+            self._queue.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    delay = None
+                    if self._queue[0] is ticket:
+                        delay = self._delay(tokens, now)
+                        if delay <= 0:
+                            self._requests -= 1
+                            self._tokens -= tokens
+                            break
+                    if timeout is not None:
+                        remaining = start + timeout - now
+                        if remaining <= 0:
+                            raise TimeoutError("Timed out waiting for Groq rate limit capacity")
+                        delay = remaining if delay is None else min(delay, remaining)
+                    self._cond.wait(delay)
+            finally:
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+
+            waited = time.monotonic() - start
+            self.acquired += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            self.last_wait = waited
+        return waited
+
+    def pause(self, seconds: float):
+        """Hold every queued caller back, e.g. after the provider asked us to"""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+    def is_paused(self) -> bool:
+        with self._cond:
+            return self._paused_until > time.monotonic()
+
+    def queue_depth(self) -> int:
+        with self._cond:
+            return len(self._queue)
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            return {
+                "queue_depth": len(self._queue),
+                "acquired": self.acquired,
+                "avg_wait": self.total_wait / self.acquired if self.acquired else 0.0,
+                "max_wait": self.max_wait,
+                "last_wait": self.last_wait,
+            }
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, capped, honouring Retry-After"""
+
+    RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+    def __init__(self, max_retries: int = 4, base_delay: float = 1.0, max_delay: float = 30.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def is_retryable(self, error: Exception) -> bool:
+        status = getattr(error, "status_code", None)
+        if status is not None:
+            return status in self.RETRYABLE_STATUS
+        # Connection failures and timeouts carry no status code
+        return any(cls.__name__ == "APIConnectionError" for cls in type(error).__mro__)
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read the Retry-After header from an API error, if the provider sent one"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def estimate_tokens(messages: List[Dict[str, str]], max_tokens: int = 0) -> int:
+    """Rough token cost of a request (about four characters per token)"""
+    prompt_chars = sum(len(message.get("content") or "") for message in messages)
+    return prompt_chars // 4 + (max_tokens or 0)
+
+
+class ModelRouter:
+    """Pick the cheapest Groq model that can answer a planned query
+
+    Simple lookups and summaries go to the small, fast model. Only questions
+    that need reasoning across several datasets, or analytical questions whose
+    context outgrows the small model's budget, escalate to the large one.
+    """
+
+    def __init__(self, small_model: str, large_model: str, max_small_context_chars: int = 12000):
+        self.small_model = small_model
+        self.large_model = large_model
+        self.max_small_context_chars = max_small_context_chars
+        self._lock = threading.Lock()
+        self._latency: Dict[str, Dict[str, float]] = {}
+
+    def choose(self, plan, context_chars: int, override: Optional[str] = None):
+        """Return (model, reason) for a QueryPlan and the size of its context"""
+        if override:
+            model, reason = override, "pinned in settings"
+        elif plan.complexity == "analytical" and plan.is_multi_dataset:
+            model, reason = self.large_model, f"analytical across {', '.join(plan.datasets)}"
+        elif plan.complexity == "analytical" and context_chars > self.max_small_context_chars:
+            model, reason = self.large_model, f"analytical with {context_chars:,} chars of context"
+        else:
+            model, reason = self.small_model, f"{plan.complexity} question, {context_chars:,} chars of context"
+        print(f"Model router: {model} ({reason})")
+        return model, reason
+
+    def record_latency(self, model: str, seconds: float):
+        with self._lock:
+            stats = self._latency.setdefault(model, {"calls": 0, "total": 0.0, "max": 0.0})
+            stats["calls"] += 1
+            stats["total"] += seconds
+            stats["max"] = max(stats["max"], seconds)
+            average = stats["total"] / stats["calls"]
+        print(f"Model latency: {model} took {seconds:.2f}s (avg {average:.2f}s over {stats['calls']} calls)")
+
+    def latency_stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                model: {**stats, "avg": stats["total"] / stats["calls"]}
+                for model, stats in self._latency.items()
+            }
+
+
+# Process-wide: every Streamlit session runs in a thread of the same process
+completion_flight = SingleFlight()
+
+# Defaults match the Groq free tier; raise them for paid tiers
+rate_limiter = TokenBucketLimiter(
+    requests_per_minute=float(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30")),
+    tokens_per_minute=float(os.getenv("GROQ_TOKENS_PER_MINUTE", "6000")),
+)
+retry_policy = RetryPolicy(max_retries=int(os.getenv("GROQ_MAX_RETRIES", "4")))
+model_router = ModelRouter(
+    small_model=os.getenv("GROQ_SMALL_MODEL", "llama-3.1-8b-instant"),
+    large_model=os.getenv("GROQ_MODEL", "llama-3.1-70b-versatile"),
+)
+
+
+def request_key(messages: List[Dict[str, str]], model: str, **params) -> str:
+    """Stable key for a chat completion request"""
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _create_with_retry(client, messages: List[Dict[str, str]], model: str, **params):
+    """Rate-limited upstream call, retried on 429s, 5xx and connection errors"""
+    tokens = estimate_tokens(messages, params.get("max_tokens", 0))
+    attempt = 0
+    while True:
+        rate_limiter.acquire(tokens)
+        try:
+            return client.chat.completions.create(messages=messages, model=model, **params)
+        except Exception as e:
+            if attempt >= retry_policy.max_retries or not retry_policy.is_retryable(e):
+                raise
+            delay = retry_after_seconds(e)
+            if delay is not None:
+                # The provider told everyone to back off, so hold the whole queue;
+                # the next acquire() waits out the pause
+                rate_limiter.pause(delay)
+            else:
+                delay = retry_policy.backoff(attempt)
+            print(f"Groq request failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+            if not rate_limiter.is_paused():
+                time.sleep(delay)
+            attempt += 1
+
+
+def _upstream_completion(client, messages: List[Dict[str, str]], model: str, **params):
+    """One real request to the provider, metered for prefix reuse"""
+    prefix_meter.observe(model, messages)
+    completion = _create_with_retry(client, messages, model, **params)
+    prefix_meter.observe_usage(completion)
+    return completion
+
+
+def create_chat_completion(client, messages: List[Dict[str, str]], model: str, **params):
+    """Call chat.completions.create, sharing the result with identical in-flight requests"""
+    key = request_key(messages, model, **params)
+    return completion_flight.do(
+        key,
+        lambda: _upstream_completion(client, messages, model, **params),
+    )
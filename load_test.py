@@ -0,0 +1,73 @@
+"""
+Clean Air AI Chatbot - Offline Load Test
+Drives app.py main() end-to-end in concurrent headless sessions
+
+Start the mock server first, then:
+    LLM_BACKEND=mock python load_test.py --sessions 8 --queries 3
+"""
+
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from streamlit.testing.v1 import AppTest
+
+QUERIES = [
+    "Which cities have the worst air quality?",
+    "Show disease outbreaks by state",
+    "Compare electric vehicle adoption",
+    "Population growth trends",
+    "Air quality vs vehicle registrations",
+]
+
+
+def run_session(app_file, n_queries, offset):
+    """One simulated user sending a few chat messages; returns (latencies, errors)"""
+    latencies, errors = [], []
+    app = AppTest.from_file(app_file, default_timeout=120)
+    app.run()
+    for i in range(n_queries):
+        query = QUERIES[(offset + i) % len(QUERIES)]
+        started = time.perf_counter()
+        app.chat_input[0].set_value(query).run()
+        latencies.append(time.perf_counter() - started)
+        if app.exception:
+            errors.append(str(app.exception[0].value))
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for the chat app")
+    parser.add_argument("--app", default="app.py")
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=3, help="Chat messages per session")
+    args = parser.parse_args()
+
+    if os.getenv("LLM_BACKEND", "groq").lower() not in ("mock", "replay"):
+        print("⚠️ LLM_BACKEND is not mock/replay - this will call the real Groq API")
+
+    # AppTest drives a private Streamlit runtime, so each session gets its own process
+    latencies, errors = [], []
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.sessions) as pool:
+        futures = [pool.submit(run_session, args.app, args.queries, i) for i in range(args.sessions)]
+        for future in futures:
+            session_latencies, session_errors = future.result()
+            latencies.extend(session_latencies)
+            errors.extend(session_errors)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"🧪 {args.sessions} sessions x {args.queries} queries in {elapsed:.1f}s")
+    if latencies:
+        print(f"⏱️ p50 {statistics.median(latencies):.2f}s · "
+              f"p95 {latencies[int(0.95 * (len(latencies) - 1))]:.2f}s · max {latencies[-1]:.2f}s")
+    print(f"{'✅' if not errors else '❌'} {len(errors)} errors")
+    for error in errors[:5]:
+        print(f"   {error}")
+
+
+if __name__ == "__main__":
+    main()
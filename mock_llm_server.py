@@ -0,0 +1,139 @@
+"""
+Clean Air AI Chatbot - Mock LLM Server
+Local stand-in for the Groq OpenAI-compatible chat completions API
+
+Run it, then start the app with LLM_BACKEND=mock to load-test without network:
+    python mock_llm_server.py --latency 0.4 --tokens-per-second 250
+    LLM_BACKEND=mock streamlit run app.py
+"""
+
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from llm_backends import FixtureStore, synthetic_completion
+from llm_gateway import request_key
+
+CHAT_PATHS = ("/openai/v1/chat/completions", "/v1/chat/completions")
+MODEL_PATHS = ("/openai/v1/models", "/v1/models")
+
+
+def make_handler(config):
+    """Request handler bound to the server configuration"""
+
+    class MockLLMHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            if config.verbose:
+                super().log_message(format, *args)
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path in MODEL_PATHS:
+                models = [{"id": model, "object": "model", "owned_by": "mock"} for model in config.models]
+                self._send_json(200, {"object": "list", "data": models})
+            else:
+                self._send_json(404, {"error": {"message": "Not found"}})
+
+        def do_POST(self):
+            if self.path not in CHAT_PATHS:
+                self._send_json(404, {"error": {"message": "Not found"}})
+                return
+
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            messages = request.get("messages", [])
+            model = request.get("model", config.models[0])
+            params = {k: v for k, v in request.items() if k not in ("messages", "model")}
+
+            response = None
+            if config.fixtures is not None:
+                response = config.fixtures.get(request_key(messages, model, **params))
+            if response is None:
+                response = synthetic_completion(messages, model, request.get("max_tokens"), config.completion_tokens)
+
+            # Time to first token, then generation at the configured token rate
+            time.sleep(config.latency)
+            completion_tokens = response.get("usage", {}).get("completion_tokens", config.completion_tokens)
+            generation_time = completion_tokens / config.tokens_per_second if config.tokens_per_second else 0
+
+            if request.get("stream"):
+                self._stream(response, generation_time)
+            else:
+                time.sleep(generation_time)
+                self._send_json(200, response)
+
+        def _stream(self, response, generation_time):
+            """Server-sent events, one chunk per word"""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+
+            words = response["choices"][0]["message"]["content"].split(" ")
+            delay = generation_time / max(len(words), 1)
+            for i, word in enumerate(words):
+                chunk = {
+                    "id": response["id"],
+                    "object": "chat.completion.chunk",
+                    "created": response["created"],
+                    "model": response["model"],
+                    "choices": [{
+                        "index": 0,
+                        "delta": {"content": word if i == 0 else " " + word},
+                        "finish_reason": None,
+                    }],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                time.sleep(delay)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+
+    return MockLLMHandler
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible mock of the Groq API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency", type=float, default=0.3, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=250.0, help="Generation speed (0 = instant)")
+    parser.add_argument("--completion-tokens", type=int, default=200, help="Length of synthetic answers")
+    parser.add_argument("--replay", metavar="FIXTURES", help="Serve recorded responses from this JSON-lines file")
+    parser.add_argument("--models", nargs="+", default=["llama-3.1-8b-instant", "llama-3.1-70b-versatile"])
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    return parser.parse_args()
+
+
+def main():
+    """Start the mock server"""
+    config = parse_args()
+    config.fixtures = FixtureStore(config.replay) if config.replay else None
+
+    server = ThreadingHTTPServer((config.host, config.port), make_handler(config))
+    print("🧪 Mock LLM server")
+    print(f"🔗 URL: http://{config.host}:{config.port}  (set MOCK_LLM_URL to this)")
+    print(f"⏱️ Latency {config.latency}s, {config.tokens_per_second} tokens/s")
+    if config.fixtures is not None:
+        print(f"📼 Replaying {len(config.fixtures)} recorded responses from {config.replay}")
+    print("⌨️ Press Ctrl+C to stop")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Mock server stopped")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
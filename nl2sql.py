@@ -0,0 +1,198 @@
+"""
+Clean Air AI Chatbot - Natural Language to SQL
+Answer a question by having the model write one SELECT, running it locally
+on the SQL engine and sending only the result back for narration
+
+Two LLM hops per new question (SQL, then narration); repeated questions
+over the same data versions are answered from the cache with none.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import pandas as pd
+
+from datastore import dataset_version
+from llm_gateway import create_chat_completion, model_router
+from prompt_layout import build_messages
+from query_planner import build_vocabulary, plan_query
+from sql_engine import SQL_TABLES, TABLE_ALIASES, check_query, sql_engine
+
+# Rows of the result the model gets to see
+RESULT_ROWS = 50
+# Statements (or clauses) that change data or reach outside the loaded tables; REPLACE( is the string function
+WRITE_KEYWORDS = (r"\b(insert|update|delete|merge|upsert|create|drop|alter|truncate|attach|detach|pragma|"
+                  r"vacuum|copy|install|load|export|import|call|replace(?!\s*\())\b")
+
+SQL_SYSTEM_PROMPT = """You translate questions about Indian air quality, health, population and vehicle data into SQL.
+
+Rules:
+1. Reply with exactly one SQL SELECT statement and nothing else - no explanation, no code fences
+2. Use only the tables and columns listed in the schema; quote column names that contain spaces or symbols with double quotes
+3. Aggregate (SUM, AVG, COUNT, GROUP BY) instead of returning raw rows whenever the question allows it
+4. Always end with LIMIT 50 or less
+5. If the schema cannot answer the question, reply with: SELECT 'unanswerable' AS error"""
+
+NARRATION_SYSTEM_PROMPT = """You are an AI assistant specialized in analyzing air quality, health, population, and vehicle data for India.
+
+You are given the SQL query that was run against the datasets and its exact result. Answer the user's question using ONLY that result:
+1. Quote the specific numbers from the result
+2. Mention which dataset (table) the figures come from
+3. If the result is empty or does not answer the question, say so plainly
+4. DO NOT include code or SQL in your response
+5. Use short sections with bullet points"""
+
+
+@dataclass
+class SqlAnswer:
+    """A narrated answer with the query and result it is based on"""
+    question: str
+    sql: str
+    result: pd.DataFrame
+    answer: str
+    cached: bool = False
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase words only, so punctuation and spacing do not split the cache"""
+    return " ".join(re.findall(r"[a-z0-9.]+", question.lower()))
+
+
+def schema_prompt(datasets: Dict) -> str:
+    """Tables with column names and types, identical for every request over the same data"""
+    lines = ["Schema:"]
+    for name in SQL_TABLES:
+        df = datasets.get(name)
+        if isinstance(df, pd.DataFrame):
+            columns = ", ".join(f'"{c}" {df[c].dtype}' for c in df.columns)
+            lines.append(f"- {name} ({len(df)} rows): {columns}")
+    return "\n".join(lines)
+
+
+def extract_sql(text: str, datasets: Optional[Dict] = None) -> str:
+    """The single SELECT in a model reply; ValueError if there is none, it writes, or it touches unknown tables"""
+    fenced = re.search(r"```(?:sql)?\s*(.*?)```", text, flags=re.S | re.I)
+    sql = fenced.group(1) if fenced else text
+    # A WITH only counts when it opens a CTE, so prose like "help with that" is not taken for SQL
+    start = re.search(r"\bselect\b|\bwith\s+(?:recursive\s+)?\"?\w+\"?(?:\s*\([^)]*\))?\s+as\s*\(", sql, flags=re.I)
+    if not start:
+        raise ValueError("The model did not return a SELECT query")
+    sql = check_query(sql[start.start():])
+    if re.search(r"'unanswerable'\s+as\s+error", sql, flags=re.I):
+        raise ValueError("The question cannot be answered from the datasets")
+    # WITH ... DELETE passes check_query; look for write keywords outside literals and quoted names
+    bare = re.sub(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"", "''", sql)
+    write = re.search(WRITE_KEYWORDS, bare, flags=re.I)
+    if write:
+        raise ValueError(f"Generated SQL is not read-only ({write.group(1).upper()})")
+
+    known = set(SQL_TABLES) | set(TABLE_ALIASES)
+    # EXTRACT(YEAR FROM col) and friends put column names after FROM too
+    for df in (datasets or {}).values():
+        if isinstance(df, pd.DataFrame):
+            known |= {str(c).lower() for c in df.columns}
+    ctes = {name.lower() for name in re.findall(r"(\w+)\s+as\s*\(", sql, flags=re.I)}
+    tables = {name.lower() for name in re.findall(r"\b(?:from|join)\s+\"?(\w+)", sql, flags=re.I)}
+    unknown = tables - known - ctes
+    if unknown:
+        raise ValueError(f"Unknown table(s) in generated SQL: {', '.join(sorted(unknown))}")
+    return sql
+
+
+def compact_result(result: pd.DataFrame, max_rows: int = RESULT_ROWS) -> str:
+    """CSV of the first rows - the only data the narration hop sees"""
+    text = result.head(max_rows).to_csv(index=False)
+    if len(result) > max_rows:
+        text += f"... {len(result) - max_rows} more rows not shown\n"
+    return text
+
+
+class SqlAnswerCache:
+    """LRU of SqlAnswers keyed by normalized question and dataset versions"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._answers: "OrderedDict[tuple, SqlAnswer]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(question: str, datasets: Dict) -> tuple:
+        versions = tuple(
+            (name, dataset_version(datasets[name]))
+            for name in SQL_TABLES if isinstance(datasets.get(name), pd.DataFrame)
+        )
+        return normalize_question(question), versions
+
+    def get(self, key: tuple) -> Optional[SqlAnswer]:
+        with self._lock:
+            answer = self._answers.get(key)
+            if answer is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._answers.move_to_end(key)
+            return answer
+
+    def put(self, key: tuple, answer: SqlAnswer):
+        with self._lock:
+            self._answers[key] = answer
+            self._answers.move_to_end(key)
+            while len(self._answers) > self.max_entries:
+                self._answers.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._answers.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._answers), "hits": self.hits, "misses": self.misses}
+
+
+sql_answer_cache = SqlAnswerCache()
+
+
+def _complete(client, messages, model: str, max_tokens: int) -> str:
+    started = time.perf_counter()
+    completion = create_chat_completion(client, messages=messages, model=model,
+                                        temperature=0, max_tokens=max_tokens, stream=False)
+    model_router.record_latency(model, time.perf_counter() - started)
+    return completion.choices[0].message.content or ""
+
+
+def answer_with_sql(question: str, datasets: Dict, client, model_override: Optional[str] = None) -> SqlAnswer:
+    """Question -> SQL -> local result -> narrated answer
+
+    Raises ValueError when the model's SQL is unusable and lets engine
+    errors through, so the caller can fall back to the summary context.
+    """
+    key = sql_answer_cache.key(question, datasets)
+    cached = sql_answer_cache.get(key)
+    if cached is not None:
+        print(f"🗄️ SQL answer cache hit: {cached.sql}")
+        return SqlAnswer(question, cached.sql, cached.result, cached.answer, cached=True)
+
+    schema = schema_prompt(datasets)
+    model, _ = model_router.choose(plan_query(question, build_vocabulary(datasets)), len(schema), override=model_override)
+
+    # Hop 1: the model only sees the schema and writes the query
+    reply = _complete(client, build_messages(SQL_SYSTEM_PROMPT, schema, question), model, max_tokens=300)
+    sql = extract_sql(reply, datasets)
+    # Parsed as a subquery first: anything that does not return rows is refused before it runs
+    sql_engine.columns(sql, datasets)
+    result = sql_engine.query(sql, datasets, max_rows=RESULT_ROWS + 1)
+    print(f"🗄️ NL to SQL: {sql} -> {len(result)} rows")
+
+    # Hop 2: the model only sees the query and its compact result
+    context = f"SQL run against the datasets:\n{sql}\n\nResult:\n{compact_result(result)}"
+    answer = _complete(client, build_messages(NARRATION_SYSTEM_PROMPT, context, question), model, max_tokens=700)
+
+    sql_answer = SqlAnswer(question, sql, result, answer)
+    sql_answer_cache.put(key, sql_answer)
+    return sql_answer
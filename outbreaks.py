@@ -0,0 +1,200 @@
+"""
+Clean Air AI Chatbot - Outbreak Detection
+EARS C1/C2 anomaly statistics over weekly IDSP case series
+
+Every (state, district, disease) series is laid out as one row of a dense
+series x week matrix (weeks without a report count as zero cases), so the
+rolling baselines for all series come from a single sliding-window pass.
+
+- C1: baseline is the previous 7 weeks
+- C2: baseline is weeks t-9..t-3, a 2-week guard band so a slowly building
+  outbreak does not hide itself by inflating its own baseline
+
+IDSP lists outbreak reports rather than routine counts, so most series are
+zero until a report arrives. Against an all-zero baseline any report would
+score its own case count, so C1/C2 are only defined over a non-zero
+baseline; first reports (empty baseline) are listed separately and never
+count as detected outbreaks.
+
+The scan runs in a background thread once per IDSP version; the Operations
+alerts and the chat context read its result when it is ready.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from datastore import canonical_states, dataset_version, find_column, parse_dates
+
+BASELINE_WEEKS = 7
+# Floor on the baseline standard deviation: a flat non-zero baseline still needs a real jump to alarm
+MIN_SIGMA = 1.0
+MIN_CASES = 5
+OUTBREAK_THRESHOLD = 3.0
+
+OUTBREAK_COLUMNS = ["period", "state", "location", "disease", "cases", "baseline", "c1", "c2", "first_report"]
+
+
+def weekly_matrix(df: pd.DataFrame):
+    """(series index frame, week starts, cases matrix) for every state/district/disease"""
+    dates = parse_dates(df[find_column(df, "idsp", "date")])
+    weeks = (dates - pd.to_timedelta(dates.dt.weekday, unit="D")).dt.normalize()
+    district_col = find_column(df, "idsp", "district")
+    frame = pd.DataFrame({
+        "state": canonical_states(df[find_column(df, "idsp", "state")]),
+        "location": df[district_col].astype(str).str.strip() if district_col else "",
+        "disease": df[find_column(df, "idsp", "disease")].astype(str).str.strip(),
+        "week": weeks,
+        "cases": pd.to_numeric(df[find_column(df, "idsp", "cases")], errors="coerce").fillna(0),
+    }).dropna(subset=["week", "state"])
+    if frame.empty:
+        return pd.DataFrame(columns=["state", "location", "disease"]), pd.DatetimeIndex([]), np.zeros((0, 0))
+
+    keys = ["state", "location", "disease"]
+    series_id = frame.groupby(keys, sort=False, dropna=False).ngroup().to_numpy(dtype=np.int64)
+    first = frame["week"].min()
+    week_id = ((frame["week"] - first).dt.days // 7).to_numpy(dtype=np.int64)
+    n_weeks = int(week_id.max()) + 1
+
+    matrix = np.zeros((series_id.max() + 1, n_weeks))
+    np.add.at(matrix, (series_id, week_id), frame["cases"].to_numpy(dtype=float))
+    series = frame[keys].drop_duplicates().reset_index(drop=True)
+    return series, pd.date_range(first, periods=n_weeks, freq="7D"), matrix
+
+
+def ears_statistic(matrix: np.ndarray, lag: int, window: int = BASELINE_WEEKS,
+                   min_sigma: float = MIN_SIGMA):
+    """(statistic, baseline mean) per cell; statistic NaN where the baseline does not fit yet or is all zero"""
+    n, w = matrix.shape
+    statistic = np.full((n, w), np.nan)
+    baseline = np.full((n, w), np.nan)
+    if w <= window + lag:
+        return statistic, baseline
+    windows = sliding_window_view(matrix, window, axis=1)  # window j covers weeks j..j+window-1
+    means = windows.mean(axis=2)
+    sigmas = np.maximum(windows.std(axis=2, ddof=1), min_sigma)
+    weeks = np.arange(window + lag, w)
+    start = weeks - lag - window  # baseline ends `lag` weeks before the week being tested
+    baseline[:, weeks] = means[:, start]
+    scores = (matrix[:, weeks] - baseline[:, weeks]) / sigmas[:, start]
+    statistic[:, weeks] = np.where(baseline[:, weeks] > 0, scores, np.nan)
+    return statistic, baseline
+
+
+def detect_outbreaks(df: pd.DataFrame) -> pd.DataFrame:
+    """Every series-week with at least MIN_CASES cases, with its C1/C2 statistics"""
+    series, weeks, matrix = weekly_matrix(df)
+    if matrix.size == 0:
+        return pd.DataFrame(columns=OUTBREAK_COLUMNS)
+    c1, _ = ears_statistic(matrix, lag=0)
+    c2, baseline = ears_statistic(matrix, lag=2)
+
+    rows, cols = np.nonzero(matrix >= MIN_CASES)
+    result = series.iloc[rows].reset_index(drop=True)
+    result.insert(0, "period", weeks[cols])
+    result["cases"] = matrix[rows, cols]
+    result["baseline"] = baseline[rows, cols].round(1)
+    result["c1"] = c1[rows, cols].round(2)
+    result["c2"] = c2[rows, cols].round(2)
+    result["first_report"] = baseline[rows, cols] == 0
+    return result[OUTBREAK_COLUMNS].sort_values(["period", "c2"], ascending=False).reset_index(drop=True)
+
+
+class OutbreakDetector:
+    """Background scans keyed by IDSP version"""
+
+    def __init__(self, max_entries: int = 4):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._results: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+        self._running = {}
+
+    def start(self, df: pd.DataFrame):
+        """Scan `df` in a daemon thread unless it is done or already running"""
+        key = dataset_version(df)
+        with self._lock:
+            if key in self._results or key in self._running:
+                return
+            thread = threading.Thread(target=self._run, args=(key, df), name="outbreak-scan", daemon=True)
+            self._running[key] = thread
+        thread.start()
+
+    def _run(self, key: str, df: pd.DataFrame):
+        try:
+            result = detect_outbreaks(df)
+            flagged = int((result["c2"] >= OUTBREAK_THRESHOLD).sum())
+            first = int(result["first_report"].sum())
+            print(f"🦠 Outbreak scan: {len(result):,} series-weeks checked, {flagged} above C2 {OUTBREAK_THRESHOLD:g}, "
+                  f"{first} first reports")
+        except Exception as e:
+            print(f"❌ Outbreak scan failed: {e}")
+            result = pd.DataFrame(columns=OUTBREAK_COLUMNS)
+        with self._lock:
+            self._results[key] = result
+            self._running.pop(key, None)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+
+    def get(self, df: pd.DataFrame, wait: bool = False, timeout: Optional[float] = None) -> Optional[pd.DataFrame]:
+        """The scan result, or None while it is still running (unless `wait`)"""
+        key = dataset_version(df)
+        with self._lock:
+            if key in self._results:
+                return self._results[key]
+        if not wait:
+            return None
+        self.start(df)
+        with self._lock:
+            thread = self._running.get(key)
+        if thread is not None:
+            thread.join(timeout)
+        with self._lock:
+            return self._results.get(key)
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+
+outbreak_detector = OutbreakDetector()
+
+
+def _recent(result: pd.DataFrame, weeks: int) -> pd.DataFrame:
+    if result is None or result.empty:
+        return pd.DataFrame(columns=OUTBREAK_COLUMNS)
+    return result[result["period"] > result["period"].max() - pd.Timedelta(weeks=weeks)]
+
+
+def recent_outbreaks(result: pd.DataFrame, weeks: int = 4, threshold: float = OUTBREAK_THRESHOLD) -> pd.DataFrame:
+    """Series-weeks above the C2 threshold within `weeks` of the latest reported week"""
+    recent = _recent(result, weeks)
+    return recent[recent["c2"] >= threshold].sort_values("c2", ascending=False)
+
+
+def recent_first_reports(result: pd.DataFrame, weeks: int = 4) -> pd.DataFrame:
+    """Series-weeks with no cases in their baseline within `weeks` of the latest reported week"""
+    recent = _recent(result, weeks)
+    return recent[recent["first_report"].astype(bool)].sort_values("cases", ascending=False)
+
+
+def outbreak_context(df: pd.DataFrame, limit: int = 10) -> str:
+    """Chat-context lines for recent detected outbreaks and first reports; empty while the scan is running"""
+    result = outbreak_detector.get(df)
+    recent, first = recent_outbreaks(result), recent_first_reports(result)
+    lines = []
+    if not recent.empty:
+        lines.append(f"\nDetected outbreaks (EARS C2 >= {OUTBREAK_THRESHOLD:g} over a non-zero baseline, last 4 weeks of data):")
+        for row in recent.head(limit).itertuples():
+            lines.append(
+                f"- Week of {row.period:%d %b %Y}: {row.disease} in {row.location}, {row.state} - "
+                f"{row.cases:.0f} cases (baseline {row.baseline:.1f}, C2 {row.c2:.1f})"
+            )
+    if not first.empty:
+        lines.append(f"\nFirst reports (no cases in the 7-week baseline, not scored; {len(first)} in the last 4 weeks of data):")
+        for row in first.head(limit).itertuples():
+            lines.append(f"- Week of {row.period:%d %b %Y}: {row.disease} in {row.location}, {row.state} - {row.cases:.0f} cases")
+    return "\n".join(lines)
@@ -1,15 +1,22 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from groq import Groq
 import os
 from datetime import datetime
 import time
 import json
 from typing import List, Dict, Any
 import altair as alt
-import numpy as np
+from llm_gateway import model_router
+from aggregates import AGGREGATE_LABELS, aggregates
+from per_capita import cases_per_100k, registrations_per_1000
+from charts import CHART_BACKENDS, make_figure, payload_meter, render_chart
+from datastore import stamp_version
+from geo import GEOJSON_PATH, build_state_choropleth, load_state_geometry
+from histograms import DEFAULT_BINS, histogram_figure
+from profiling import PROFILE_SAMPLE_ROWS, profile_cache
+from table_view import render_table_view
+
+CHART_THEME = "dashboard"
 
 # Additional Streamlit pages
 def create_data_explorer_page():
@@ -34,58 +41,62 @@ def create_data_explorer_page():
     
     if selected_dataset and selected_dataset in datasets:
         df = datasets[selected_dataset]
+        # Every statistic on this page, computed once per dataset version
+        profile = profile_cache.get(df)
         
         # Dataset overview
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("Total Records", f"{len(df):,}")
+            st.metric("Total Records", f"{profile.rows:,}")
         with col2:
-            st.metric("Columns", f"{df.shape[1]}")
+            st.metric("Columns", f"{len(profile.columns)}")
         with col3:
-            st.metric("Memory Usage", f"{df.memory_usage(deep=True).sum() / 1024**2:.1f} MB")
+            st.metric("Memory Usage", f"{profile.memory_bytes / 1024**2:.1f} MB")
         with col4:
-            missing_data = df.isnull().sum().sum()
-            st.metric("Missing Values", f"{missing_data}")
+            st.metric("Missing Values", f"{profile.missing}")
         
         # Data preview
         st.subheader("📋 Data Preview")
-        st.dataframe(df.head(20), use_container_width=True)
+        # Sorted and filtered server-side; only the visible page is sent
+        render_table_view(df, key=f"explorer_{selected_dataset}")
         
         # Column analysis
         st.subheader("🔍 Column Analysis")
         col_tabs = st.tabs(["Numeric Columns", "Categorical Columns", "Missing Data"])
         
         with col_tabs[0]:
-            numeric_cols = df.select_dtypes(include=[np.number]).columns
+            numeric_cols = profile.names('numeric')
             if len(numeric_cols) > 0:
                 selected_numeric = st.multiselect("Select numeric columns to analyze:", numeric_cols, default=list(numeric_cols)[:3])
                 if selected_numeric:
                     st.write("Statistical Summary:")
-                    st.dataframe(df[selected_numeric].describe(), use_container_width=True)
+                    st.dataframe(profile.describe(selected_numeric), use_container_width=True)
+                    if profile.column(selected_numeric[0]).sampled:
+                        st.caption(f"Quartiles estimated from a {PROFILE_SAMPLE_ROWS:,}-row sample.")
                     
-                    # Distribution plots
+                    # Distribution plots - binned server-side, one bar per bin
+                    bins = st.slider("Histogram bins", 10, 100, DEFAULT_BINS, 5)
                     for col in selected_numeric[:2]:  # Limit to first 2 columns
-                        fig = px.histogram(df, x=col, title=f"Distribution of {col}", nbins=30)
-                        fig.update_layout(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)', font_color='white')
+                        # Cached bin counts patched into a cached figure; no rebuild per rerun
+                        fig = histogram_figure(df, col, CHART_THEME, bins)
                         st.plotly_chart(fig, use_container_width=True)
         
         with col_tabs[1]:
-            categorical_cols = df.select_dtypes(include=['object']).columns
+            categorical_cols = profile.names('categorical')
             if len(categorical_cols) > 0:
                 for col in categorical_cols[:3]:  # Limit to first 3 columns
-                    st.write(f"**{col}** - Unique values: {df[col].nunique()}")
-                    value_counts = df[col].value_counts().head(10)
-                    if len(value_counts) > 1:
-                        fig = px.pie(values=value_counts.values, names=value_counts.index, title=f"{col} Distribution")
-                        fig.update_layout(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)', font_color='white')
+                    column = profile.column(col)
+                    st.write(f"**{col}** - Unique values: {column.distinct:,}")
+                    if len(column.top_values) > 1:
+                        names, counts = zip(*column.top_values)
+                        fig = make_figure('pie', theme=CHART_THEME, values=list(counts), names=list(names), title=f"{col} Distribution")
                         st.plotly_chart(fig, use_container_width=True)
         
         with col_tabs[2]:
-            missing_data = df.isnull().sum()
+            missing_data = pd.Series({column.name: column.nulls for column in profile.columns})
             missing_data = missing_data[missing_data > 0]
             if len(missing_data) > 0:
-                fig = px.bar(x=missing_data.index, y=missing_data.values, title="Missing Data by Column")
-                fig.update_layout(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)', font_color='white')
+                fig = make_figure('bar', theme=CHART_THEME, x=missing_data.index, y=missing_data.values, title="Missing Data by Column")
                 st.plotly_chart(fig, use_container_width=True)
             else:
                 st.success("✅ No missing data found!")
@@ -157,158 +168,220 @@ def create_analytics_dashboard():
     # Detailed visualizations
     st.subheader("📊 Detailed Analytics")
     
-    # Create tabs for different analysis
-    analysis_tabs = st.tabs(["🌬️ Air Quality", "🏥 Health Trends", "👥 Demographics", "🚗 Transportation"])
-    
-    with analysis_tabs[0]:
-        if 'aqi' in datasets:
-            aqi_df = datasets['aqi']
-            
-            # Top 10 most polluted cities
-            if 'AQI' in aqi_df.columns and 'City' in aqi_df.columns:
-                top_polluted = aqi_df.nlargest(10, 'AQI')
-                fig = px.bar(
-                    top_polluted,
-                    x='AQI',
-                    y='City',
-                    title='Top 10 Most Polluted Cities',
-                    color='AQI',
-                    color_continuous_scale='Reds',
-                    orientation='h'
-                )
-                fig.update_layout(
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    font_color='white'
-                )
-                st.plotly_chart(fig, use_container_width=True)
-            
-            # Pollutant correlation
-            pollutant_cols = ['PM2.5', 'PM10', 'NO2', 'SO2', 'CO', 'O3']
-            available_pollutants = [col for col in pollutant_cols if col in aqi_df.columns]
-            
-            if len(available_pollutants) > 1:
-                corr_matrix = aqi_df[available_pollutants].corr()
-                fig = px.imshow(
-                    corr_matrix,
-                    title='Pollutant Correlation Matrix',
-                    color_continuous_scale='RdBu_r'
-                )
-                fig.update_layout(
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    font_color='white'
-                )
-                st.plotly_chart(fig, use_container_width=True)
-    
-    with analysis_tabs[1]:
-        if 'idsp' in datasets:
-            health_df = datasets['idsp']
-            
-            # Disease distribution
-            if 'Disease' in health_df.columns and 'Cases' in health_df.columns:
-                disease_cases = health_df.groupby('Disease')['Cases'].sum().sort_values(ascending=False)
-                fig = px.pie(
-                    values=disease_cases.values,
-                    names=disease_cases.index,
-                    title='Disease Distribution by Cases'
-                )
-                fig.update_layout(
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    font_color='white'
-                )
-                st.plotly_chart(fig, use_container_width=True)
-            
-            # State-wise health impact
-            if 'State' in health_df.columns and 'Cases' in health_df.columns:
-                state_cases = health_df.groupby('State')['Cases'].sum().sort_values(ascending=False).head(10)
-                fig = px.bar(
-                    x=state_cases.index,
-                    y=state_cases.values,
-                    title='Top 10 States by Disease Cases'
-                )
-                fig.update_layout(
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    font_color='white'
-                )
-                st.plotly_chart(fig, use_container_width=True)
-    
-    with analysis_tabs[2]:
-        if 'population' in datasets:
-            pop_df = datasets['population']
-            
-            # Population distribution
-            if 'State' in pop_df.columns and 'Total_Population' in pop_df.columns:
-                top_states = pop_df.nlargest(10, 'Total_Population')
-                fig = px.treemap(
-                    top_states,
-                    path=['State'],
-                    values='Total_Population',
-                    title='Population Distribution by State'
-                )
-                fig.update_layout(
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    font_color='white'
-                )
-                st.plotly_chart(fig, use_container_width=True)
-            
-            # Urban vs Rural population
-            if 'Urban_Population' in pop_df.columns and 'Rural_Population' in pop_df.columns:
-                urban_rural = pd.DataFrame({
-                    'Population_Type': ['Urban', 'Rural'],
-                    'Population': [pop_df['Urban_Population'].sum(), pop_df['Rural_Population'].sum()]
-                })
-                fig = px.pie(
-                    urban_rural,
-                    values='Population',
-                    names='Population_Type',
-                    title='Urban vs Rural Population Distribution'
-                )
-                fig.update_layout(
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    font_color='white'
-                )
-                st.plotly_chart(fig, use_container_width=True)
+    # Only the selected section runs; its figures are cached per dataset version
+    selected_tab = st.radio(
+        "Analysis",
+        list(ANALYTICS_TABS.keys()),
+        horizontal=True,
+        key="analytics_tab",
+        label_visibility="collapsed"
+    )
+    ANALYTICS_TABS[selected_tab](datasets)
+
+# Analytics dashboard sections - chart builders depend only on their dataset
+POLLUTANT_COLUMNS = ['PM2.5', 'PM10', 'NO2', 'SO2', 'CO', 'O3']
+
+def build_top_polluted_chart(df):
+    return make_figure(
+        'bar', aggregates.get(df, 'top_polluted_areas').head(10), CHART_THEME,
+        x='aqi',
+        y='area',
+        title='Top 10 Most Polluted Cities',
+        color='aqi',
+        color_continuous_scale='Reds',
+        orientation='h',
+        labels=AGGREGATE_LABELS
+    )
+
+def build_pollutant_correlation_chart(df):
+    available_pollutants = [col for col in POLLUTANT_COLUMNS if col in df.columns]
+    return make_figure(
+        'imshow', df[available_pollutants].corr(), CHART_THEME,
+        title='Pollutant Correlation Matrix',
+        color_continuous_scale='RdBu_r'
+    )
+
+def build_disease_share_chart(df):
+    return make_figure(
+        'pie', aggregates.get(df, 'disease_totals'), CHART_THEME,
+        values='cases',
+        names='disease',
+        title='Disease Distribution by Cases',
+        labels=AGGREGATE_LABELS
+    )
+
+def build_top_states_cases_chart(df):
+    return make_figure(
+        'bar', aggregates.get(df, 'state_case_totals').head(10), CHART_THEME,
+        x='state',
+        y='cases',
+        title='Top 10 States by Disease Cases',
+        labels=AGGREGATE_LABELS
+    )
+
+def build_population_treemap(df):
+    return make_figure(
+        'treemap', aggregates.get(df, 'population_by_state').head(10), CHART_THEME,
+        path=['state'],
+        values='population',
+        title='Population Distribution by State',
+        labels=AGGREGATE_LABELS
+    )
+
+def build_urban_rural_chart(df):
+    urban_rural = pd.DataFrame({
+        'Population_Type': ['Urban', 'Rural'],
+        'Population': [df['Urban_Population'].sum(), df['Rural_Population'].sum()]
+    })
+    return make_figure(
+        'pie', urban_rural, CHART_THEME,
+        values='Population',
+        names='Population_Type',
+        title='Urban vs Rural Population Distribution'
+    )
+
+def build_vehicle_class_chart(df):
+    return make_figure(
+        'pie', aggregates.get(df, 'vehicle_class_mix'), CHART_THEME,
+        values='registrations',
+        names='vehicle_class',
+        title='Vehicle Registration Distribution by Type',
+        labels=AGGREGATE_LABELS
+    )
+
+def build_fuel_trends_chart(df):
+    return make_figure(
+        'bar', aggregates.get(df, 'fuel_mix'), CHART_THEME,
+        x='fuel',
+        y='registrations',
+        title='Vehicle Registrations by Fuel Type',
+        color='registrations',
+        color_continuous_scale='Viridis',
+        labels=AGGREGATE_LABELS
+    )
+
+def render_air_quality_tab(datasets):
+    if 'aqi' in datasets:
+        aqi_df = datasets['aqi']
+        
+        # Top 10 most polluted cities
+        if aggregates.available(aqi_df, 'top_polluted_areas'):
+            render_chart(aqi_df, 'dashboard_top_polluted', CHART_THEME, build_top_polluted_chart, use_container_width=True)
+        
+        # Pollutant correlation
+        if len([col for col in POLLUTANT_COLUMNS if col in aqi_df.columns]) > 1:
+            render_chart(aqi_df, 'dashboard_pollutant_corr', CHART_THEME, build_pollutant_correlation_chart, use_container_width=True)
+
+def render_health_tab(datasets):
+    if 'idsp' in datasets:
+        health_df = datasets['idsp']
+        
+        # Disease distribution
+        if aggregates.available(health_df, 'disease_totals'):
+            render_chart(health_df, 'dashboard_disease_share', CHART_THEME, build_disease_share_chart, use_container_width=True)
+        
+        # State-wise health impact
+        if aggregates.available(health_df, 'state_case_totals'):
+            render_chart(health_df, 'dashboard_state_cases', CHART_THEME, build_top_states_cases_chart, use_container_width=True)
+
+def render_demographics_tab(datasets):
+    if 'population' in datasets:
+        pop_df = datasets['population']
+        
+        # Population distribution
+        if aggregates.available(pop_df, 'population_by_state'):
+            render_chart(pop_df, 'dashboard_population', CHART_THEME, build_population_treemap, use_container_width=True)
+        
+        # Urban vs Rural population
+        if 'Urban_Population' in pop_df.columns and 'Rural_Population' in pop_df.columns:
+            render_chart(pop_df, 'dashboard_urban_rural', CHART_THEME, build_urban_rural_chart, use_container_width=True)
+
+def render_transportation_tab(datasets):
+    if 'vahan' in datasets:
+        vehicle_df = datasets['vahan']
+        
+        # Vehicle type distribution
+        if aggregates.available(vehicle_df, 'vehicle_class_mix'):
+            render_chart(vehicle_df, 'dashboard_vehicle_class', CHART_THEME, build_vehicle_class_chart, use_container_width=True)
+        
+        # Fuel type trends
+        if aggregates.available(vehicle_df, 'fuel_mix'):
+            render_chart(vehicle_df, 'dashboard_fuel', CHART_THEME, build_fuel_trends_chart, use_container_width=True)
+
+# State comparison metrics: label -> (value column, colour scale)
+STATE_METRICS = {
+    "Average AQI": ('aqi', 'Reds'),
+    "Disease cases per 100k people per year": ('cases_per_100k', 'OrRd'),
+    "EV share of registrations (%)": ('ev_share', 'Greens'),
+    "Vehicle registrations per 1,000 people per year": ('registrations_per_1000', 'Purples'),
+}
+
+def state_metric_values(datasets, metric):
+    """One value per canonical state for the selected metric, or None"""
+    if metric == "Average AQI" and 'aqi' in datasets and aggregates.available(datasets['aqi'], 'aqi_by_state'):
+        return aggregates.get(datasets['aqi'], 'aqi_by_state')
+    if metric == "Disease cases per 100k people per year" and 'idsp' in datasets and 'population' in datasets:
+        return cases_per_100k(datasets['idsp'], datasets['population'])
+    if metric == "EV share of registrations (%)" and 'vahan' in datasets and aggregates.available(datasets['vahan'], 'ev_share_by_state'):
+        return aggregates.get(datasets['vahan'], 'ev_share_by_state')
+    if metric == "Vehicle registrations per 1,000 people per year" and 'vahan' in datasets and 'population' in datasets:
+        return registrations_per_1000(datasets['vahan'], datasets['population'])
+    return None
+
+def build_state_ranking_chart(df, column, metric, colorscale):
+    """Top states for the metric as ranked bars"""
+    return make_figure(
+        'bar', df.head(15), CHART_THEME,
+        x=column,
+        y='state',
+        title=metric,
+        color=column,
+        color_continuous_scale=colorscale,
+        orientation='h',
+        labels=AGGREGATE_LABELS
+    )
+
+def render_state_comparison_tab(datasets):
+    """State ranking for the chosen metric, plus a choropleth when a state GeoJSON is configured"""
+    metric = st.selectbox("Metric", list(STATE_METRICS.keys()), key="state_metric")
+    values = state_metric_values(datasets, metric)
+    if values is None or values.empty:
+        st.warning("The loaded data has no state-level values for this metric.")
+        return
     
-    with analysis_tabs[3]:
-        if 'vahan' in datasets:
-            vehicle_df = datasets['vahan']
-            
-            # Vehicle type distribution
-            if 'Vehicle_Class' in vehicle_df.columns and 'Registrations' in vehicle_df.columns:
-                vehicle_dist = vehicle_df.groupby('Vehicle_Class')['Registrations'].sum()
-                fig = px.pie(
-                    values=vehicle_dist.values,
-                    names=vehicle_dist.index,
-                    title='Vehicle Registration Distribution by Type'
-                )
-                fig.update_layout(
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    font_color='white'
-                )
-                st.plotly_chart(fig, use_container_width=True)
-            
-            # Fuel type trends
-            if 'Fuel_Type' in vehicle_df.columns and 'Registrations' in vehicle_df.columns:
-                fuel_trends = vehicle_df.groupby('Fuel_Type')['Registrations'].sum().sort_values(ascending=False)
-                fig = px.bar(
-                    x=fuel_trends.index,
-                    y=fuel_trends.values,
-                    title='Vehicle Registrations by Fuel Type',
-                    color=fuel_trends.values,
-                    color_continuous_scale='Viridis'
-                )
-                fig.update_layout(
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    font_color='white'
-                )
-                st.plotly_chart(fig, use_container_width=True)
+    # Charts are cached on the metric table's own version, like any other chart
+    column, colorscale = STATE_METRICS[metric]
+    values = stamp_version(values.copy())
+    render_chart(
+        values, f"state_ranking_{column}", CHART_THEME,
+        lambda df: build_state_ranking_chart(df, column, metric, colorscale),
+        use_container_width=True
+    )
+    
+    # No boundaries ship with the app; the map appears once a GeoJSON is provided
+    geometry = load_state_geometry()
+    if geometry is None:
+        st.caption(f"🗺️ A state map is shown here when an India states GeoJSON is placed at `{GEOJSON_PATH}` "
+                   "(or INDIA_STATES_GEOJSON points to one).")
+        return
+    render_chart(
+        values, f"state_map_{column}", CHART_THEME,
+        lambda df: build_state_choropleth(df, column, geometry, metric, CHART_THEME, AGGREGATE_LABELS, colorscale),
+        use_container_width=True
+    )
+    
+    mapped = {feature['properties']['state'] for feature in geometry['features']}
+    unmatched = sorted(set(values['state']) - mapped)
+    if unmatched:
+        st.caption(f"⚠️ Not on the map: {', '.join(unmatched)}")
+
+ANALYTICS_TABS = {
+    "🌬️ Air Quality": render_air_quality_tab,
+    "🏥 Health Trends": render_health_tab,
+    "👥 Demographics": render_demographics_tab,
+    "🚗 Transportation": render_transportation_tab,
+    "📊 State Comparison": render_state_comparison_tab,
+}
 
 def create_settings_page():
     """Create a settings and configuration page"""
@@ -331,13 +404,23 @@ def create_settings_page():
             os.environ["GROQ_API_KEY"] = api_key
             st.success("✅ API Key updated!")
         
-        # Model selection
+        # Model selection - "Auto" lets the router pick per question
         model_options = [
-            "llama-3.2-70b-versatile",
-            "llama-3.2-11b-text-preview",
-            "llama-3.1-70b-versatile"
+            "Auto (route by question)",
+            model_router.small_model,
+            model_router.large_model
         ]
-        selected_model = st.selectbox("AI Model", model_options)
+        current_override = st.session_state.get("model_override")
+        selected_model = st.selectbox(
+            "AI Model",
+            model_options,
+            index=model_options.index(current_override) if current_override in model_options else 0
+        )
+        st.session_state.model_override = None if selected_model == model_options[0] else selected_model
+        
+        # Per-model latency observed by the router
+        for model_name, stats in model_router.latency_stats().items():
+            st.caption(f"⏱️ {model_name}: {stats['avg']:.2f}s avg over {stats['calls']} calls")
         
         # Temperature setting
         temperature = st.slider("Response Creativity", 0.0, 1.0, 0.1, 0.1)
@@ -349,8 +432,21 @@ def create_settings_page():
         # Theme toggle (mock - Streamlit handles themes)
         theme_option = st.radio("Theme Preference", ["Auto", "Dark", "Light"])
         
-        # Chart preferences
-        chart_style = st.selectbox("Chart Style", ["Plotly", "Altair", "Both"])
+        # Chart preferences - Altair renders simple bar/pie charts as compact Vega-Lite specs
+        chart_styles = list(CHART_BACKENDS)
+        current_style = st.session_state.get("chart_style", "Plotly")
+        chart_style = st.selectbox(
+            "Chart Style",
+            chart_styles,
+            index=chart_styles.index(current_style) if current_style in chart_styles else 0
+        )
+        st.session_state.chart_style = chart_style
+        
+        # Serialised size of every chart rendered so far, per backend
+        payload_rows = payload_meter.stats()
+        if payload_rows:
+            with st.expander("📦 Chart payload sizes"):
+                st.dataframe(pd.DataFrame(payload_rows), use_container_width=True, hide_index=True)
         
         # Animation preferences
         animations_enabled = st.checkbox("Enable Animations", value=True)
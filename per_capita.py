@@ -0,0 +1,227 @@
+"""
+Clean Air AI Chatbot - Per-Capita Rates
+State x year population lookup from the projections and per-capita IDSP and
+Vahan tables joined on it
+
+The projections are long format (year, month, state, gender, value in
+thousands); only the Total gender rows count, and a year's population is the
+mean of its projected months. The lookup is a dense state x year matrix, so
+enriching an aggregate is one indexer call plus fancy indexing: years outside
+the projected range clamp to the nearest projected year, and rows without a
+year use the current year.
+
+Built once per combination of dataset versions at load time; the chat
+context, the dashboards and the risk score all read the same tables.
+"""
+
+import datetime
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from datastore import POPULATION_UNITS, canonical_states, dataset_version, find_column, parse_dates
+
+NATIONAL = "All India"
+
+# Dataset -> (count column, rate column, people per rate unit)
+PER_CAPITA_TABLES = {
+    "idsp": ("cases", "cases_per_million", 1_000_000),
+    "vahan": ("registrations", "registrations_per_1000", 1_000),
+}
+
+
+@dataclass
+class PopulationTable:
+    """Persons per canonical state (rows) and calendar year (columns `years`)"""
+    states: pd.Index
+    years: np.ndarray
+    persons: np.ndarray
+
+    @property
+    def reference_year(self) -> int:
+        """The current year, clamped to the projected range"""
+        return int(np.clip(datetime.date.today().year, self.years[0], self.years[-1]))
+
+    def lookup(self, states, years) -> np.ndarray:
+        """Population for each (state, year) pair; NaN for states the projections do not list"""
+        row = self.states.get_indexer(pd.Index(states))
+        years = np.asarray(years, dtype=float)
+        years = np.where(np.isnan(years), self.reference_year, years)
+        col = (np.clip(years, self.years[0], self.years[-1]) - self.years[0]).astype(int)
+        return np.where(row >= 0, self.persons[np.maximum(row, 0), col], np.nan)
+
+    def totals(self, year: Optional[int] = None) -> pd.Series:
+        """Population per state (All India excluded) in `year`, default the reference year"""
+        year = self.reference_year if year is None else year
+        values = pd.Series(self.lookup(self.states, np.full(len(self.states), year)), index=self.states)
+        return values.drop(NATIONAL, errors="ignore").dropna().rename_axis("state").rename("population")
+
+
+def build_population_table(df: pd.DataFrame) -> Optional[PopulationTable]:
+    """State x year matrix from the projections; None without state and population columns"""
+    state_col = find_column(df, "population", "state")
+    value_col = find_column(df, "population", "population")
+    if not (state_col and value_col):
+        return None
+
+    rows = df
+    gender_col = find_column(df, "population", "gender")
+    if gender_col:
+        rows = rows[rows[gender_col].astype(str).str.strip().str.lower() == "total"]
+    year_col = find_column(df, "population", "year")
+    frame = pd.DataFrame({
+        "state": canonical_states(rows[state_col]),
+        "year": pd.to_numeric(rows[year_col], errors="coerce") if year_col else datetime.date.today().year,
+        "persons": pd.to_numeric(rows[value_col], errors="coerce") * POPULATION_UNITS.get(value_col, 1),
+    }).dropna()
+    if frame.empty:
+        return None
+
+    # Mean over the projected months of each year; gaps take the nearest projected year
+    by_year = frame.groupby(["state", "year"])["persons"].mean().unstack("year")
+    years = np.arange(int(by_year.columns.min()), int(by_year.columns.max()) + 1)
+    by_year = by_year.reindex(columns=years).ffill(axis=1).bfill(axis=1)
+    return PopulationTable(states=by_year.index, years=years, persons=by_year.to_numpy(dtype=float))
+
+
+def _years(df: pd.DataFrame, dataset: str) -> pd.Series:
+    """Calendar year of each row: the year column, else the year of the date column, else NaN"""
+    year_col = find_column(df, dataset, "year")
+    if year_col:
+        return pd.to_numeric(df[year_col], errors="coerce")
+    date_col = find_column(df, dataset, "date")
+    if date_col:
+        return parse_dates(df[date_col]).dt.year
+    return pd.Series(np.nan, index=df.index)
+
+
+def per_capita_table(df: pd.DataFrame, dataset: str, population: PopulationTable) -> pd.DataFrame:
+    """Totals per state and year joined to the population, with the dataset's per-capita rate"""
+    count, rate, per = PER_CAPITA_TABLES[dataset]
+    counts = pd.DataFrame({
+        "state": canonical_states(df[find_column(df, dataset, "state")]),
+        "year": _years(df, dataset),
+        count: pd.to_numeric(df[find_column(df, dataset, count)], errors="coerce"),
+    })
+    totals = counts.groupby(["state", "year"], dropna=False, as_index=False)[count].sum()
+    totals = totals.dropna(subset=["state"])
+    totals["population"] = population.lookup(totals["state"], totals["year"])
+    totals[rate] = per * totals[count] / totals["population"].where(totals["population"] > 0)
+    return totals.sort_values(["year", rate], ascending=[False, False]).reset_index(drop=True)
+
+
+def per_capita_available(df, dataset: str) -> bool:
+    return (isinstance(df, pd.DataFrame) and dataset in PER_CAPITA_TABLES
+            and find_column(df, dataset, "state") is not None
+            and find_column(df, dataset, PER_CAPITA_TABLES[dataset][0]) is not None)
+
+
+class PerCapitaIndex:
+    """PopulationTable per population version, per-capita tables per (dataset, population) versions"""
+
+    def __init__(self, max_entries: int = 16):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, object]" = OrderedDict()
+
+    def _cached(self, key: tuple, build):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        value = build()
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def population(self, population: pd.DataFrame) -> Optional[PopulationTable]:
+        return self._cached(("population", dataset_version(population)), lambda: build_population_table(population))
+
+    def get(self, df: pd.DataFrame, dataset: str, population: pd.DataFrame) -> Optional[pd.DataFrame]:
+        """Per-capita table for `dataset`; None when the population has no usable lookup"""
+        table = self.population(population)
+        if table is None or not per_capita_available(df, dataset):
+            return None
+        key = (dataset, dataset_version(df), dataset_version(population))
+        return self._cached(key, lambda: per_capita_table(df, dataset, table))
+
+    def precompute(self, datasets: Dict):
+        population = datasets.get("population")
+        if not isinstance(population, pd.DataFrame):
+            return
+        for dataset in PER_CAPITA_TABLES:
+            if per_capita_available(datasets.get(dataset), dataset):
+                self.get(datasets[dataset], dataset, population)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+per_capita = PerCapitaIndex()
+
+
+def state_rates(df: pd.DataFrame, dataset: str, population: pd.DataFrame, per: int, name: str) -> pd.DataFrame:
+    """Annual count per `per` people per state, averaged over the years in the dataset
+
+    Each year's count is set against that year's population; a year in which a
+    state reported nothing counts as zero.
+    """
+    table = per_capita.get(df, dataset, population)
+    if table is None:
+        return pd.DataFrame(columns=["state", name])
+    count = PER_CAPITA_TABLES[dataset][0]
+    yearly = per * table[count] / table["population"].where(table["population"] > 0)
+    years = max(table["year"].nunique(), 1)
+    rate = (yearly.groupby(table["state"]).sum(min_count=1) / years).drop(NATIONAL, errors="ignore").dropna()
+    return rate.sort_values(ascending=False).rename_axis("state").reset_index(name=name)
+
+
+def cases_per_100k(idsp: pd.DataFrame, population: pd.DataFrame) -> pd.DataFrame:
+    """Reported cases per 100,000 people per year, per state present in both datasets"""
+    return state_rates(idsp, "idsp", population, 100_000, "cases_per_100k")
+
+
+def registrations_per_1000(vahan: pd.DataFrame, population: pd.DataFrame) -> pd.DataFrame:
+    """Vehicle registrations per 1,000 people per year, per state present in both datasets"""
+    return state_rates(vahan, "vahan", population, 1_000, "registrations_per_1000")
+
+
+def per_capita_context(datasets: Dict, dataset: str, limit: int = 10) -> str:
+    """Chat-context lines: per-capita rates by state for the dataset's latest year, or the population lookup"""
+    population = datasets.get("population")
+    if not isinstance(population, pd.DataFrame):
+        return ""
+    table = per_capita.population(population)
+    if table is None:
+        return ""
+
+    if dataset == "population":
+        year = table.reference_year
+        totals = table.totals(year).sort_values(ascending=False)
+        lines = [f"\nProjected population by state ({year}, Total gender, persons):"]
+        lines += [f"- {state}: {persons:,.0f}" for state, persons in totals.head(limit).items()]
+        return "\n".join(lines) if len(totals) else ""
+
+    rates = per_capita.get(datasets.get(dataset), dataset, population) if dataset in PER_CAPITA_TABLES else None
+    if rates is None or rates["population"].isna().all():
+        return ""
+    count, rate, per = PER_CAPITA_TABLES[dataset]
+    rates = rates.dropna(subset=[rate])
+    year = rates["year"].max()
+    latest = rates[rates["year"] == year] if pd.notna(year) else rates[rates["year"].isna()]
+    latest = latest[latest["state"] != NATIONAL]
+    label = f"{int(year)}" if pd.notna(year) else "all years"
+    unit = "million" if per == 1_000_000 else f"{per:,}"
+    lines = [f"\n{count.capitalize()} per {unit} people by state ({label}, population projections for the same year):"]
+    for row in latest.head(limit).itertuples(index=False):
+        row = row._asdict()
+        lines.append(f"- {row['state']}: {row[rate]:,.1f} ({row[count]:,.0f} {count}, population {row['population']:,.0f})")
+    return "\n".join(lines)
@@ -0,0 +1,171 @@
+"""
+Clean Air AI Chatbot - Column Profiler
+One pass over a dataset for every statistic the Data Explorer shows,
+cached per dataset version
+
+Exact where it is cheap (counts, nulls, distinct counts, min/max/mean,
+numeric memory); estimated from one shared uniform row sample where it
+would mean sorting or scanning every string (quantiles and top values on
+large frames, string memory).
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from datastore import dataset_version
+
+# Rows above which quantiles, top values and string sizes come from a sample
+PROFILE_SAMPLE_ROWS = 100_000
+TOP_K = 10
+
+
+@dataclass
+class ColumnProfile:
+    """Statistics for one column"""
+    name: str
+    dtype: str
+    kind: str  # 'numeric', 'categorical' or 'other'
+    count: int
+    nulls: int
+    distinct: int
+    memory_bytes: int
+    min: Optional[float] = None
+    max: Optional[float] = None
+    mean: Optional[float] = None
+    std: Optional[float] = None
+    quantiles: Dict[str, float] = field(default_factory=dict)
+    top_values: List[tuple] = field(default_factory=list)
+    sampled: bool = False
+
+
+@dataclass
+class DatasetProfile:
+    """Statistics for a whole frame"""
+    rows: int
+    columns: List[ColumnProfile]
+    index_bytes: int = 0
+
+    @property
+    def memory_bytes(self) -> int:
+        """Columns plus index, the same total as df.memory_usage(deep=True).sum()"""
+        return self.index_bytes + sum(column.memory_bytes for column in self.columns)
+
+    @property
+    def missing(self) -> int:
+        return sum(column.nulls for column in self.columns)
+
+    def column(self, name: str) -> ColumnProfile:
+        return next(column for column in self.columns if column.name == name)
+
+    def names(self, kind: str) -> List[str]:
+        return [column.name for column in self.columns if column.kind == kind]
+
+    def describe(self, names: List[str]) -> pd.DataFrame:
+        """Same layout as DataFrame.describe() for numeric columns"""
+        rows = {}
+        for name in names:
+            column = self.column(name)
+            rows[name] = {
+                "count": column.count, "mean": column.mean, "std": column.std, "min": column.min,
+                **column.quantiles, "max": column.max,
+            }
+        return pd.DataFrame(rows)
+
+
+def _string_memory(values: pd.Series, sample: pd.Series) -> int:
+    """Object column memory: pointer array plus the sampled mean object size scaled up"""
+    if sample.empty:
+        return values.memory_usage(index=False, deep=False)
+    mean_size = float(np.mean([sys.getsizeof(value) for value in sample.to_numpy()]))
+    return int(values.memory_usage(index=False, deep=False) + mean_size * len(values))
+
+
+def profile_column(values: pd.Series, sample: pd.Series, sampled: bool) -> ColumnProfile:
+    """Statistics for one column; `sample` is the same column over the shared row sample"""
+    nulls = int(values.isna().sum())
+    sample = sample.dropna()
+
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        kind = "numeric"
+    elif values.dtype == object or isinstance(values.dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(values):
+        kind = "categorical"
+    else:
+        kind = "other"
+
+    profile = ColumnProfile(
+        name=str(values.name),
+        dtype=str(values.dtype),
+        kind=kind,
+        count=len(values) - nulls,
+        nulls=nulls,
+        # Hash-table count; cheaper here than hashing every value for a sketch
+        distinct=int(values.nunique()),
+        memory_bytes=int(values.memory_usage(index=False, deep=False)),
+        sampled=sampled,
+    )
+
+    if kind == "numeric" and profile.count:
+        array = values.to_numpy(dtype=float, na_value=np.nan)
+        observed = array[~np.isnan(array)]
+        if observed.size:
+            profile.min, profile.max = float(observed.min()), float(observed.max())
+            profile.mean = float(observed.mean())
+            profile.std = float(observed.std(ddof=1)) if observed.size > 1 else float("nan")
+            # The sample of a sparse column can miss every value; fall back to the full column
+            points = sample.to_numpy(dtype=float, na_value=np.nan)
+            points = points[~np.isnan(points)]
+            points = np.quantile(points if points.size else observed, [0.25, 0.5, 0.75])
+            profile.quantiles = {"25%": float(points[0]), "50%": float(points[1]), "75%": float(points[2])}
+    elif kind == "categorical":
+        if values.dtype == object:
+            profile.memory_bytes = _string_memory(values, sample.head(2000))
+        counts = sample.value_counts().head(TOP_K)
+        # Scale sampled counts back up to the full column
+        scale = profile.count / len(sample) if len(sample) else 1
+        profile.top_values = [(value, int(round(count * scale))) for value, count in counts.items()]
+    return profile
+
+
+def profile_dataset(df: pd.DataFrame, sample_rows: int = PROFILE_SAMPLE_ROWS) -> DatasetProfile:
+    """Profile every column; large frames share one uniform row sample"""
+    sample = df
+    if len(df) > sample_rows:
+        sample = df.iloc[np.sort(np.random.default_rng(0).choice(len(df), sample_rows, replace=False))]
+    sampled = sample is not df
+    return DatasetProfile(
+        rows=len(df),
+        columns=[profile_column(df[name], sample[name], sampled) for name in df.columns],
+        index_bytes=int(df.index.memory_usage(deep=True)),
+    )
+
+
+class ProfileCache:
+    """Dataset profiles keyed by dataset version"""
+
+    def __init__(self, max_entries: int = 16):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._profiles: "OrderedDict[str, DatasetProfile]" = OrderedDict()
+
+    def get(self, df: pd.DataFrame) -> DatasetProfile:
+        key = dataset_version(df)
+        with self._lock:
+            if key in self._profiles:
+                self._profiles.move_to_end(key)
+                return self._profiles[key]
+
+        profile = profile_dataset(df)
+        with self._lock:
+            self._profiles[key] = profile
+            while len(self._profiles) > self.max_entries:
+                self._profiles.popitem(last=False)
+        return profile
+
+
+profile_cache = ProfileCache()
@@ -0,0 +1,113 @@
+"""
+Clean Air AI Chatbot - Prompt Layout
+Canonical request layout so consecutive prompts share a byte-identical prefix
+
+Order: static system prompt -> dataset dictionary -> per-dataset summaries
+(ordered by dataset version) -> figures derived for this question (trends,
+outbreaks, per-capita rates) -> the user's question. Everything before the
+derived figures only changes when the data does, which lets provider-side
+prompt caching reuse it across requests and sessions.
+"""
+
+import threading
+from collections import deque
+from os.path import commonprefix
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+from datastore import dataset_version
+
+
+def data_dictionary(datasets: Dict) -> str:
+    """Column listing for every loaded dataset, identical for every request"""
+    lines = ["Dataset dictionary:"]
+    for name in sorted(datasets):
+        df = datasets[name]
+        if isinstance(df, pd.DataFrame):
+            lines.append(f"- {name.upper()} ({len(df)} rows): {', '.join(map(str, df.columns))}")
+    return "\n".join(lines)
+
+
+def order_summaries(datasets: Dict, summaries: Dict[str, str]) -> List[Tuple[str, str]]:
+    """Sort (name, summary) pairs by dataset version, then name"""
+    return sorted(
+        summaries.items(),
+        key=lambda item: (dataset_version(datasets[item[0]]), item[0]),
+    )
+
+
+def assemble_context(datasets: Dict, summaries: Dict[str, str], derived: List[str] = ()) -> str:
+    """Dictionary, the per-dataset summaries in canonical order, then the question-specific figures"""
+    parts = [data_dictionary(datasets), "", "Dataset summaries:"]
+    for _, summary in order_summaries(datasets, summaries):
+        parts.append(summary)
+    derived = [text.strip("\n") for text in derived if text and text.strip()]
+    if derived:
+        parts += ["", "Figures for this question:"] + derived
+    return "\n".join(parts)
+
+
+def build_messages(system_prompt: str, context: str, question: str) -> List[Dict[str, str]]:
+    """Chat messages with the volatile question as the very last thing"""
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"{context}\n\nUser Question: {question}"},
+    ]
+
+
+class PrefixReuseMeter:
+    """Measure how much of each prompt repeats a recent prompt to the same model
+
+    The reuse ratio is the share of prompt characters that sit inside the
+    longest prefix shared with one of the last `window` requests - an upper
+    bound on what provider-side prefix caching can serve. When the provider
+    reports cached prompt tokens, those are tallied too.
+    """
+
+    def __init__(self, window: int = 32):
+        self.window = window
+        self._lock = threading.Lock()
+        self._recent: Dict[str, deque] = {}
+        self.requests = 0
+        self.prompt_chars = 0
+        self.reused_chars = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    @staticmethod
+    def serialize(messages: List[Dict[str, str]]) -> str:
+        return "".join(f"<{m['role']}>{m.get('content') or ''}" for m in messages)
+
+    def observe(self, model: str, messages: List[Dict[str, str]]) -> int:
+        """Record a request; returns the length of its reusable prefix"""
+        prompt = self.serialize(messages)
+        with self._lock:
+            recent = self._recent.setdefault(model, deque(maxlen=self.window))
+            reused = max((len(commonprefix([prompt, previous])) for previous in recent), default=0)
+            recent.append(prompt)
+            self.requests += 1
+            self.prompt_chars += len(prompt)
+            self.reused_chars += reused
+        return reused
+
+    def observe_usage(self, completion):
+        """Tally provider-reported cached prompt tokens, when the response has them"""
+        usage = getattr(completion, "usage", None)
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        with self._lock:
+            self.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+            self.cached_tokens += getattr(details, "cached_tokens", 0) or 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "prefix_reuse_ratio": self.reused_chars / self.prompt_chars if self.prompt_chars else 0.0,
+                "cached_token_ratio": self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0,
+            }
+
+
+prefix_meter = PrefixReuseMeter()
@@ -0,0 +1,175 @@
+"""
+Clean Air AI Chatbot - Query Planner
+Works out which datasets a question needs and how hard it is to answer
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from datastore import INDIAN_STATES, STATE_ALIASES, canonical_state, dataset_version, find_column
+
+ALL_DATASETS = ['aqi', 'idsp', 'population', 'vahan']
+
+DATASET_KEYWORDS = {
+    'aqi': ['air quality', 'aqi', 'pollution', 'pm2.5', 'pm10', 'pollutant'],
+    'idsp': ['disease', 'outbreak', 'health', 'dengue', 'malaria', 'illness'],
+    'population': ['population', 'demographic', 'people', 'growth'],
+    'vahan': ['vehicle', 'car', 'bike', 'transport', 'registration', 'electric'],
+}
+
+# Words that signal the answer needs reasoning across numbers, not a lookup
+ANALYTICAL_KEYWORDS = [
+    'compare', 'comparison', ' vs ', 'versus', 'correlat', 'relationship', 'impact',
+    'effect', 'cause', 'why', 'trend', 'over time', 'forecast', 'predict', 'risk',
+    'explain', 'analy', 'relative', 'per capita', 'ratio', 'between',
+]
+
+# Place and disease names from the data that read as ordinary words in a question
+# ("states in the west"); names shorter than MIN_TERM_LENGTH ("mon", "una") are skipped too
+COMMON_WORDS = {
+    'west', 'east', 'north', 'south', 'central', 'city', 'town', 'district', 'state', 'rural',
+    'urban', 'total', 'other', 'others', 'unknown', 'india', 'cases', 'deaths', 'fever', 'year',
+}
+MIN_TERM_LENGTH = 4
+
+
+@dataclass
+class QueryPlan:
+    """What the planner decided about a user question"""
+    query: str
+    datasets: List[str] = field(default_factory=list)
+    matched_datasets: bool = True
+    analytical_terms: List[str] = field(default_factory=list)
+    states: List[str] = field(default_factory=list)
+    places: List[str] = field(default_factory=list)
+    diseases: List[str] = field(default_factory=list)
+
+    @property
+    def complexity(self) -> str:
+        """'analytical' when the question asks for reasoning, otherwise 'simple'"""
+        return 'analytical' if self.analytical_terms else 'simple'
+
+    @property
+    def is_multi_dataset(self) -> bool:
+        return self.matched_datasets and len(self.datasets) > 1
+
+    @property
+    def has_entities(self) -> bool:
+        return bool(self.states or self.places or self.diseases)
+
+
+# Query classification and processing
+def classify_query(query: str) -> List[str]:
+    """Classify which datasets are relevant for the query"""
+    # If no specific dataset identified, the plan includes all of them
+    return plan_query(query).datasets
+
+
+def _normalize(text: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9.]+", str(text).lower()))
+
+
+_vocabulary_lock = threading.Lock()
+_vocabulary_cache: "OrderedDict[tuple, Dict[str, Dict[str, str]]]" = OrderedDict()
+VOCABULARY_MAX_ENTRIES = 8
+
+
+def build_vocabulary(datasets: Dict) -> Dict[str, Dict[str, str]]:
+    """Entity names known to the data: normalised term -> canonical value, per kind
+
+    Built once per combination of dataset versions.
+    """
+    frames = {name: df for name, df in datasets.items() if isinstance(df, pd.DataFrame)}
+    key = tuple(sorted((name, dataset_version(df)) for name, df in frames.items()))
+    with _vocabulary_lock:
+        if key in _vocabulary_cache:
+            _vocabulary_cache.move_to_end(key)
+            return _vocabulary_cache[key]
+
+    vocabulary = {"states": {}, "places": {}, "diseases": {}}
+    for name in INDIAN_STATES:
+        vocabulary["states"][_normalize(name)] = name
+    for alias, name in STATE_ALIASES.items():
+        vocabulary["states"][_normalize(alias)] = name
+
+    for dataset, field_name, kind in (
+        ("aqi", "area", "places"),
+        ("idsp", "district", "places"),
+        ("idsp", "disease", "diseases"),
+    ):
+        df = frames.get(dataset)
+        column = find_column(df, dataset, field_name) if df is not None else None
+        if column:
+            for value in df[column].dropna().unique():
+                term = _normalize(value)
+                if len(term) >= MIN_TERM_LENGTH and term not in COMMON_WORDS:
+                    vocabulary[kind].setdefault(term, str(value).strip())
+
+    # A place that is also a state name is treated as the state
+    for term in vocabulary["states"]:
+        vocabulary["places"].pop(term, None)
+
+    with _vocabulary_lock:
+        _vocabulary_cache[key] = vocabulary
+        while len(_vocabulary_cache) > VOCABULARY_MAX_ENTRIES:
+            _vocabulary_cache.popitem(last=False)
+    return vocabulary
+
+
+def extract_entities(query: str, vocabulary: Dict[str, Dict[str, str]]) -> Dict[str, List[str]]:
+    """States, places and diseases named in the query (matched on 1-4 word n-grams)
+
+    An n-gram inside a longer match of any kind is dropped: "food poisoning"
+    is not also "poisoning", and "West Bengal" is not also the district "West".
+    """
+    tokens = _normalize(query).split()
+    # (start, end, kind, term) for every n-gram in the vocabulary
+    matches = [
+        (i, i + n, kind, " ".join(tokens[i:i + n]))
+        for n in range(1, 5)
+        for i in range(len(tokens) - n + 1)
+        for kind, terms in vocabulary.items()
+        if " ".join(tokens[i:i + n]) in terms
+    ]
+    kept = [
+        match for match in matches
+        if not any(other[0] <= match[0] and match[1] <= other[1] and other[1] - other[0] > match[1] - match[0]
+                   for other in matches)
+    ]
+    entities = {}
+    for kind, terms in vocabulary.items():
+        values = {terms[term] for _, _, matched_kind, term in kept if matched_kind == kind}
+        if kind == "states":
+            values = {canonical_state(value) for value in values}
+        entities[kind] = sorted(values)
+    return entities
+
+
+def plan_query(query: str, vocabulary: Optional[Dict[str, Dict[str, str]]] = None) -> QueryPlan:
+    """Classify the query, extract named entities and estimate how much reasoning it needs"""
+    query_lower = f" {query.lower()} "
+    datasets = [
+        name for name, keywords in DATASET_KEYWORDS.items()
+        if any(keyword in query_lower for keyword in keywords)
+    ]
+    entities = extract_entities(query, vocabulary or build_vocabulary({}))
+
+    # A named disease is a health question even without the usual keywords
+    if entities["diseases"] and 'idsp' not in datasets:
+        datasets.append('idsp')
+
+    matched = bool(datasets)
+    return QueryPlan(
+        query=query,
+        datasets=datasets if matched else list(ALL_DATASETS),
+        matched_datasets=matched,
+        analytical_terms=[term.strip() for term in ANALYTICAL_KEYWORDS if term in query_lower],
+        states=entities["states"],
+        places=entities["places"],
+        diseases=entities["diseases"],
+    )
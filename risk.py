@@ -0,0 +1,160 @@
+"""
+Clean Air AI Chatbot - Risk Score
+Composite per-state risk index for the Executive dashboard
+
+Three components, each on a 0-100 scale:
+- air: mean AQI on the CPCB 0-500 scale
+- health: reported cases per 100k people per year (each year against that
+  year's projected population, averaged over years), as a percentile rank
+  across states
+- vehicles: diesel share of vehicle registrations
+
+A state's score is the weighted mean of the components it has data for,
+the weights renormalised over those components; `coverage` shows how many
+it has. States with fewer than MIN_COMPONENTS components are listed unscored
+and left out of the national score, so no state ranks on health alone.
+Everything is built once per combination of dataset versions; Executive
+sessions after the first get it from a dictionary lookup.
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import pandas as pd
+
+from aggregates import aggregates
+from alerts import alert_engine, recent_alerts
+from outbreaks import outbreak_detector
+from per_capita import cases_per_100k, per_capita
+from datastore import dataset_version
+
+RISK_WEIGHTS = {"air": 0.45, "health": 0.35, "vehicles": 0.20}
+MIN_COMPONENTS = 2
+AQI_SCALE_MAX = 500
+# Satisfactory or better on the CPCB scale
+COMPLIANT_AQI = 100
+
+RISK_DATASETS = ("aqi", "idsp", "population", "vahan")
+
+
+@dataclass
+class RiskSummary:
+    """National score, per-state breakdown and the Executive headline counts"""
+    score: Optional[float]
+    states: pd.DataFrame
+    critical_aqi_areas: int
+    outbreak_districts: int
+    compliance_pct: Optional[float]
+    scored_states: int = 0
+
+
+def _available(datasets: Dict, name: str, table: str) -> bool:
+    df = datasets.get(name)
+    return isinstance(df, pd.DataFrame) and aggregates.available(df, table)
+
+
+def _population_table(datasets: Dict):
+    df = datasets.get("population")
+    return per_capita.population(df) if isinstance(df, pd.DataFrame) else None
+
+
+def state_components(datasets: Dict) -> pd.DataFrame:
+    """One row per state: air/health/vehicles where computable (NaN otherwise), the score and its coverage"""
+    parts = []
+    if _available(datasets, "aqi", "aqi_by_state"):
+        air = aggregates.get(datasets["aqi"], "aqi_by_state").set_index("state")["aqi"]
+        parts.append((100 * air / AQI_SCALE_MAX).clip(0, 100).rename("air"))
+    if _available(datasets, "idsp", "state_case_totals") and _population_table(datasets) is not None:
+        rate = cases_per_100k(datasets["idsp"], datasets["population"]).set_index("state")["cases_per_100k"]
+        parts.append((100 * rate.rank(pct=True)).rename("health"))
+    if _available(datasets, "vahan", "diesel_share_by_state"):
+        diesel = aggregates.get(datasets["vahan"], "diesel_share_by_state").set_index("state")["diesel_share"]
+        parts.append(diesel.clip(0, 100).rename("vehicles"))
+    if not parts:
+        return pd.DataFrame(columns=["state", *RISK_WEIGHTS, "score", "coverage"])
+
+    components = pd.concat(parts, axis=1)
+    weights = pd.Series(RISK_WEIGHTS)[components.columns]
+    present = components.notna()
+    # Weights renormalised over the components each state has
+    score = (components.fillna(0) * weights).sum(axis=1) / (present * weights).sum(axis=1)
+    counts = present.sum(axis=1)
+    components["score"] = score.where(counts >= min(MIN_COMPONENTS, len(weights))).round(1)
+    components["coverage"] = counts.astype(str) + f"/{len(weights)}"
+    return components.sort_values("score", ascending=False).rename_axis("state").reset_index()
+
+
+def national_score(states: pd.DataFrame, datasets: Dict) -> Optional[float]:
+    """Mean of the scored states weighted by this year's projected population, plain mean where it is unknown"""
+    scores = states.set_index("state")["score"].dropna()
+    if scores.empty:
+        return None
+    table = _population_table(datasets)
+    if table is not None:
+        people = table.totals().reindex(scores.index)
+        if people.notna().any():
+            weighted = scores[people.notna()]
+            return float((weighted * people.dropna()).sum() / people.dropna().sum())
+    return float(scores.mean())
+
+
+def build_risk_summary(datasets: Dict) -> RiskSummary:
+    states = state_components(datasets)
+
+    alerts = recent_alerts(alert_engine.evaluate(datasets))
+    places = ["state", "location"]
+    critical_aqi = alerts[(alerts["dataset"] == "aqi") & (alerts["severity"] == "critical")]
+    # Case growth and deaths alerts are IDSP alerts too, but not outbreaks
+    outbreaks = alerts[(alerts["dataset"] == "idsp") & (alerts["rule"] == "Outbreak detected")]
+
+    compliance = None
+    if _available(datasets, "aqi", "top_polluted_areas"):
+        areas = aggregates.get(datasets["aqi"], "top_polluted_areas")
+        if len(areas):
+            compliance = float(100 * (areas["aqi"] <= COMPLIANT_AQI).mean())
+
+    return RiskSummary(
+        score=national_score(states, datasets),
+        states=states,
+        critical_aqi_areas=len(critical_aqi.drop_duplicates(places)),
+        outbreak_districts=len(outbreaks.drop_duplicates(places)),
+        compliance_pct=compliance,
+        scored_states=int(states["score"].notna().sum()),
+    )
+
+
+class RiskIndex:
+    """RiskSummary per combination of dataset versions"""
+
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._summaries: "OrderedDict[tuple, RiskSummary]" = OrderedDict()
+
+    def get(self, datasets: Dict) -> RiskSummary:
+        key = tuple(
+            (name, dataset_version(datasets[name]))
+            for name in RISK_DATASETS if isinstance(datasets.get(name), pd.DataFrame)
+        )
+        # Outbreak counts change once the background scan finishes
+        key += (isinstance(datasets.get("idsp"), pd.DataFrame) and outbreak_detector.get(datasets["idsp"]) is not None,)
+        with self._lock:
+            if key in self._summaries:
+                self._summaries.move_to_end(key)
+                return self._summaries[key]
+
+        summary = build_risk_summary(datasets)
+        with self._lock:
+            self._summaries[key] = summary
+            while len(self._summaries) > self.max_entries:
+                self._summaries.popitem(last=False)
+        return summary
+
+    def clear(self):
+        with self._lock:
+            self._summaries.clear()
+
+
+risk_index = RiskIndex()
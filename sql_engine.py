@@ -0,0 +1,314 @@
+"""
+Clean Air AI Chatbot - SQL Engine
+Read-only SQL over the loaded datasets for the Analyst dashboard
+
+SQL_ENGINE selects the engine:
+- duckdb (default when installed) frames are registered zero-copy as views
+- sqlite (always available) frames are copied into an in-memory database
+  once per dataset version
+
+Queries are limited to a single SELECT/WITH statement, interrupted after
+SQL_TIMEOUT_SECONDS and cut off at SQL_MAX_ROWS; results are fetched in
+batches so the first rows can be shown while the rest are read.
+
+check_query only looks at the text, so the engines enforce read-only access
+themselves: SQLite runs user queries with PRAGMA query_only and an authorizer
+that allows reads only, DuckDB accepts SELECT statements only and is opened
+without file or network access. A statement that returns no result columns
+is rejected either way.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+
+from datastore import dataset_version
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+SQL_BACKENDS = ("duckdb", "sqlite")
+SQL_TABLES = ("aqi", "idsp", "vahan", "population")
+# Extra names that read more naturally in hand-written queries
+TABLE_ALIASES = {"air_quality": "aqi", "health": "idsp", "vehicles": "vahan"}
+
+MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", "10000"))
+TIMEOUT_SECONDS = float(os.getenv("SQL_TIMEOUT_SECONDS", "10"))
+BATCH_ROWS = 1000
+
+# What a read-only SQLite query may do; everything else is denied at prepare time
+SQLITE_READ_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+
+
+def sql_backend_name() -> str:
+    """Configured engine; DuckDB when installed, otherwise SQLite"""
+    name = os.getenv("SQL_ENGINE", "duckdb").strip().lower()
+    if name == "duckdb" and duckdb is None:
+        return "sqlite"
+    return name if name in SQL_BACKENDS else "sqlite"
+
+
+def _strip_comments(sql: str) -> str:
+    sql = re.sub(r"/\*.*?\*/", " ", sql, flags=re.S)
+    return re.sub(r"--[^\n]*", " ", sql)
+
+
+def check_query(sql: str) -> str:
+    """The query without trailing semicolons; ValueError unless it is one read-only statement"""
+    body = _strip_comments(sql).strip().rstrip(";").strip()
+    if not body:
+        raise ValueError("Enter a SQL query")
+    # Semicolons inside string literals are fine; anything else means a second statement
+    if ";" in re.sub(r"'(?:[^']|'')*'", "''", body):
+        raise ValueError("Only one statement can be run at a time")
+    if body.split(None, 1)[0].lower() not in ("select", "with"):
+        raise ValueError("Only SELECT queries are allowed")
+    return body
+
+
+def _normalize(sql: str) -> str:
+    return " ".join(sql.split())
+
+
+def _sqlite_read_only(action, *_):
+    return sqlite3.SQLITE_OK if action in SQLITE_READ_ACTIONS else sqlite3.SQLITE_DENY
+
+
+class SqlEngine:
+    """One connection over the current datasets, re-registered as their versions change"""
+
+    def __init__(self, backend: Optional[str] = None, max_plans: int = 64):
+        self.backend = backend or sql_backend_name()
+        self.max_plans = max_plans
+        self._lock = threading.Lock()
+        self._conn = None
+        self._versions: Dict[str, str] = {}
+        # Normalized SQL + table versions -> the engine's EXPLAIN output
+        self._plans: "OrderedDict[tuple, str]" = OrderedDict()
+        self.plan_hits = 0
+        self.plan_misses = 0
+
+    def _connect(self):
+        if self._conn is not None:
+            return self._conn
+        if self.backend == "duckdb":
+            # No reading local files (read_text('.env'), 'file.csv' in FROM) or loading extensions
+            self._conn = duckdb.connect(database=":memory:", config={"enable_external_access": False})
+        else:
+            # Compiled statements are kept by the sqlite3 module's statement cache
+            self._conn = sqlite3.connect(":memory:", check_same_thread=False, cached_statements=256)
+            self._conn.execute("PRAGMA query_only=ON")
+        return self._conn
+
+    def _read_only(self, conn, body: str):
+        """Engine-side read-only guard for the next user statement (the lock is held)"""
+        if self.backend == "duckdb":
+            statements = conn.extract_statements(body)
+            if len(statements) != 1 or statements[0].type != duckdb.StatementType.SELECT:
+                raise ValueError("Only SELECT queries are allowed")
+        else:
+            conn.set_authorizer(_sqlite_read_only)
+
+    def _read_write(self, conn):
+        if self.backend == "sqlite":
+            conn.set_authorizer(None)
+
+    def _sync(self, datasets: Dict):
+        """Register every dataset whose version changed since the last query"""
+        conn = self._connect()
+        if self.backend == "sqlite":
+            conn.execute("PRAGMA query_only=OFF")
+        try:
+            self._register(conn, datasets)
+        finally:
+            if self.backend == "sqlite":
+                conn.execute("PRAGMA query_only=ON")
+
+    def _register(self, conn, datasets: Dict):
+        for name in SQL_TABLES:
+            df = datasets.get(name)
+            if not isinstance(df, pd.DataFrame):
+                continue
+            version = dataset_version(df)
+            if self._versions.get(name) == version:
+                continue
+            if self.backend == "duckdb":
+                conn.register(name, df)
+            else:
+                df.to_sql(name, conn, if_exists="replace", index=False)
+            self._versions[name] = version
+            print(f"🗄️ Registered {name} ({len(df):,} rows) with {self.backend}")
+
+        for alias, name in TABLE_ALIASES.items():
+            if name in self._versions:
+                if self.backend == "sqlite":
+                    conn.execute(f"DROP VIEW IF EXISTS {alias}")
+                    conn.execute(f"CREATE VIEW {alias} AS SELECT * FROM {name}")
+                else:
+                    conn.execute(f"CREATE OR REPLACE VIEW {alias} AS SELECT * FROM {name}")
+
+    def tables(self, datasets: Dict) -> Dict[str, List[str]]:
+        """Queryable table names and their columns"""
+        return {
+            name: [str(c) for c in datasets[name].columns]
+            for name in SQL_TABLES if isinstance(datasets.get(name), pd.DataFrame)
+        }
+
+    def explain(self, sql: str, datasets: Dict) -> str:
+        """Query plan text, cached per query and dataset versions"""
+        body = check_query(sql)
+        with self._lock:
+            self._sync(datasets)
+            key = (_normalize(body), tuple(sorted(self._versions.items())))
+            if key in self._plans:
+                self.plan_hits += 1
+                self._plans.move_to_end(key)
+                return self._plans[key]
+            self.plan_misses += 1
+            explain = "EXPLAIN" if self.backend == "duckdb" else "EXPLAIN QUERY PLAN"
+            conn = self._connect()
+            self._read_only(conn, body)
+            try:
+                rows = conn.execute(f"{explain} {body}").fetchall()
+            finally:
+                self._read_write(conn)
+            # DuckDB returns (type, plan) pairs, SQLite (id, parent, notused, detail) rows
+            plan = "\n".join(str(row[-1]) for row in rows)
+            self._plans[key] = plan
+            while len(self._plans) > self.max_plans:
+                self._plans.popitem(last=False)
+            return plan
+
+    def columns(self, sql: str, datasets: Dict) -> List[str]:
+        """Result columns of a query without running it; ValueError unless it returns rows
+
+        The query is wrapped as a subquery with LIMIT 0, which only parses
+        for statements that produce a result set.
+        """
+        body = check_query(sql)
+        with self._lock:
+            self._sync(datasets)
+            conn = self._connect()
+            self._read_only(conn, body)
+            try:
+                cursor = conn.execute(f"SELECT * FROM ({body}) AS q LIMIT 0")
+                description = cursor.description
+                cursor.fetchall()
+            except Exception as e:
+                raise ValueError(f"Not a read-only query: {e}") from e
+            finally:
+                self._read_write(conn)
+        if not description:
+            raise ValueError("Only queries that return rows are allowed")
+        return [d[0] for d in description]
+
+    def _timed(self, conn, call, remaining: float, timeout: float, body: Optional[str] = None):
+        """(result, time budget left) of one engine call, interrupted once the budget runs out
+
+        Only time inside the engine counts; `body` marks the call that
+        executes user SQL, which runs under the read-only guard.
+        """
+        started = time.monotonic()
+        deadline = started + remaining
+        timer = None
+        if self.backend == "duckdb":
+            timer = threading.Timer(max(remaining, 0), conn.interrupt)
+            timer.start()
+        else:
+            conn.set_progress_handler(lambda: int(time.monotonic() > deadline), 10000)
+        try:
+            if body is not None:
+                self._read_only(conn, body)
+            return call(), remaining - (time.monotonic() - started)
+        except Exception as e:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Query stopped after {timeout:g}s") from e
+            raise
+        finally:
+            if body is not None:
+                self._read_write(conn)
+            if timer is not None:
+                timer.cancel()
+            else:
+                conn.set_progress_handler(None, 0)
+
+    def _open(self, datasets: Dict):
+        """(connection, lock) for one streamed query
+
+        DuckDB gets a cursor of its own with the frames registered on it, so
+        other sessions can query while this result is being read. SQLite
+        shares the one connection, taken batch by batch under the engine lock.
+        """
+        if self.backend == "duckdb":
+            with self._lock:
+                conn = self._connect().cursor()
+            for name in SQL_TABLES:
+                if isinstance(datasets.get(name), pd.DataFrame):
+                    conn.register(name, datasets[name])
+            for alias, name in TABLE_ALIASES.items():
+                if isinstance(datasets.get(name), pd.DataFrame):
+                    conn.register(alias, datasets[name])
+            return conn, threading.Lock()
+        with self._lock:
+            self._sync(datasets)
+        return self._connect(), self._lock
+
+    def stream(self, sql: str, datasets: Dict, max_rows: int = MAX_ROWS,
+               timeout: float = TIMEOUT_SECONDS, batch_rows: int = BATCH_ROWS) -> Iterator[pd.DataFrame]:
+        """Result batches of at most `batch_rows`, stopping at `max_rows`
+
+        The timeout covers time spent executing and fetching, not time the
+        consumer spends between batches, and no lock is held while a batch
+        is being consumed. Raises ValueError for rejected queries and
+        TimeoutError when the engine is interrupted; engine errors (unknown
+        column, syntax) pass through unchanged.
+        """
+        body = check_query(sql)
+        conn, lock = self._open(datasets)
+        remaining = timeout
+        cursor = None
+        try:
+            with lock:
+                cursor, remaining = self._timed(conn, lambda: conn.execute(body), remaining, timeout, body)
+            if cursor.description is None:
+                raise ValueError("Only queries that return rows are allowed")
+            columns = [d[0] for d in cursor.description]
+            fetched = 0
+            while fetched < max_rows:
+                size = min(batch_rows, max_rows - fetched)
+                with lock:
+                    rows, remaining = self._timed(conn, lambda: cursor.fetchmany(size), remaining, timeout)
+                if not rows:
+                    break
+                fetched += len(rows)
+                yield pd.DataFrame.from_records(rows, columns=columns)
+            if not fetched:
+                yield pd.DataFrame(columns=columns)
+        finally:
+            with lock:
+                if self.backend == "duckdb":
+                    conn.close()
+                elif cursor is not None:
+                    cursor.close()
+
+    def query(self, sql: str, datasets: Dict, max_rows: int = MAX_ROWS,
+              timeout: float = TIMEOUT_SECONDS) -> pd.DataFrame:
+        """Whole result as one frame (still capped at `max_rows`)"""
+        batches = list(self.stream(sql, datasets, max_rows, timeout))
+        return pd.concat(batches, ignore_index=True) if batches else pd.DataFrame()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"tables": len(self._versions), "plans": len(self._plans),
+                    "plan_hits": self.plan_hits, "plan_misses": self.plan_misses}
+
+
+sql_engine = SqlEngine()
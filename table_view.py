@@ -0,0 +1,162 @@
+"""
+Clean Air AI Chatbot - Table Viewer
+Paginated, sortable, filterable view over a full dataset
+
+Sort orders are cached as row permutations and filters as boolean masks,
+both per dataset version, so paging through a sorted and filtered table
+only ever slices out the visible rows. The browser receives one page.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from datastore import dataset_version
+from exports import frame_chunks, render_export_controls
+from profiling import profile_cache
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+# ('contains', text) for text columns, ('between', low, high) for numeric ones
+Filter = Tuple
+
+
+class TableIndex:
+    """LRU of sort permutations, filter masks and combined row orders keyed by dataset version"""
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _cached(self, key, compute) -> np.ndarray:
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def order(self, df: pd.DataFrame, column: str, ascending: bool = True) -> np.ndarray:
+        """Row positions sorted by one column; ties keep file order, missing values go last"""
+        key = (dataset_version(df), "order", column, ascending)
+        return self._cached(key, lambda: sort_permutation(df[column], ascending))
+
+    def mask(self, df: pd.DataFrame, column: str, condition: Filter) -> np.ndarray:
+        """Boolean row mask for one filter"""
+        key = (dataset_version(df), "mask", column, condition)
+        return self._cached(key, lambda: filter_mask(df[column], condition))
+
+    def rows(self, df: pd.DataFrame, sort_by: Optional[str] = None, ascending: bool = True,
+             filters: Optional[Dict[str, Filter]] = None) -> np.ndarray:
+        """Row positions of the filtered, sorted view"""
+        filters = filters or {}
+        key = (dataset_version(df), "rows", sort_by, ascending, tuple(sorted(filters.items())))
+
+        def compute():
+            order = self.order(df, sort_by, ascending) if sort_by else np.arange(len(df))
+            if not filters:
+                return order
+            keep = np.ones(len(df), dtype=bool)
+            for column, condition in filters.items():
+                keep &= self.mask(df, column, condition)
+            return order[keep[order]]
+
+        return self._cached(key, compute)
+
+    def page(self, df: pd.DataFrame, page: int, page_size: int, **view) -> Tuple[pd.DataFrame, int]:
+        """One page of the view (0-based page number) and the view's total row count"""
+        rows = self.rows(df, **view)
+        start = page * page_size
+        return df.iloc[rows[start:start + page_size]], len(rows)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+table_index = TableIndex()
+
+
+def sort_permutation(values: pd.Series, ascending: bool = True) -> np.ndarray:
+    """Stable argsort over sorted factor codes, which works the same for numbers and text"""
+    codes, uniques = pd.factorize(values, sort=True)
+    codes = codes.astype(np.int64)
+    missing = codes < 0
+    if not ascending:
+        codes = len(uniques) - 1 - codes
+    codes[missing] = len(uniques)
+    return np.argsort(codes, kind="stable")
+
+
+def filter_mask(values: pd.Series, condition: Filter) -> np.ndarray:
+    """Rows of `values` matching one filter condition"""
+    op = condition[0]
+    if op == "contains":
+        return values.astype(str).str.contains(condition[1], case=False, regex=False).to_numpy(dtype=bool)
+    if op == "between":
+        numbers = pd.to_numeric(values, errors="coerce")
+        return numbers.between(condition[1], condition[2]).to_numpy(dtype=bool)
+    raise ValueError(f"Unknown filter: {op}")
+
+
+def render_table_view(df: pd.DataFrame, key: str = "table_view"):
+    """Sort/filter controls and the current page of `df`"""
+    profile = profile_cache.get(df)
+    columns = list(df.columns)
+
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        sort_by = st.selectbox("Sort by", ["(file order)"] + columns, key=f"{key}_sort")
+    with col2:
+        ascending = st.radio("Order", ["Ascending", "Descending"], horizontal=True,
+                             key=f"{key}_ascending") == "Ascending"
+    with col3:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, key=f"{key}_page_size")
+
+    filters: Dict[str, Filter] = {}
+    filter_column = st.selectbox("Filter column", ["(none)"] + columns, key=f"{key}_filter_column")
+    if filter_column != "(none)":
+        column = profile.column(filter_column)
+        if column.kind == "numeric" and column.min is not None and column.min < column.max:
+            low, high = st.slider("Range", column.min, column.max, (column.min, column.max),
+                                  key=f"{key}_range_{filter_column}")
+            if (low, high) != (column.min, column.max):
+                filters[filter_column] = ("between", low, high)
+        else:
+            text = st.text_input("Contains", key=f"{key}_contains_{filter_column}").strip()
+            if text:
+                filters[filter_column] = ("contains", text)
+
+    view = dict(sort_by=None if sort_by == "(file order)" else sort_by, ascending=ascending, filters=filters)
+    total = len(table_index.rows(df, **view))
+    pages = max(1, -(-total // page_size))
+    page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1, key=f"{key}_page") - 1
+    page = min(page, pages - 1)
+
+    rows, total = table_index.page(df, page, page_size, **view)
+    st.dataframe(rows, use_container_width=True)
+    first = page * page_size + 1 if total else 0
+    st.caption(f"Rows {first:,}–{page * page_size + len(rows):,} of {total:,}"
+               + (f" (filtered from {len(df):,})" if filters else ""))
+
+    with st.expander("📤 Export this view"):
+        render_export_controls(lambda: frame_chunks(df, table_index.rows(df, **view)), key, key=f"{key}_export")
@@ -0,0 +1,35 @@
+import pandas as pd
+
+from aggregates import aggregates
+from datastore import stamp_version
+from per_capita import per_capita
+
+
+def _population():
+    rows = []
+    for year, scale in ((2025, 1.0), (2026, 1.1), (2036, 2.0)):
+        for month in ("january", "july"):
+            rows += [
+                {"year": year, "month": month, "state": "Bihar", "gender": "Total", "value": 120000 * scale},
+                {"year": year, "month": month, "state": "Bihar", "gender": "Male", "value": 60000 * scale},
+                {"year": year, "month": month, "state": "Kerala", "gender": "Total", "value": 35000 * scale},
+                {"year": year, "month": month, "state": "All India", "gender": "Total", "value": 1400000 * scale},
+            ]
+    return stamp_version(pd.DataFrame(rows))
+
+
+def test_population_by_state_matches_the_per_capita_reference_year():
+    df = _population()
+    table = aggregates.get(df, "population_by_state").set_index("state")["population"]
+    expected = per_capita.population(df).totals()
+
+    assert list(table.index) == ["Bihar", "Kerala"]
+    pd.testing.assert_series_equal(table, expected.sort_values(ascending=False), check_names=False)
+
+
+def test_aggregates_are_cached_per_dataset_version():
+    df = stamp_version(pd.DataFrame({"state": ["Kerala", "Kerala", "Bihar"], "cases": [1, 2, 5]}))
+    first = aggregates.get(df, "state_case_totals")
+
+    assert aggregates.get(df, "state_case_totals") is first
+    assert dict(zip(first["state"], first["cases"])) == {"Bihar": 5, "Kerala": 3}
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from alerts import AlertEngine, aqi_category, alert_rules
+from datastore import stamp_version
+
+
+def test_aqi_category_boundaries_and_missing_values():
+    categories = aqi_category(pd.Series([0, 50, 51, 200, 201, 401, np.nan]))
+    assert list(categories[:6]) == ["Good", "Good", "Satisfactory", "Moderate", "Poor", "Severe"]
+    assert pd.isna(categories.iloc[6])
+
+
+def test_blank_readings_raise_no_alerts_and_do_not_mask_real_ones():
+    aqi = stamp_version(pd.DataFrame({
+        "date": ["2025-01-01", "2025-01-01", "2025-01-02"],
+        "state": ["Delhi"] * 3,
+        "area": ["Anand Vihar"] * 3,
+        "aqi_value": [np.nan, 420, np.nan],
+    }))
+    alerts = AlertEngine().evaluate({"aqi": aqi}, alert_rules(min_category="Poor"))
+
+    assert list(alerts["rule"]) == ["AQI Severe"]
+    assert alerts["value"].iloc[0] == 420
+
+
+def test_unchanged_partitions_are_reused_after_an_append():
+    engine = AlertEngine()
+    first = pd.DataFrame({"date": ["2025-01-01"], "state": ["Delhi"], "area": ["A"], "aqi_value": [320]})
+    second = pd.concat([first, first.assign(date="2025-01-02", aqi_value=90)], ignore_index=True)
+    engine.evaluate({"aqi": stamp_version(first)})
+    engine.evaluate({"aqi": stamp_version(second)})
+
+    assert engine.stats()["built"] == 2 and engine.stats()["reused"] == 1
@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+
+from aqi_trends import build_aqi_trends, rolling_mean
+
+
+def test_rolling_mean_matches_pandas_with_gaps():
+    values = np.array([[10, np.nan, 30, 40, np.nan, np.nan, 70, 80, 90, np.nan]])
+    expected = pd.Series(values[0]).rolling(4, min_periods=2).mean().to_numpy()
+    np.testing.assert_allclose(rolling_mean(values, 4, min_periods=2)[0], expected, rtol=1e-6)
+
+
+def test_blank_statuses_take_the_category_of_their_aqi():
+    df = pd.DataFrame({
+        "date": ["2025-01-01", "2025-01-02", "2025-01-03"],
+        "state": ["Delhi"] * 3,
+        "area": ["Anand Vihar"] * 3,
+        "aqi_value": [450, 450, 40],
+        "air_quality_status": ["Severe", np.nan, "  "],
+    })
+    trends = build_aqi_trends(df)
+    days = dict(zip(trends.categories, trends.category_days[0]))
+
+    assert "nan" not in trends.categories and "" not in trends.categories
+    assert days["Severe"] == 2 and days["Good"] == 1
@@ -0,0 +1,17 @@
+import pandas as pd
+
+from charts import timeseries_frame
+from datastore import stamp_version
+from query_planner import QueryPlan
+
+
+def test_idsp_timeseries_reads_iso_and_day_first_dates():
+    plan = QueryPlan(query="dengue", diseases=["Dengue"])
+    for dates in (["2025-01-10", "2025-01-20"], ["10-01-2025", "20-01-2025"]):
+        idsp = stamp_version(pd.DataFrame({
+            "outbreak_starting_date": dates, "state": ["Kerala"] * 2,
+            "disease_illness_name": ["Dengue"] * 2, "cases": [4, 6],
+        }))
+        frame = timeseries_frame(idsp, "idsp", plan)
+        assert frame["value"].sum() == 10
+        assert frame["date"].min() >= pd.Timestamp("2025-01-05")
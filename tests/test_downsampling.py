@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from downsampling import downsample, lttb_indices, minmax_indices
+
+
+def test_lttb_keeps_endpoints_and_returns_sorted_indices():
+    x = np.arange(10_000)
+    y = np.sin(x / 100)
+    indices = lttb_indices(x, y, 200)
+
+    assert len(indices) == 200 and indices[0] == 0 and indices[-1] == len(x) - 1
+    assert (np.diff(indices) > 0).all()
+
+
+def test_lttb_keeps_an_isolated_spike():
+    y = np.zeros(10_000)
+    y[4321] = 50
+    assert 4321 in lttb_indices(np.arange(len(y)), y, 100)
+
+
+def test_small_series_are_returned_whole():
+    assert list(lttb_indices(np.arange(5), np.arange(5), 10)) == [0, 1, 2, 3, 4]
+
+
+def test_minmax_keeps_every_extreme():
+    rng = np.random.default_rng(0)
+    y = rng.normal(size=5_000)
+    indices = minmax_indices(y, 100)
+
+    assert len(indices) <= 100
+    assert y.argmin() in indices and y.argmax() in indices
+
+
+def test_downsample_caps_each_series_and_sorts_by_date():
+    dates = pd.date_range("2024-01-01", periods=3_000, freq="h")
+    df = pd.DataFrame({
+        "date": np.concatenate([dates[::-1], dates]),
+        "value": np.arange(6_000, dtype=float),
+        "series": ["a"] * 3_000 + ["b"] * 3_000,
+    })
+    result = downsample(df, "date", "value", max_points=300, series="series")
+
+    assert result.groupby("series").size().to_dict() == {"a": 300, "b": 300}
+    assert result.groupby("series")["date"].apply(lambda d: d.is_monotonic_increasing).all()
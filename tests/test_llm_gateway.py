@@ -0,0 +1,75 @@
+from types import SimpleNamespace
+
+import pytest
+
+import llm_gateway
+from llm_gateway import RetryPolicy, TokenBucketLimiter, retry_after_seconds
+
+
+class ApiError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+class FlakyClient:
+    """chat.completions.create that fails with the given errors before succeeding"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **params):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+@pytest.fixture
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(llm_gateway, "rate_limiter", TokenBucketLimiter(0, 0))
+    monkeypatch.setattr(llm_gateway, "retry_policy", RetryPolicy(max_retries=2, base_delay=0.0))
+    monkeypatch.setattr(llm_gateway.time, "sleep", lambda seconds: None)
+
+
+def test_zero_limits_mean_unlimited():
+    limiter = TokenBucketLimiter(0, 0)
+    for _ in range(500):
+        assert limiter.acquire(tokens=10_000, timeout=0.1) < 0.1
+    assert limiter.stats()["acquired"] == 500
+
+
+def test_empty_request_bucket_blocks_until_timeout():
+    limiter = TokenBucketLimiter(requests_per_minute=2, tokens_per_minute=0)
+    limiter.acquire()
+    limiter.acquire()
+    with pytest.raises(TimeoutError):
+        limiter.acquire(timeout=0.05)
+    assert limiter.queue_depth() == 0
+
+
+def test_retryable_errors_are_retried(fast_retries):
+    client = FlakyClient(ApiError(429), ApiError(503))
+    assert llm_gateway._create_with_retry(client, [{"role": "user", "content": "hi"}], "model") == "ok"
+    assert client.calls == 3
+
+
+def test_client_errors_and_exhausted_retries_raise(fast_retries):
+    client = FlakyClient(ApiError(400))
+    with pytest.raises(ApiError):
+        llm_gateway._create_with_retry(client, [], "model")
+    assert client.calls == 1
+
+    client = FlakyClient(ApiError(500), ApiError(500), ApiError(500))
+    with pytest.raises(ApiError):
+        llm_gateway._create_with_retry(client, [], "model")
+    assert client.calls == 3
+
+
+def test_retry_after_header():
+    assert retry_after_seconds(ApiError(429, {"retry-after": "7"})) == 7.0
+    assert retry_after_seconds(ApiError(429, {"retry-after": "soon"})) is None
+    assert retry_after_seconds(ApiError(429)) is None
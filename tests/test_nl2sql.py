@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from datastore import stamp_version
+from nl2sql import answer_with_sql, extract_sql, sql_answer_cache
+
+
+@pytest.fixture
+def datasets():
+    aqi = pd.DataFrame({"state": ["Delhi", "Kerala"], "area": ["Anand Vihar", "Kochi"], "aqi_value": [320, 55]})
+    return {"aqi": stamp_version(aqi)}
+
+
+class ScriptedClient:
+    """Replies with the given messages in order"""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **params):
+        message = SimpleNamespace(content=self.replies.pop(0))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+def test_extract_sql_from_a_fenced_reply(datasets):
+    reply = "Here you go:\n```sql\nSELECT state, MAX(aqi_value) FROM aqi GROUP BY state LIMIT 5;\n```"
+    assert extract_sql(reply, datasets) == "SELECT state, MAX(aqi_value) FROM aqi GROUP BY state LIMIT 5"
+
+
+@pytest.mark.parametrize("reply", [
+    "I cannot help with that",
+    "WITH x AS (SELECT 1) DELETE FROM aqi",
+    "SELECT * FROM aqi; DROP TABLE aqi",
+    "SELECT * FROM secrets",
+    "SELECT 'unanswerable' AS error",
+])
+def test_extract_sql_refuses(datasets, reply):
+    with pytest.raises(ValueError):
+        extract_sql(reply, datasets)
+
+
+def test_extract_sql_finds_a_cte_after_prose(datasets):
+    reply = "Sure, starting with the worst areas: WITH worst AS (SELECT * FROM aqi) SELECT area FROM worst"
+    assert extract_sql(reply, datasets) == "WITH worst AS (SELECT * FROM aqi) SELECT area FROM worst"
+
+
+def test_extract_sql_allows_keywords_in_literals_and_functions(datasets):
+    sql = "SELECT REPLACE(area, 'delete', '') AS area FROM aqi WHERE state <> 'drop'"
+    assert extract_sql(sql, datasets) == sql
+    assert extract_sql("SELECT EXTRACT(YEAR FROM state) FROM aqi", datasets)
+
+
+def test_answer_is_run_locally_and_cached(datasets):
+    sql_answer_cache.clear()
+    client = ScriptedClient("SELECT area FROM aqi ORDER BY aqi_value DESC LIMIT 1", "Anand Vihar is worst.")
+    answer = answer_with_sql("Which area is most polluted?", datasets, client, model_override="test-model")
+
+    assert list(answer.result["area"]) == ["Anand Vihar"]
+    assert answer.answer == "Anand Vihar is worst." and not answer.cached
+    again = answer_with_sql("which area is most polluted", datasets, client, model_override="test-model")
+    assert again.cached and again.answer == answer.answer
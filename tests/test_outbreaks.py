@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from outbreaks import detect_outbreaks, ears_statistic, recent_first_reports, recent_outbreaks
+
+
+def _idsp(cases_by_week, district="Pune", disease="Dengue"):
+    weeks = pd.date_range("2025-01-06", periods=len(cases_by_week), freq="7D")
+    return pd.DataFrame({
+        "outbreak_starting_date": weeks.strftime("%Y-%m-%d"),
+        "state": "Maharashtra",
+        "district": district,
+        "disease_illness_name": disease,
+        "cases": cases_by_week,
+    })
+
+
+def test_c1_and_c2_baselines():
+    series = np.array([[2, 4, 2, 4, 2, 4, 2, 4, 2, 4, 20]], dtype=float)
+    c1, c1_base = ears_statistic(series, lag=0)
+    c2, c2_base = ears_statistic(series, lag=2)
+
+    c1_window, c2_window = series[0, 3:10], series[0, 1:8]
+    assert c1_base[0, 10] == c1_window.mean()
+    assert np.isclose(c1[0, 10], (20 - c1_window.mean()) / c1_window.std(ddof=1))
+    assert np.isclose(c2[0, 10], (20 - c2_window.mean()) / c2_window.std(ddof=1))
+    assert np.isnan(c2[0, 8]) and not np.isnan(c2[0, 9])
+
+
+def test_single_isolated_report_is_not_an_outbreak():
+    result = detect_outbreaks(_idsp([0] * 11 + [40]))
+
+    assert len(result) == 1
+    assert bool(result["first_report"].iloc[0]) and np.isnan(result["c2"].iloc[0])
+    assert recent_outbreaks(result).empty
+    assert len(recent_first_reports(result)) == 1
+
+
+def test_escalation_over_a_reporting_baseline_is_flagged():
+    result = detect_outbreaks(_idsp([2, 3, 2, 3, 2, 3, 2, 3, 2, 3, 30]))
+    flagged = recent_outbreaks(result)
+
+    assert list(flagged["cases"]) == [30]
+    assert not flagged["first_report"].any()
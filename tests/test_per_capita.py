@@ -0,0 +1,33 @@
+import pandas as pd
+
+from datastore import stamp_version
+from per_capita import cases_per_100k
+
+
+def _population():
+    return stamp_version(pd.DataFrame({
+        "year": [2024, 2025, 2024, 2025],
+        "month": ["january"] * 4,
+        "state": ["Kerala", "Kerala", "Bihar", "Bihar"],
+        "gender": ["Total"] * 4,
+        "value": [100, 200, 1000, 1000],  # thousands
+    }))
+
+
+def _idsp():
+    return stamp_version(pd.DataFrame({
+        "outbreak_starting_date": ["2024-03-04", "2025-03-03", "2025-03-03"],
+        "state": ["Kerala", "Kerala", "Bihar"],
+        "district": ["Ernakulam", "Ernakulam", "Patna"],
+        "disease_illness_name": ["Dengue"] * 3,
+        "cases": [100, 100, 500],
+    }))
+
+
+def test_cases_per_100k_is_an_annual_rate():
+    rates = cases_per_100k(_idsp(), _population()).set_index("state")["cases_per_100k"]
+
+    # Kerala: 100 per 100k in 2024 and 50 per 100k in 2025
+    assert rates["Kerala"] == 75
+    # Bihar reported only in 2025: 50 per 100k that year, nothing in 2024
+    assert rates["Bihar"] == 25
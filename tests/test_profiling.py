@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+from profiling import profile_dataset
+
+
+def test_profile_matches_pandas_on_a_small_frame():
+    df = pd.DataFrame({
+        "aqi": [50.0, np.nan, 150.0, 300.0],
+        "state": ["Delhi", "Delhi", None, "Kerala"],
+    })
+    profile = profile_dataset(df)
+    aqi = profile.column("aqi")
+
+    assert (aqi.count, aqi.nulls, aqi.min, aqi.max) == (3, 1, 50.0, 300.0)
+    assert np.isclose(aqi.std, df["aqi"].std())
+    assert aqi.quantiles["50%"] == df["aqi"].median()
+    assert profile.column("state").top_values == [("Delhi", 2), ("Kerala", 1)]
+    assert profile.memory_bytes >= df.memory_usage(deep=False).sum()
+
+
+def test_all_missing_numeric_column_has_no_statistics():
+    profile = profile_dataset(pd.DataFrame({"deaths": [np.nan, np.nan]}))
+    deaths = profile.column("deaths")
+
+    assert deaths.count == 0 and deaths.nulls == 2
+    assert deaths.min is None and deaths.quantiles == {}
+
+
+def test_sparse_column_falls_back_to_full_quantiles_when_the_sample_misses_it():
+    values = np.full(1_000, np.nan)
+    values[7] = 42.0
+    profile = profile_dataset(pd.DataFrame({"cases": values}), sample_rows=10)
+    cases = profile.column("cases")
+
+    assert cases.sampled and cases.quantiles["50%"] == 42.0
@@ -0,0 +1,28 @@
+import pandas as pd
+
+from datastore import stamp_version
+from prompt_layout import assemble_context, build_messages
+
+
+def _datasets():
+    return {
+        "aqi": stamp_version(pd.DataFrame({"state": ["Delhi"], "aqi": [180]})),
+        "idsp": stamp_version(pd.DataFrame({"state": ["Kerala"], "cases": [12]})),
+    }
+
+
+def test_question_figures_follow_the_stable_summaries():
+    datasets = _datasets()
+    summaries = {"aqi": "AQI summary", "idsp": "IDSP summary"}
+    stable = assemble_context(datasets, summaries)
+    delhi = assemble_context(datasets, summaries, ["\nTrend for Delhi"])
+    kochi = assemble_context(datasets, summaries, ["\nTrend for Kochi", ""])
+
+    assert delhi.startswith(stable) and kochi.startswith(stable)
+    assert delhi.endswith("Figures for this question:\nTrend for Delhi")
+    assert assemble_context(datasets, summaries, ["", "  "]) == stable
+
+
+def test_question_goes_last():
+    messages = build_messages("system", "context", "Is Delhi improving?")
+    assert messages[-1]["content"].endswith("\n\nUser Question: Is Delhi improving?")
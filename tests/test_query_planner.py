@@ -0,0 +1,39 @@
+import pandas as pd
+
+from datastore import stamp_version
+from query_planner import build_vocabulary, plan_query
+
+
+def _datasets():
+    idsp = pd.DataFrame({
+        "state": ["West Bengal", "Nagaland", "Himachal Pradesh", "Kerala"],
+        "district": ["West", "Mon", "Una", "Ernakulam"],
+        "disease_illness_name": ["Dengue", "Food Poisoning", "Poisoning", "Dengue"],
+        "cases": [10, 5, 3, 8],
+    })
+    aqi = pd.DataFrame({"state": ["Kerala"], "area": ["Kochi"], "aqi_value": [60]})
+    return {"idsp": stamp_version(idsp), "aqi": stamp_version(aqi)}
+
+
+def test_state_name_does_not_also_match_a_district_inside_it():
+    plan = plan_query("dengue cases in West Bengal", build_vocabulary(_datasets()))
+    assert plan.states == ["West Bengal"]
+    assert plan.places == []
+    assert plan.diseases == ["Dengue"]
+
+
+def test_common_words_and_short_names_are_not_places():
+    vocabulary = build_vocabulary(_datasets())
+    assert plan_query("which states in the west have dengue", vocabulary).places == []
+    assert plan_query("mon una and mau", vocabulary).places == []
+
+
+def test_longest_match_within_a_kind():
+    plan = plan_query("food poisoning outbreaks", build_vocabulary(_datasets()))
+    assert plan.diseases == ["Food Poisoning"]
+
+
+def test_places_from_the_data_are_matched():
+    plan = plan_query("How is the air quality in Kochi?", build_vocabulary(_datasets()))
+    assert plan.places == ["Kochi"]
+    assert "aqi" in plan.datasets
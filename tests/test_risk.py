@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+from datastore import stamp_version
+from risk import RISK_WEIGHTS, national_score, state_components
+
+
+def _datasets():
+    aqi = pd.DataFrame({
+        "date": ["2025-01-01"] * 3,
+        "state": ["Delhi", "Bihar", "Kerala"],
+        "area": ["Anand Vihar", "Patna", "Kochi"],
+        "aqi_value": [400, 250, 50],
+    })
+    idsp = pd.DataFrame({
+        "outbreak_starting_date": ["2025-01-06"] * 4,
+        "state": ["Delhi", "Bihar", "Kerala", "Himachal Pradesh"],
+        "district": ["New Delhi", "Patna", "Ernakulam", "Una"],
+        "disease_illness_name": ["Dengue"] * 4,
+        "cases": [10, 10, 10, 500],
+    })
+    population = pd.DataFrame({
+        "year": [2025] * 4,
+        "month": [1] * 4,
+        "state": ["Delhi", "Bihar", "Kerala", "Himachal Pradesh"],
+        "gender": ["Total"] * 4,
+        "value": [20000, 120000, 35000, 7000],
+    })
+    return {name: stamp_version(df) for name, df in {"aqi": aqi, "idsp": idsp, "population": population}.items()}
+
+
+def test_states_without_enough_components_are_not_ranked():
+    states = state_components(_datasets()).set_index("state")
+
+    assert np.isnan(states.loc["Himachal Pradesh", "score"])
+    assert states.loc["Himachal Pradesh", "coverage"] == "1/2"
+    assert states.index[0] == "Delhi"
+
+
+def test_score_renormalises_weights_over_present_components():
+    states = state_components(_datasets()).set_index("state")
+    air, health = RISK_WEIGHTS["air"], RISK_WEIGHTS["health"]
+    delhi = states.loc["Delhi"]
+    expected = (air * delhi["air"] + health * delhi["health"]) / (air + health)
+
+    assert delhi["score"] == round(expected, 1)
+    assert delhi["coverage"] == "2/2"
+
+
+def test_national_score_ignores_unscored_states():
+    datasets = _datasets()
+    states = state_components(datasets)
+    scored = states.dropna(subset=["score"])
+
+    assert min(scored["score"]) <= national_score(states, datasets) <= max(scored["score"])
@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+
+from datastore import stamp_version
+from sql_engine import SqlEngine, check_query
+
+
+@pytest.fixture
+def engine():
+    return SqlEngine(backend="sqlite")
+
+
+@pytest.fixture
+def datasets():
+    aqi = pd.DataFrame({"state": ["Delhi", "Delhi", "Kerala"], "area": ["A", "B", "Kochi"], "aqi_value": [300, 250, 60]})
+    return {"aqi": stamp_version(aqi)}
+
+
+def test_check_query_accepts_one_select_only():
+    assert check_query("SELECT 1; -- trailing comment") == "SELECT 1"
+    assert check_query("select ';' as semi") == "select ';' as semi"
+    for sql in ("", "DELETE FROM aqi", "SELECT 1; DROP TABLE aqi", "PRAGMA query_only=OFF"):
+        with pytest.raises(ValueError):
+            check_query(sql)
+
+
+def test_select_with_alias_and_row_cap(engine, datasets):
+    result = engine.query("SELECT area FROM air_quality ORDER BY aqi_value DESC", datasets, max_rows=2)
+    assert list(result["area"]) == ["A", "B"]
+
+
+def test_stream_yields_batches(engine, datasets):
+    batches = list(engine.stream("SELECT * FROM aqi", datasets, batch_rows=2))
+    assert [len(batch) for batch in batches] == [2, 1]
+
+
+@pytest.mark.parametrize("sql", [
+    "WITH doomed AS (SELECT 1) DELETE FROM aqi",
+    "WITH x AS (SELECT 1) INSERT INTO aqi SELECT * FROM aqi",
+    "WITH x AS (SELECT 1) UPDATE aqi SET aqi_value = 0",
+])
+def test_writes_behind_with_are_refused(engine, datasets, sql):
+    with pytest.raises(Exception):
+        engine.query(sql, datasets)
+    with pytest.raises(ValueError):
+        engine.columns(sql, datasets)
+    assert engine.query("SELECT COUNT(*) AS n FROM aqi", datasets)["n"].iloc[0] == 3
+    assert engine.query("SELECT MIN(aqi_value) AS low FROM aqi", datasets)["low"].iloc[0] == 60
+
+
+def test_columns_does_not_run_the_query(engine, datasets):
+    assert engine.columns("SELECT state, AVG(aqi_value) AS mean FROM aqi GROUP BY state", datasets) == ["state", "mean"]
+
+
+def test_runaway_query_is_interrupted(engine, datasets):
+    sql = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT COUNT(*) FROM n"
+    with pytest.raises(TimeoutError):
+        engine.query(sql, datasets, timeout=0.2)
+
+
+def test_explain_is_cached_per_dataset_version(engine, datasets):
+    engine.explain("SELECT * FROM aqi", datasets)
+    engine.explain("SELECT  *  FROM aqi", datasets)
+    assert engine.stats()["plan_hits"] == 1
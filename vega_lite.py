@@ -0,0 +1,100 @@
+"""
+Clean Air AI Chatbot - Vega-Lite Backend
+Compact Altair specs for the simple bar and pie charts
+
+The specs are derived from the already-aggregated Plotly traces, so the
+browser receives just the plotted values plus a few lines of encoding.
+"""
+
+import base64
+from typing import Dict, Optional
+
+import altair as alt
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# Same palette as the Plotly templates in charts.py
+ALTAIR_THEMES = {
+    "enterprise": dict(background="transparent", text_color="#f0f9ff", font="sans-serif"),
+    "friendly": dict(background="rgba(15, 23, 42, 0.6)", text_color="#f0f9ff", font="Inter"),
+    "dashboard": dict(background="transparent", text_color="white", font="sans-serif"),
+}
+
+
+def _values(data) -> list:
+    """Trace data as a list; figures rebuilt from JSON keep numbers as base64 typed arrays"""
+    if isinstance(data, dict) and "bdata" in data:
+        return np.frombuffer(base64.b64decode(data["bdata"]), dtype=data["dtype"]).tolist()
+    return list(data) if data is not None else []
+
+
+def _axis_title(axis) -> Optional[str]:
+    return axis.title.text if axis and axis.title and axis.title.text else None
+
+
+def _configure(chart: alt.Chart, theme: str) -> alt.Chart:
+    style = ALTAIR_THEMES.get(theme, ALTAIR_THEMES["enterprise"])
+    color = style["text_color"]
+    return (
+        chart.configure(background=style["background"], font=style["font"])
+        .configure_axis(labelColor=color, titleColor=color, gridOpacity=0.2)
+        .configure_legend(labelColor=color, titleColor=color)
+        .configure_title(color=color)
+        .configure_view(strokeWidth=0)
+    )
+
+
+def _pie(trace) -> alt.Chart:
+    table = pd.DataFrame({"label": _values(trace.labels), "value": _values(trace.values)})
+    inner = 60 if trace.hole else 0
+    return alt.Chart(table).mark_arc(innerRadius=inner).encode(
+        theta=alt.Theta("value:Q"),
+        color=alt.Color("label:N", sort=None, title=None),
+        tooltip=["label:N", alt.Tooltip("value:Q", format=",.0f")],
+    )
+
+
+def _bar(fig: go.Figure) -> alt.Chart:
+    horizontal = fig.data[0].orientation == "h"
+    rows = []
+    for trace in fig.data:
+        categories, values = (trace.y, trace.x) if horizontal else (trace.x, trace.y)
+        categories, values = _values(categories), _values(values)
+        rows.extend(
+            {"category": category, "value": value, "series": trace.name or ""}
+            for category, value in zip(categories, values)
+        )
+    table = pd.DataFrame(rows)
+
+    category_title = _axis_title(fig.layout.yaxis if horizontal else fig.layout.xaxis)
+    value_title = _axis_title(fig.layout.xaxis if horizontal else fig.layout.yaxis)
+    # Keep the row order of the aggregate table rather than sorting alphabetically
+    category = alt.X("category:N", sort=None, title=category_title)
+    value = alt.Y("value:Q", title=value_title)
+    if horizontal:
+        category = alt.Y("category:N", sort=None, title=category_title)
+        value = alt.X("value:Q", title=value_title)
+
+    encoding = dict(tooltip=["category:N", alt.Tooltip("value:Q", format=",.0f")])
+    if table["series"].nunique() > 1:
+        encoding["color"] = alt.Color("series:N", title=None)
+    else:
+        encoding["color"] = alt.value("#38bdf8")
+    return alt.Chart(table).mark_bar().encode(category, value, **encoding)
+
+
+def vega_lite_from_figure(fig: go.Figure, theme: str) -> Optional[Dict]:
+    """Vega-Lite spec for a bar or pie figure; None for anything else"""
+    kinds = {trace.type for trace in fig.data}
+    if kinds == {"pie"} and len(fig.data) == 1:
+        chart = _pie(fig.data[0])
+    elif kinds == {"bar"}:
+        chart = _bar(fig)
+    else:
+        return None
+
+    title = fig.layout.title.text or ""
+    height = fig.layout.height or 400
+    chart = chart.properties(title=title, height=height - 80, width="container")
+    return _configure(chart, theme).to_dict()